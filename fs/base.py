@@ -17,6 +17,7 @@ from __future__ import with_statement
 __all__ = ['DummyLock',
            'silence_fserrors',
            'NullFile',
+           'ScandirEntry',
            'synchronize',
            'FS',
            'flags_to_mode',
@@ -37,6 +38,7 @@ except ImportError:
 from fs.path import *
 from fs.errors import *
 from fs.local_functools import wraps
+from fs import fastcopy
 
 import six
 from six import b
@@ -137,6 +139,70 @@ class NullFile(object):
         pass
 
 
+class ScandirEntry(object):
+    """An entry in a directory, as returned by :meth:`~fs.base.FS.scandir`.
+
+    A ScandirEntry knows whether it refers to a file or a directory, so
+    code that walks a tree doesn't need to query the filesystem for each
+    entry. Filesystems that can retrieve the info dict for every entry in
+    the same operation will also store it in the entry; otherwise it is
+    retrieved on demand by :meth:`getinfo`.
+
+    """
+
+    __slots__ = ('fs', 'name', 'path', '_isdir', '_isfile', '_info')
+
+    def __init__(self, fs, dir_path, name, isdir, isfile=None, info=None):
+        """
+        :param fs: The FS object that contains the entry
+        :param dir_path: Path of the directory containing the entry
+        :param name: Name of the entry
+        :param isdir: True if the entry is a directory
+        :param isfile: True if the entry is a file (defaults to `not isdir`)
+        :param info: The info dict for the entry, if known
+
+        """
+        self.fs = fs
+        self.name = name
+        self.path = pathcombine(dir_path, name)
+        self._isdir = isdir
+        if isfile is None:
+            isfile = not isdir
+        self._isfile = isfile
+        self._info = info
+
+    def __repr__(self):
+        return "<ScandirEntry %r (%s)>" % (self.path, "dir" if self._isdir else "file")
+
+    def is_dir(self):
+        """Check if the entry is a directory."""
+        return self._isdir
+
+    def is_file(self):
+        """Check if the entry is a file."""
+        return self._isfile
+
+    @property
+    def has_info(self):
+        """True if the info dict was retrieved along with the listing."""
+        return self._info is not None
+
+    def getinfo(self):
+        """Get the info dict for the entry, as returned by :meth:`~fs.base.FS.getinfo`."""
+        if self._info is None:
+            self._info = self._load_info()
+        return self._info
+
+    def _load_info(self):
+        """Retrieve the info dict, if it wasn't included in the listing.
+
+        Filesystems may return a subclass that overrides this method, if
+        they have a cheaper way of getting the info than calling getinfo.
+
+        """
+        return self.fs.getinfo(self.path)
+
+
 def synchronize(func):
     """Decorator to synchronize a method on self._lock."""
     @wraps(func)
@@ -521,23 +587,55 @@ class FS(object):
 
         """
         path = normpath(path)
+        if dirs_only and files_only:
+            raise ValueError("dirs_only and files_only can not both be True")
 
-        def getinfo(p):
+        entries = self.scandir(path)
+        if dirs_only:
+            entries = [e for e in entries if e.is_dir()]
+        elif files_only:
+            entries = [e for e in entries if e.is_file()]
+        if wildcard is not None:
+            if not callable(wildcard):
+                wildcard_re = re.compile(fnmatch.translate(wildcard))
+                wildcard = lambda fn: bool(wildcard_re.match(fn))
+            entries = [e for e in entries if wildcard(e.name)]
+
+        def getinfo(entry):
             try:
-                if full or absolute:
-                    return self.getinfo(p)
-                else:
-                    return self.getinfo(pathjoin(path, p))
+                return entry.getinfo()
             except FSError:
                 return {}
 
-        return [(p, getinfo(p))
-                for p in self.listdir(path,
-                                      wildcard=wildcard,
-                                      full=full,
-                                      absolute=absolute,
-                                      dirs_only=dirs_only,
-                                      files_only=files_only)]
+        if full:
+            return [(e.path, getinfo(e)) for e in entries]
+        elif absolute:
+            return [(abspath(e.path), getinfo(e)) for e in entries]
+        return [(e.name, getinfo(e)) for e in entries]
+
+    def scandir(self, path="./"):
+        """Get an iterator of :class:`~fs.base.ScandirEntry` objects for the
+        contents of a directory.
+
+        Each entry knows whether it is a file or a directory, and may also
+        contain the info dict for the entry, if the filesystem was able to
+        retrieve it along with the listing. Filesystems should implement
+        this method when they can list a directory and the types of its
+        entries in a single operation; the default implementation calls
+        :meth:`~fs.base.FS.listdir`.
+
+        :param path: path of the directory to list
+
+        :rtype: iterator of :class:`~fs.base.ScandirEntry` objects
+
+        :raises `fs.errors.ResourceNotFoundError`: If the path is not found
+        :raises `fs.errors.ResourceInvalidError`: If the path exists, but is not a directory
+
+        """
+        path = normpath(path)
+        names = self.listdir(path)
+        dirs = set(self.listdir(path, dirs_only=True))
+        return iter([ScandirEntry(self, path, name, name in dirs) for name in names])
 
     def _listdir_helper(self,
                         path,
@@ -972,26 +1070,50 @@ class FS(object):
 
         """
 
-        path = normpath(path)
-
-        if not self.exists(path):
-            raise ResourceNotFoundError(path)
-
-        def listdir(path, *args, **kwargs):
-            if ignore_errors:
-                try:
-                    return self.listdir(path, *args, **kwargs)
-                except:
-                    return []
-            else:
-                return self.listdir(path, *args, **kwargs)
-
         if wildcard is None:
             wildcard = lambda f: True
         elif not callable(wildcard):
             wildcard_re = re.compile(fnmatch.translate(wildcard))
             wildcard = lambda fn: bool(wildcard_re.match(fn))
 
+        for current_path, entries in self._walk_entries(path, dir_wildcard, search, ignore_errors):
+            yield (current_path, [entry.name for entry in entries
+                                  if entry.is_file() and wildcard(entry.name)])
+
+    def _walk_entries(self, path, dir_wildcard, search, ignore_errors, scandir=None):
+        """Walks a directory tree, yielding the path of each directory and a
+        list of the :class:`~fs.base.ScandirEntry` objects it contains.
+
+        This implements the directory traversal for :meth:`walk`,
+        :meth:`walkinfo` and :meth:`walkfilesinfo`, and takes the same
+        arguments.  Subclasses may pass `scandir`, a callable that takes a
+        directory path and returns a list of its entries, to change how each
+        directory is listed; the root is then not checked beforehand, and a
+        missing root fails its listing instead.
+
+        """
+        path = normpath(path)
+
+        if scandir is None:
+            if not self.exists(path):
+                raise ResourceNotFoundError(path)
+            list_entries = lambda dir_path: list(self.scandir(dir_path))
+        else:
+            list_entries = scandir
+
+        def list_dir(dir_path):
+            try:
+                return list_entries(dir_path)
+            except ResourceNotFoundError:
+                if scandir is not None and dir_path == path:
+                    raise
+                # Could happen if another thread / process deletes something whilst we are walking
+                return []
+            except:
+                if ignore_errors:
+                    return []
+                raise
+
         if dir_wildcard is None:
             dir_wildcard = lambda f: True
         elif not callable(dir_wildcard):
@@ -1002,37 +1124,23 @@ class FS(object):
             dirs = [path]
             dirs_append = dirs.append
             dirs_pop = dirs.pop
-            isdir = self.isdir
             while dirs:
                 current_path = dirs_pop()
-                paths = []
-                paths_append = paths.append
-                try:
-                    for filename in listdir(current_path, dirs_only=True):
-                        path = pathcombine(current_path, filename)
-                        if dir_wildcard(path):
-                            dirs_append(path)
-                    for filename in listdir(current_path, files_only=True):
-                        path = pathcombine(current_path, filename)
-                        if wildcard(filename):
-                            paths_append(filename)
-                except ResourceNotFoundError:
-                    # Could happen if another thread / process deletes something whilst we are walking
-                    pass
-
-                yield (current_path, paths)
+                entries = list_dir(current_path)
+                for entry in entries:
+                    if entry.is_dir() and dir_wildcard(entry.path):
+                        dirs_append(entry.path)
+                yield (current_path, entries)
 
         elif search == "depth":
 
             def recurse(recurse_path):
-                try:
-                    for path in listdir(recurse_path, wildcard=dir_wildcard, full=True, dirs_only=True):
-                        for p in recurse(path):
+                entries = list_dir(recurse_path)
+                for entry in entries:
+                    if entry.is_dir() and dir_wildcard(entry.name):
+                        for p in recurse(entry.path):
                             yield p
-                except ResourceNotFoundError:
-                    # Could happen if another thread / process deletes something whilst we are walking
-                    pass
-                yield (recurse_path, listdir(recurse_path, wildcard=wildcard, files_only=True))
+                yield (recurse_path, entries)
 
             for p in recurse(path):
                 yield p
@@ -1094,6 +1202,89 @@ class FS(object):
         for p, _files in self.walk(path, dir_wildcard=wildcard, search=search, ignore_errors=ignore_errors):
             yield p
 
+    def walkinfo(self,
+                 path="/",
+                 wildcard=None,
+                 dir_wildcard=None,
+                 search="breadth",
+                 ignore_errors=False):
+        """Like the 'walk' method, but yields the path and info dict of every
+        file and directory in the tree.
+
+        Where the filesystem retrieves the info dict along with the directory
+        listing (see :meth:`~fs.base.FS.scandir`), this requires no further
+        queries to the filesystem.
+
+        :param path: root path to start walking
+        :type path: string
+        :param wildcard: if given, only return paths that match this wildcard
+        :type wildcard: A string containing a wildcard (e.g. `*.txt`) or a callable that takes the name and returns a boolean
+        :param dir_wildcard: if given, only walk directories that match the wildcard
+        :type dir_wildcard: A string containing a wildcard (e.g. `*.txt`) or a callable that takes the directory name and returns a boolean
+        :param search: a string identifying the method used to walk the directories. There are two such methods:
+
+             * ``"breadth"`` yields paths in the top directories first
+             * ``"depth"`` yields the deepest paths first
+
+        :param ignore_errors: ignore any errors reading the directory
+        :type ignore_errors: bool
+
+        :rtype: iterator of (path, info) tuples
+
+        """
+        return self._walk_info(path, wildcard, dir_wildcard, search, ignore_errors, False)
+
+    def walkfilesinfo(self,
+                      path="/",
+                      wildcard=None,
+                      dir_wildcard=None,
+                      search="breadth",
+                      ignore_errors=False):
+        """Like the 'walkfiles' method, but yields a tuple of the path and
+        info dict for each file.
+
+        :param path: root path to start walking
+        :type path: string
+        :param wildcard: if given, only return files that match this wildcard
+        :type wildcard: A string containing a wildcard (e.g. `*.txt`) or a callable that takes the file name and returns a boolean
+        :param dir_wildcard: if given, only walk directories that match the wildcard
+        :type dir_wildcard: A string containing a wildcard (e.g. `*.txt`) or a callable that takes the directory name and returns a boolean
+        :param search: a string identifying the method used to walk the directories. There are two such methods:
+
+             * ``"breadth"`` yields paths in the top directories first
+             * ``"depth"`` yields the deepest paths first
+
+        :param ignore_errors: ignore any errors reading the directory
+        :type ignore_errors: bool
+
+        :rtype: iterator of (path, info) tuples
+
+        """
+        return self._walk_info(path, wildcard, dir_wildcard, search, ignore_errors, True)
+
+    def _walk_info(self, path, wildcard, dir_wildcard, search, ignore_errors, files_only):
+        if wildcard is None:
+            wildcard = lambda f: True
+        elif not callable(wildcard):
+            wildcard_re = re.compile(fnmatch.translate(wildcard))
+            wildcard = lambda fn: bool(wildcard_re.match(fn))
+
+        for _dir_path, entries in self._walk_entries(path, dir_wildcard, search, ignore_errors):
+            for entry in entries:
+                if files_only and not entry.is_file():
+                    continue
+                if not wildcard(entry.name):
+                    continue
+                try:
+                    info = entry.getinfo()
+                except ResourceNotFoundError:
+                    continue
+                except:
+                    if ignore_errors:
+                        continue
+                    raise
+                yield (entry.path, info)
+
     def getsize(self, path):
         """Returns the size (in bytes) of a resource.
 
@@ -1155,7 +1346,7 @@ class FS(object):
     @convert_os_errors
     def _shutil_copyfile(cls, src_syspath, dst_syspath):
         try:
-            shutil.copyfile(src_syspath, dst_syspath)
+            fastcopy.copyfile(src_syspath, dst_syspath)
         except IOError, e:
             #  shutil reports ENOENT when a parent directory is missing
             if getattr(e, "errno", None) == errno.ENOENT:
@@ -1166,6 +1357,18 @@ class FS(object):
     @classmethod
     @convert_os_errors
     def _shutil_movefile(cls, src_syspath, dst_syspath):
+        if not os.path.isdir(dst_syspath):
+            try:
+                os.rename(src_syspath, dst_syspath)
+                return
+            except OSError, e:
+                #  Moving across devices; shutil.move would fall back to a
+                #  slower copy than fastcopy
+                if e.errno == errno.EXDEV:
+                    fastcopy.copyfile(src_syspath, dst_syspath)
+                    shutil.copystat(src_syspath, dst_syspath)
+                    os.unlink(src_syspath)
+                    return
         shutil.move(src_syspath, dst_syspath)
 
 
@@ -1,58 +1,18 @@
 #!/usr/bin/env python
-from fs.utils import copyfile, copyfile_non_atomic
-from fs.path import pathjoin, iswildcard
+from fs.utils import TreeCopier
+from fs.path import iswildcard
 from fs.commands.runner import Command
 import sys
-import Queue as queue
-import time
-import threading
-
-
-class FileOpThread(threading.Thread):
-
-    def __init__(self, action, name, dest_fs, queue, on_done, on_error):
-        self.action = action
-        self.dest_fs = dest_fs
-        self.queue = queue
-        self.on_done = on_done
-        self.on_error = on_error
-        self.finish_event = threading.Event()
-        super(FileOpThread, self).__init__()
-
-    def run(self):
-
-        while not self.finish_event.isSet():
-            try:
-                path_type, fs, path, dest_path = self.queue.get(timeout=0.1)
-            except queue.Empty:
-                continue
-            try:
-                if path_type == FScp.DIR:
-                    self.dest_fs.makedir(path, recursive=True, allow_recreate=True)
-                else:
-                    self.action(fs, path, self.dest_fs, dest_path, overwrite=True)
-            except Exception, e:
-                self.on_error(e)
-                self.queue.task_done()
-                break
-            else:
-                self.queue.task_done()
-                self.on_done(path_type, fs, path, self.dest_fs, dest_path)
-
 
 
 class FScp(Command):
 
-    DIR, FILE = 0, 1
+    DIR, FILE = TreeCopier.DIR, TreeCopier.FILE
 
     usage = """fscp [OPTION]... [SOURCE]... [DESTINATION]
 Copy SOURCE to DESTINATION"""
 
-    def get_action(self):
-        if self.options.threads > 1:
-            return copyfile_non_atomic
-        else:
-            return copyfile
+    move = False
 
     def get_verb(self):
         return 'copying...'
@@ -65,6 +25,9 @@ Copy SOURCE to DESTINATION"""
                             help="number of threads to use", type="int", metavar="THREAD_COUNT")
         return optparse
 
+    def get_copier(self):
+        return TreeCopier(workers=max(1, self.options.threads), move=self.move)
+
     def do_run(self, options, args):
 
         self.options = options
@@ -85,103 +48,66 @@ Copy SOURCE to DESTINATION"""
             dst_fs = dst_fs.makeopendir(dst_path)
             dst_path = None
 
-        copy_fs_paths = []
-
-        progress = options.progress
-
-        if progress:
-            sys.stdout.write(self.progress_bar(len(srcs), 0, 'scanning...'))
-            sys.stdout.flush()
+        copier = self.get_copier()
 
+        #  Check all the sources before anything is copied
+        sources = []
         self.root_dirs = []
-        for i, fs_url in enumerate(srcs):
+        for fs_url in srcs:
             src_fs, src_path = self.open_fs(fs_url)
 
             if src_path is None:
                 src_path = '/'
 
             if iswildcard(src_path):
-                for file_path in src_fs.listdir(wildcard=src_path, full=True):
-                    copy_fs_paths.append((self.FILE, src_fs, file_path, file_path))
-
+                sources.append((None, src_fs, src_path))
+            elif src_fs.isdir(src_path):
+                self.root_dirs.append((src_fs, src_path))
+                sources.append((self.DIR, src_fs, src_path))
+            elif src_fs.exists(src_path):
+                sources.append((self.FILE, src_fs, src_path))
             else:
-                if src_fs.isdir(src_path):
-                    self.root_dirs.append((src_fs, src_path))
-                    src_sub_fs = src_fs.opendir(src_path)
-                    for dir_path, file_paths in src_sub_fs.walk():
-                        if dir_path not in ('', '/'):
-                            copy_fs_paths.append((self.DIR, src_sub_fs, dir_path, dir_path))
-                        sub_fs = src_sub_fs.opendir(dir_path)
-                        for file_path in file_paths:
-                            copy_fs_paths.append((self.FILE, sub_fs, file_path, pathjoin(dir_path, file_path)))
+                self.error('%s is not a file or directory\n' % src_path)
+                return 1
+
+        #  Files are copied while the sources are still being scanned
+        def iter_tasks():
+            for path_type, src_fs, src_path in sources:
+                if path_type is None:
+                    for file_path in src_fs.listdir(wildcard=src_path, full=True):
+                        yield (self.FILE, src_fs, file_path, dst_fs, file_path)
+                elif path_type == self.DIR:
+                    for task in copier.tree_tasks(src_fs, src_path, dst_fs, '/'):
+                        yield task
                 else:
-                    if src_fs.exists(src_path):
-                        copy_fs_paths.append((self.FILE, src_fs, src_path, src_path))
-                    else:
-                        self.error('%s is not a file or directory\n' % src_path)
-                        return 1
-
-            if progress:
-                sys.stdout.write(self.progress_bar(len(srcs), i + 1, 'scanning...'))
-                sys.stdout.flush()
+                    yield (self.FILE, src_fs, src_path, dst_fs, src_path)
 
-        if progress:
-            sys.stdout.write(self.progress_bar(len(copy_fs_paths), 0, self.get_verb()))
+        if options.progress:
+            sys.stdout.write(self.progress_bar(None, 0, 'scanning...'))
             sys.stdout.flush()
 
-        if self.options.threads > 1:
-            copy_fs_dirs = [r for r in copy_fs_paths if r[0] == self.DIR]
-            copy_fs_paths = [r for r in copy_fs_paths if r[0] == self.FILE]
-            for path_type, fs, path, dest_path in copy_fs_dirs:
-                dst_fs.makedir(path, allow_recreate=True, recursive=True)
-
-        self.lock = threading.RLock()
-
-        self.total_files = len(copy_fs_paths)
-        self.done_files = 0
-
-        file_queue = queue.Queue()
-        threads = [FileOpThread(self.get_action(),
-                                'T%i' % i,
-                                dst_fs,
-                                file_queue,
-                                self.on_done,
-                                self.on_error)
-                        for i in xrange(options.threads)]
-
-        for thread in threads:
-            thread.start()
-
         self.action_errors = []
+        self.total_files = None
+        self.done_files = 0
         complete = False
         try:
-            enqueue = file_queue.put
-            for resource in copy_fs_paths:
-                enqueue(resource)
-
-            while not file_queue.empty():
-                time.sleep(0)
-                if self.any_error():
-                    raise SystemExit
-            # Can't use queue.join here, or KeyboardInterrupt will not be
-            # caught until the queue is finished
-            #file_queue.join()
+            for task, done_files, total_files in copier.icopy(iter_tasks()):
+                self.done_files = done_files
+                self.total_files = total_files
+                self.on_done(*task)
+            complete = True
 
         except KeyboardInterrupt:
             options.progress = False
             self.output("\nCancelling...\n")
 
-        except SystemExit:
+        except Exception, e:
             options.progress = False
+            self.action_errors.append(e)
 
         finally:
             sys.stdout.flush()
-            for thread in threads:
-                thread.finish_event.set()
-            for thread in threads:
-                thread.join()
-            complete = True
-            if not self.any_error():
+            if complete:
                 self.post_actions()
 
         dst_fs.close()
@@ -192,7 +118,7 @@ Copy SOURCE to DESTINATION"""
             sys.stdout.flush()
         else:
             if complete and options.progress:
-                sys.stdout.write(self.progress_bar(self.total_files, self.done_files, ''))
+                sys.stdout.write(self.progress_bar(self.done_files, self.done_files, ''))
                 sys.stdout.write('\n')
                 sys.stdout.flush()
 
@@ -200,39 +126,26 @@ Copy SOURCE to DESTINATION"""
         pass
 
     def on_done(self, path_type, src_fs, src_path, dst_fs, dst_path):
-        self.lock.acquire()
-        try:
-            if self.options.verbose:
-                if path_type == self.DIR:
+        if self.options.verbose:
+            if path_type == self.DIR:
+                if dst_path not in ('', '/'):
                     print "mkdir %s" % dst_fs.desc(dst_path)
-                else:
-                    print "%s -> %s" % (src_fs.desc(src_path), dst_fs.desc(dst_path))
-            elif self.options.progress:
-                self.done_files += 1
-                sys.stdout.write(self.progress_bar(self.total_files, self.done_files, self.get_verb()))
-                sys.stdout.flush()
-        finally:
-            self.lock.release()
-
-    def on_error(self, e):
-        self.lock.acquire()
-        try:
-            self.action_errors.append(e)
-        finally:
-            self.lock.release()
-
-    def any_error(self):
-        self.lock.acquire()
-        try:
-            return bool(self.action_errors)
-        finally:
-            self.lock.release()
+            else:
+                print "%s -> %s" % (src_fs.desc(src_path), dst_fs.desc(dst_path))
+        elif self.options.progress:
+            verb = self.get_verb() if self.total_files is not None else 'scanning...'
+            sys.stdout.write(self.progress_bar(self.total_files, self.done_files, verb))
+            sys.stdout.flush()
 
     def progress_bar(self, total, remaining, msg=''):
         bar_width = 20
         throbber = '|/-\\'
         throb = throbber[remaining % len(throbber)]
-        done = float(remaining) / total
+        if total is None:
+            #  Still counting the files
+            msg = '%s %i' % (msg, remaining)
+            return '\r%s[%s] %s\r' % (throb, ' ' * bar_width, msg.ljust(20).lstrip())
+        done = float(remaining) / total if total else 1.0
 
         done_steps = int(done * bar_width)
         bar_steps = ('#' * done_steps).ljust(bar_width)
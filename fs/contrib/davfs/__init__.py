@@ -40,7 +40,7 @@ import fs
 from fs.base import *
 from fs.path import *
 from fs.errors import *
-from fs.remote import RemoteFileBuffer
+from fs.remote import RemoteFileBuffer, RemoteRangeReader
 from fs import iotools
 
 from fs.contrib.davfs.util import *
@@ -396,6 +396,15 @@ class DAVFS(FS):
             return contents
         #  For everything else, use a RemoteFileBuffer.
         #  This will take care of closing the socket when it's done.
+        #  If the server supports it, only the byte ranges that are used
+        #  get downloaded.
+        if hasattr(contents,"getheader"):
+            size = contents.getheader("Content-Length",None)
+            if size is not None and contents.getheader("Accept-Ranges","") == "bytes":
+                try:
+                    contents = _DAVRangeReader(self,path,contents,int(size))
+                except ValueError:
+                    pass
         return RemoteFileBuffer(self,path,mode,contents)
 
     def exists(self,path):
@@ -829,6 +838,46 @@ class DAVFS(FS):
 
 
 
+class _DAVRangeReader(RemoteRangeReader):
+    """RemoteRangeReader for a file on a DAV server.
+
+    Reads carrying on from the start of the file are served from the
+    response to the initial GET request; other reads use 'Range' requests.
+    """
+
+    def __init__(self,fs,path,response,size):
+        super(_DAVRangeReader,self).__init__(size)
+        self.fs = fs
+        self.path = path
+        self._response = response
+        self._response_pos = 0
+
+    def read_range(self,offset,length):
+        if self._response is not None:
+            if offset == self._response_pos:
+                data = self._response.read(length)
+                self._response_pos += len(data)
+                return data
+            self._response.close()
+            self._response = None
+        headers = {"Range":"bytes=%d-%d" % (offset,offset + length - 1)}
+        response = self.fs._request(self.path,"GET","",headers)
+        try:
+            if response.status == 206:
+                return response.read(length)
+            if response.status == 200:
+                #  The server ignored the range and sent the whole file
+                return response.read(offset + length)[offset:]
+            raise_generic_error(response,"open",self.path)
+        finally:
+            response.close()
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+
 def raise_generic_error(response,opname,path):
     if response.status == 404:
         raise ResourceNotFoundError(path,details=response.read())
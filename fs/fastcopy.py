@@ -0,0 +1,125 @@
+"""
+fs.fastcopy
+===========
+
+Copy files between two system paths without passing the data through
+Python, where the operating system allows it.
+
+The following methods are tried in turn, falling back to the next one if
+the platform or filesystem doesn't support it:
+
+    * a reflink (copy-on-write clone) with the FICLONE ioctl, on Linux
+      filesystems that support it (btrfs, xfs, ...)
+    * ``os.copy_file_range``, which copies within the kernel (and may be
+      offloaded to the server on network filesystems)
+    * ``os.sendfile``
+    * a plain chunked copy, as done by ``shutil.copyfile``
+
+"""
+
+from __future__ import with_statement
+
+import os
+import sys
+import errno
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+#  From linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+#  Errors meaning that a method isn't supported for this pair of files,
+#  so the next one should be tried.
+_UNSUPPORTED_ERRNOS = set(getattr(errno, name) for name in
+                          ('ENOSYS', 'EXDEV', 'EINVAL', 'ENOTSUP', 'EOPNOTSUPP',
+                           'ENOTTY', 'EBADF', 'ETXTBSY', 'EPERM')
+                          if hasattr(errno, name))
+
+_CHUNK_SIZE = 1024 * 1024 * 8
+
+
+def _reflink(src_fd, dst_fd, size):
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return 0
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except (IOError, OSError), e:
+        if e.errno in _UNSUPPORTED_ERRNOS:
+            return 0
+        raise
+    return size
+
+
+def _copy_file_range(src_fd, dst_fd, size):
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is None:
+        return 0
+    copied = 0
+    while copied < size:
+        try:
+            count = copy_file_range(src_fd, dst_fd, min(size - copied, _CHUNK_SIZE))
+        except OSError, e:
+            if e.errno in _UNSUPPORTED_ERRNOS:
+                break
+            raise
+        if not count:
+            break
+        copied += count
+    return copied
+
+
+def _sendfile(src_fd, dst_fd, size, offset):
+    sendfile = getattr(os, 'sendfile', None)
+    if sendfile is None or not sys.platform.startswith('linux'):
+        #  Only Linux can sendfile to a regular file
+        return offset
+    while offset < size:
+        try:
+            count = sendfile(dst_fd, src_fd, offset, min(size - offset, _CHUNK_SIZE))
+        except OSError, e:
+            if e.errno in _UNSUPPORTED_ERRNOS:
+                break
+            raise
+        if not count:
+            break
+        offset += count
+    return offset
+
+
+def copyfile(src_syspath, dst_syspath, chunk_size=1024 * 64):
+    """Copy the contents of one system file to another.
+
+    This behaves like ``shutil.copyfile``, but avoids reading the data in to
+    Python where possible.
+
+    :param src_syspath: Path of the source file
+    :param dst_syspath: Path of the destination file (will be overwritten)
+    :param chunk_size: Size of chunks to copy if no faster method is available
+
+    """
+    if os.path.exists(dst_syspath) and os.path.samefile(src_syspath, dst_syspath):
+        raise shutil.Error("`%s` and `%s` are the same file" % (src_syspath, dst_syspath))
+    with open(src_syspath, 'rb') as src_file:
+        with open(dst_syspath, 'wb') as dst_file:
+            src_fd = src_file.fileno()
+            dst_fd = dst_file.fileno()
+            size = os.fstat(src_fd).st_size
+            copied = 0
+            if size:
+                copied = _reflink(src_fd, dst_fd, size)
+                if not copied:
+                    copied = _copy_file_range(src_fd, dst_fd, size)
+                if copied < size:
+                    copied = _sendfile(src_fd, dst_fd, size, copied)
+            if copied >= size and os.fstat(src_fd).st_size == size:
+                return
+            #  Copy whatever is left (or the whole file, if it changed size
+            #  while we were copying it) the old-fashioned way
+            src_file.seek(copied)
+            dst_file.seek(copied)
+            dst_file.truncate()
+            shutil.copyfileobj(src_file, dst_file, chunk_size)
@@ -6,6 +6,8 @@ FTPFS is a filesystem for accessing an FTP server (uses ftplib in standard libra
 
 """
 
+from __future__ import with_statement
+
 __all__ = ['FTPFS']
 
 import sys
@@ -15,6 +17,7 @@ from fs.base import *
 from fs.errors import *
 from fs.path import pathsplit, abspath, dirname, recursepath, normpath, pathjoin, isbase
 from fs import iotools
+from fs.utils import TreeCopier
 
 from ftplib import FTP, error_perm, error_temp, error_proto, error_reply
 
@@ -29,6 +32,7 @@ import calendar
 
 from socket import error as socket_error
 from fs.local_functools import wraps
+from fs.local_collections import OrderedDict
 
 import six
 from six import PY3, b
@@ -616,7 +620,14 @@ def fileftperrors(f):
 
 class _FTPFile(object):
 
-    """ A file-like that provides access to a file being streamed over ftp."""
+    """ A file-like that provides access to a file being streamed over ftp.
+
+    A read or write that fails because the connection was lost is resumed
+    on a new connection, up to the FTPFS's `transfer_retries` times: reads
+    restart the download at the current position with REST, and writes ask
+    the server how much of the file it has and continue with APPE.
+
+    """
 
     blocksize = 1024 * 64
 
@@ -634,55 +645,78 @@ class _FTPFile(object):
         if 'r' in mode or 'a' in mode:
             self.file_size = ftpfs.getsize(path)
         self.conn = None
+        self._eof = False
 
         self._start_file(mode, _encode(self.path))
 
-    @fileftperrors
-    def _start_file(self, mode, path):
-        self.read_pos = 0
-        self.write_pos = 0
+    def _start_file(self, mode, path, offset=None):
+        """Start the transfer, at 'offset' bytes into the file if given."""
+        if self.ftp is None:
+            self.ftp = self.ftpfs._pool.acquire()
+        self.ftp.voidcmd('TYPE I')
         if 'r' in mode:
-            self.ftp.voidcmd('TYPE I')
-            self.conn = self.ftp.transfercmd('RETR ' + path, None)
+            self.read_pos = offset or 0
+            self.conn = self.ftp.transfercmd('RETR ' + path, offset or None)
 
         else:#if 'w' in mode or 'a' in mode:
-            self.ftp.voidcmd('TYPE I')
-            if 'a' in mode:
+            if offset is not None:
+                self.write_pos = offset
+                self.conn = self.ftp.transfercmd('APPE ' + path)
+            elif 'a' in mode:
                 self.write_pos = self.file_size
                 self.conn = self.ftp.transfercmd('APPE ' + path)
             else:
+                self.write_pos = 0
                 self.conn = self.ftp.transfercmd('STOR ' + path)
 
+    def _drop_connection(self):
+        """Abandon the transfer, closing its control connection."""
+        conn, self.conn = self.conn, None
+        ftp, self.ftp = self.ftp, None
+        if conn is not None:
+            try:
+                conn.close()
+            except socket_error:
+                pass
+        if ftp is not None:
+            self.ftpfs._pool.release(ftp, discard=True)
+
     @fileftperrors
     def read(self, size=None):
-        if self.conn is None:
+        if self._eof:
             return b('')
 
         chunks = []
         if size is None or size < 0:
-            while 1:
-                data = self.conn.recv(self.blocksize)
+            remaining_bytes = -1
+        else:
+            remaining_bytes = size
+        retries = self.ftpfs.transfer_retries
+        while remaining_bytes:
+            if remaining_bytes < 0:
+                read_size = self.blocksize
+            else:
+                read_size = min(remaining_bytes, self.blocksize)
+            try:
+                if self.conn is None:
+                    self._start_file(self.mode, _encode(self.path), self.read_pos)
+                data = self.conn.recv(read_size)
                 if not data:
                     self.conn.close()
                     self.conn = None
                     self.ftp.voidresp()
+                    self._eof = True
                     break
-                chunks.append(data)
-                self.read_pos += len(data)
-            return b('').join(chunks)
-
-        remaining_bytes = size
-        while remaining_bytes:
-            read_size = min(remaining_bytes, self.blocksize)
-            data = self.conn.recv(read_size)
-            if not data:
-                self.conn.close()
-                self.conn = None
-                self.ftp.voidresp()
-                break
+            except (socket_error, EOFError, error_temp):
+                if not retries:
+                    raise
+                retries -= 1
+                self._drop_connection()
+                continue
             chunks.append(data)
             self.read_pos += len(data)
-            remaining_bytes -= len(data)
+            if remaining_bytes > 0:
+                remaining_bytes -= len(data)
 
         return b('').join(chunks)
 
@@ -690,11 +724,38 @@ class _FTPFile(object):
     def write(self, data):
 
         data_pos = 0
+        data_start = self.write_pos
         remaining_data = len(data)
+        retries = self.ftpfs.transfer_retries
 
         while remaining_data:
             chunk_size = min(remaining_data, self.blocksize)
-            self.conn.sendall(data[data_pos:data_pos+chunk_size])
+            try:
+                if self.conn is None:
+                    self._start_file(self.mode, _encode(self.path), self.write_pos)
+                self.conn.sendall(data[data_pos:data_pos+chunk_size])
+            except (socket_error, EOFError, error_temp):
+                if not retries:
+                    raise
+                retries -= 1
+                exc_info = sys.exc_info()
+                self._drop_connection()
+                #  Carry on from wherever the server got to, as long as
+                #  that's within the data we still have.  If that can't be
+                #  found out, report the error that interrupted the write.
+                try:
+                    self.ftp = self.ftpfs._pool.acquire()
+                    self.ftp.voidcmd('TYPE I')
+                    server_size = self.ftp.size(_encode(self.path))
+                except (socket_error, EOFError, error_reply, error_temp, error_perm, error_proto):
+                    self._drop_connection()
+                    server_size = None
+                if server_size is None or not data_start <= server_size <= self.write_pos + chunk_size:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+                data_pos = server_size - data_start
+                remaining_data = len(data) - data_pos
+                self.write_pos = server_size
+                continue
             data_pos += chunk_size
             remaining_data -= chunk_size
             self.write_pos += chunk_size
@@ -712,44 +773,33 @@ class _FTPFile(object):
 
     @fileftperrors
     def seek(self, pos, where=fs.SEEK_SET):
-        # Ftp doesn't support a real seek, so we close the transfer and resume
-        # it at the new position with the REST command
-        # I'm not sure how reliable this method is!
-        if self.file_size is None:
+        # Ftp doesn't support a real seek, so the download is restarted at
+        # the new position with the REST command, when it is next read from
+        if 'r' not in self.mode:
             raise ValueError("Seek only works with files open for read")
 
-        self._lock.acquire()
-        try:
-
-            current = self.tell()
-            new_pos = None
-            if where == fs.SEEK_SET:
-                new_pos = pos
-            elif where == fs.SEEK_CUR:
-                new_pos = current + pos
-            elif where == fs.SEEK_END:
-                new_pos = self.file_size + pos
-            if new_pos < 0:
-                raise ValueError("Can't seek before start of file")
-
-            if self.conn is not None:
-                self.conn.close()
-
-        finally:
-            self._lock.release()
-
-        self.close()
-        self._lock.acquire()
-        try:
-            self.ftp = self.ftpfs._open_ftp()
-            self.ftp.sendcmd('TYPE I')
-            self.ftp.sendcmd('REST %i' % (new_pos))
-            self.__init__(self.ftpfs, self.ftp, self.path, self.mode)
-            self.read_pos = new_pos
-        finally:
-            self._lock.release()
+        current = self.tell()
+        new_pos = None
+        if where == fs.SEEK_SET:
+            new_pos = pos
+        elif where == fs.SEEK_CUR:
+            new_pos = current + pos
+        elif where == fs.SEEK_END:
+            new_pos = self.file_size + pos
+        if new_pos < 0:
+            raise ValueError("Can't seek before start of file")
+        if new_pos == current:
+            return
 
-        #raise UnsupportedError('ftp seek')
+        if self.conn is not None:
+            if current < new_pos <= current + self.blocksize:
+                # A short skip forward is cheaper to read than a restart
+                self.read(new_pos - current)
+                self.read_pos = new_pos
+                return
+            self._drop_connection()
+        self.read_pos = new_pos
+        self._eof = False
 
     @fileftperrors
     def tell(self):
@@ -777,7 +827,7 @@ class _FTPFile(object):
             if read_f is not None:
                 read_f.close()
 
-        self.ftp = self.ftpfs._open_ftp()
+        self.ftp = self.ftpfs._pool.acquire()
         self.mode = 'w'
         self.__init__(self.ftpfs, self.ftp, _encode(self.path), self.mode)
         #self._start_file(self.mode, self.path)
@@ -788,21 +838,35 @@ class _FTPFile(object):
 
     @fileftperrors
     def close(self):
-        if 'w' in self.mode or 'a' in self.mode or '+' in self.mode:
-            self.ftpfs._on_file_written(self.path)
-        if self.conn is not None:
-            try:
-                self.conn.close()
-                self.conn = None
-                self.ftp.voidresp()
-            except error_temp, error_perm:
-                pass
-        if self.ftp is not None:
-            try:
-                self.ftp.close()
-            except error_temp, error_perm:
-                pass
+        ftp, self.ftp = self.ftp, None
+        conn, self.conn = self.conn, None
         self.closed = True
+        try:
+            if ftp is not None:
+                self._finish_transfer(ftp, conn)
+        finally:
+            #  The parent listing is refreshed once the server has replied,
+            #  so that a listing read during the upload isn't kept
+            if 'w' in self.mode or 'a' in self.mode or '+' in self.mode:
+                self.ftpfs._on_file_written(self.path)
+
+    def _finish_transfer(self, ftp, conn):
+        #  The control connection goes back to the pool, unless a download
+        #  was abandoned part way; servers differ in how they reply to that,
+        #  so the connection can't safely be reused.
+        reusable = False
+        try:
+            if conn is not None:
+                conn.close()
+                if 'r' in self.mode:
+                    return
+                try:
+                    ftp.voidresp()
+                except (error_temp, error_perm):
+                    pass
+            reusable = True
+        finally:
+            self.ftpfs._pool.release(ftp, discard=not reusable)
 
     def next(self):
         return self.readline()
@@ -838,10 +902,142 @@ def _encode(s):
         return s.encode('utf-8')
     return s
 
+class _FTPConnectionPool(object):
+    """A pool of logged-in FTP control connections.
+
+    Connections that have been idle for more than 'keepalive' seconds are
+    checked with a NOOP before they are reused, and replaced if the server
+    has dropped them.  Up to 'max_idle' idle connections are kept; any more
+    are closed.
+    """
+
+    def __init__(self, connect, max_idle=4, keepalive=30):
+        self.connect = connect
+        self.max_idle = max_idle
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def acquire(self):
+        """Get a connection for the exclusive use of the caller."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                ftp, released_time = self._idle.pop()
+            if time.time() - released_time < self.keepalive:
+                return ftp
+            try:
+                ftp.voidcmd('NOOP')
+            except (socket_error, EOFError, error_reply, error_temp, error_perm, error_proto):
+                self._discard(ftp)
+            else:
+                return ftp
+        return self.connect()
+
+    def release(self, ftp, discard=False):
+        """Return a connection to the pool, or close it if 'discard' is True."""
+        if not discard:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append((ftp, time.time()))
+                    return
+        self._discard(ftp)
+
+    def close(self):
+        """Close all the idle connections."""
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for ftp, _released_time in idle:
+            self._discard(ftp)
+
+    @staticmethod
+    def _discard(ftp):
+        try:
+            ftp.close()
+        except (socket_error, EOFError):
+            pass
+
+
+def _get_features(ftp):
+    """Get the features an FTP server reports in reply to FEAT."""
+    features = dict()
+    try:
+        response = ftp.sendcmd("FEAT")
+        if response[:3] == "211":
+            for line in response.splitlines()[1:]:
+                if line[3] == "211":
+                    break
+                if line[0] != ' ':
+                    break
+                parts = line[1:].partition(' ')
+                features[parts[0].upper()] = parts[2]
+    except error_perm:
+        # some FTP servers may not support FEAT
+        pass
+    return features
+
+def _is_symlink(info):
+    return info['try_retr'] and info['try_cwd'] and info.has_key('target')
+
 class _DirCache(dict):
-    def __init__(self):
+    """Directory listings read by FTPFS, keyed by path.
+
+    With a 'timeout', a listing expires that many seconds after it was read.
+    With a 'max_size', the least recently used listings are dropped so that
+    no more than that many are kept.
+    """
+
+    def __init__(self, timeout=None, max_size=None):
         super(_DirCache, self).__init__()
         self.count = 0
+        self.timeout = timeout
+        self.max_size = max_size
+        self._read_times = OrderedDict()
+
+    def get(self, path, default=None):
+        read_time = self._read_times.pop(path, None)
+        if read_time is None:
+            return default
+        if self.timeout is not None and time.time() - read_time > self.timeout:
+            dict.pop(self, path, None)
+            return default
+        #  Move it to the end, as the most recently used
+        self._read_times[path] = read_time
+        return dict.__getitem__(self, path)
+
+    _marker = object()
+
+    def __contains__(self, path):
+        return self.get(path, self._marker) is not self._marker
+
+    def __getitem__(self, path):
+        dirlist = self.get(path, self._marker)
+        if dirlist is self._marker:
+            raise KeyError(path)
+        return dirlist
+
+    def __setitem__(self, path, dirlist):
+        dict.__setitem__(self, path, dirlist)
+        self._read_times.pop(path, None)
+        self._read_times[path] = time.time()
+        if self.max_size is not None:
+            while len(self._read_times) > self.max_size:
+                oldest = next(iter(self._read_times))
+                self.pop(oldest, None)
+
+    def __delitem__(self, path):
+        dict.__delitem__(self, path)
+        self._read_times.pop(path, None)
+
+    def pop(self, path, *default):
+        self._read_times.pop(path, None)
+        return dict.pop(self, path, *default)
+
+    def clear(self):
+        dict.clear(self)
+        self._read_times.clear()
 
     def addref(self):
         self.count += 1
@@ -867,7 +1063,7 @@ class FTPFS(FS):
               'file.read_and_write' : False,
               }
 
-    def __init__(self, host='', user='', passwd='', acct='', timeout=_GLOBAL_DEFAULT_TIMEOUT, port=21, dircache=True, follow_symlinks=False):
+    def __init__(self, host='', user='', passwd='', acct='', timeout=_GLOBAL_DEFAULT_TIMEOUT, port=21, dircache=True, follow_symlinks=False, pool_size=4, keepalive=30, transfer_workers=4, dircache_timeout=None, dircache_size=None, transfer_retries=3):
         """Connect to a FTP server.
 
         :param host: Host to connect to
@@ -880,6 +1076,23 @@ class FTPFS(FS):
             speeding up operations such as `getinfo`, `isdir`, `isfile`, but
             changes to the ftp file structure will not be visible until
             :meth:`~fs.ftpfs.FTPFS.clear_dircache` is called
+        :param dircache_timeout: If given, cached directory listings are kept
+            between calls, and re-read once they are this many seconds old.
+            Changes made through this FTPFS update the cache as they are made
+        :param dircache_size: Maximum number of directory listings to cache,
+            or None for no limit
+        :param transfer_retries: Number of times a file transfer that fails
+            with a lost connection is resumed where it left off
+        :param pool_size: Maximum number of idle connections to keep for
+            file transfers
+        :param keepalive: Idle connections older than this many seconds are
+            checked with a NOOP before they are reused
+        :param transfer_workers: Maximum number of files that copydir
+            transfers at once
+
+        File transfers don't use the connection for directory listings, but
+        take logged-in connections from a pool, so several threads can
+        transfer files at once and most transfers need no new login.
 
         """
 
@@ -893,11 +1106,18 @@ class FTPFS(FS):
         self.timeout = timeout
         self.default_timeout = timeout is _GLOBAL_DEFAULT_TIMEOUT
         self.use_dircache = dircache
+        self.dircache_timeout = dircache_timeout
+        self.dircache_size = dircache_size
         self.follow_symlinks = follow_symlinks
 
         self.use_mlst = False
         self._lock = threading.RLock()
         self._init_dircache()
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.transfer_workers = transfer_workers
+        self.transfer_retries = transfer_retries
+        self._pool = _FTPConnectionPool(self._connect_ftp, pool_size, keepalive)
 
         self._cache_hint = False
         try:
@@ -907,7 +1127,7 @@ class FTPFS(FS):
             raise
 
     def _init_dircache(self):
-        self.dircache = _DirCache()
+        self.dircache = _DirCache(self.dircache_timeout, self.dircache_size)
 
     @synchronize
     def cache_hint(self, enabled):
@@ -919,7 +1139,7 @@ class FTPFS(FS):
     def _leave_dircache(self):
         self.dircache.decref()
         if self.use_dircache:
-            if not self.dircache.count and not self._cache_hint:
+            if not self.dircache.count and not self._cache_hint and self.dircache_timeout is None:
                 self.clear_dircache()
         else:
             self.clear_dircache()
@@ -937,36 +1157,11 @@ class FTPFS(FS):
             if cached_dirlist is not None:
                 return cached_dirlist
         dirlist = {}
-
-        def _get_FEAT(ftp):
-            features = dict()
-            try:
-                response = ftp.sendcmd("FEAT")
-                if response[:3] == "211":
-                    for line in response.splitlines()[1:]:
-                        if line[3] == "211":
-                            break
-                        if line[0] != ' ':
-                            break
-                        parts = line[1:].partition(' ')
-                        features[parts[0].upper()] = parts[2]
-            except error_perm:
-                # some FTP servers may not support FEAT
-                pass
-            return features
-
-        def on_line(line):
-            if not isinstance(line, unicode):
-                line = line.decode('utf-8')
-            info = parse_ftp_list_line(line, self.use_mlst)
-            if info:
-                info = info.__dict__
-                if info['name'] not in ('.', '..'):
-                    dirlist[info['name']] = info
+        on_line = self._dirlist_collector(dirlist)
 
         try:
             encoded_path = _encode(path)
-            ftp_features = _get_FEAT(self.ftp)
+            ftp_features = _get_features(self.ftp)
             if 'MLST' in ftp_features:
                 self.use_mlst = True
                 try:
@@ -987,39 +1182,101 @@ class FTPFS(FS):
                         on_line(list_line)
                 # if it's a dir, then we can send a MLSD
                 if dirlist[dirlist.keys()[0]]['try_cwd']:
-                    dirlist = {}
+                    dirlist.clear()
                     self.ftp.retrlines("MLSD " + encoded_path, on_line)
             else:
                 self.ftp.dir(encoded_path, on_line)
         except error_reply:
             pass
         self.dircache[path] = dirlist
+        if self.follow_symlinks:
+            self._resolve_symlinks(path, dirlist)
+        return dirlist
 
-        def is_symlink(info):
-            return info['try_retr'] and info['try_cwd'] and info.has_key('target')
+    def _dirlist_collector(self, dirlist):
+        """Make a callback that parses listing lines into 'dirlist'."""
+        def on_line(line):
+            if not isinstance(line, unicode):
+                line = line.decode('utf-8')
+            info = parse_ftp_list_line(line, self.use_mlst)
+            if info:
+                info = info.__dict__
+                if info['name'] not in ('.', '..'):
+                    dirlist[info['name']] = info
+        return on_line
 
+    def _resolve_symlinks(self, path, dirlist):
+        """Replace the info of symlinks in a listing with that of their targets."""
         def resolve_symlink(linkpath):
             linkinfo = self.getinfo(linkpath)
             if not linkinfo.has_key('resolved'):
                 linkinfo['resolved'] = linkpath
-            if is_symlink(linkinfo):
+            if _is_symlink(linkinfo):
                 target = linkinfo['target']
                 base, fname = pathsplit(linkpath)
                 return resolve_symlink(pathjoin(base, target))
             else:
                 return linkinfo
 
-        if self.follow_symlinks:
-            for name in dirlist:
-                if is_symlink(dirlist[name]):
-                    target = dirlist[name]['target']
-                    linkinfo = resolve_symlink(pathjoin(path, target))
-                    for key in linkinfo:
-                        if key != 'name':
-                            dirlist[name][key] = linkinfo[key]
-                    del dirlist[name]['target']
+        for name in dirlist:
+            if _is_symlink(dirlist[name]):
+                target = dirlist[name]['target']
+                linkinfo = resolve_symlink(pathjoin(path, target))
+                for key in linkinfo:
+                    if key != 'name':
+                        dirlist[name][key] = linkinfo[key]
+                del dirlist[name]['target']
 
-        return dirlist
+    @ftperrors
+    def cache_tree(self, path="/"):
+        """Read the listing of every directory beneath 'path' into the cache.
+
+        The tree is listed in a single pass, with one MLSD command per
+        directory where the server supports it (or LIST where it doesn't),
+        and without the MLST that a normal lookup sends first.  The
+        listings stay cached if a `dircache_timeout` was given, or within
+        a ``cache_hint(True)`` scope.
+
+        :returns: The number of directories listed
+
+        """
+        path = abspath(normpath(path))
+        if not self.isdir(path):
+            if self.isfile(path):
+                raise ResourceInvalidError(path)
+            raise ResourceNotFoundError(path)
+        use_mlsd = 'MLST' in _get_features(self.ftp)
+        if use_mlsd:
+            self.use_mlst = True
+            try:
+                self.ftp.sendcmd("OPTS MLST type;unique;size;modify;")
+            except error_perm:
+                pass
+
+        num_listed = 0
+        dirs = [path]
+        while dirs:
+            dir_path = dirs.pop()
+            dirlist = {}
+            on_line = self._dirlist_collector(dirlist)
+            try:
+                if use_mlsd:
+                    self.ftp.retrlines("MLSD " + _encode(dir_path), on_line)
+                else:
+                    self.ftp.dir(_encode(dir_path), on_line)
+            except error_perm:
+                # Can't read this directory; leave it to be listed on demand
+                continue
+            except error_reply:
+                pass
+            num_listed += 1
+            self.dircache[dir_path] = dirlist
+            for name, info in dirlist.items():
+                if info['try_cwd'] and not _is_symlink(info):
+                    dirs.append(pathjoin(dir_path, name))
+            if self.follow_symlinks:
+                self._resolve_symlinks(dir_path, dirlist)
+        return num_listed
 
     @synchronize
     def clear_dircache(self, *paths):
@@ -1076,6 +1333,9 @@ class FTPFS(FS):
 
     @ftperrors
     def _open_ftp(self):
+        return self._connect_ftp()
+
+    def _connect_ftp(self):
         try:
             ftp = FTP()
             if self.default_timeout or sys.version_info < (2,6,):
@@ -1087,9 +1347,36 @@ class FTPFS(FS):
             raise RemoteConnectionError(str(e), details=e)
         return ftp
 
+    def _transfer(self, path, func, retries=0):
+        """Call func(ftp) with a pooled connection, without taking the lock.
+
+        The connection is returned to the pool afterwards, unless the call
+        failed in a way that may have left it unusable.  If the connection
+        is lost, func is called again with a new one, up to 'retries' times.
+        """
+        while True:
+            try:
+                ftp = self._pool.acquire()
+            except Exception, e:
+                self._translate_exception(path, e)
+            try:
+                result = func(ftp)
+            except (socket_error, EOFError, error_temp), e:
+                self._pool.release(ftp, discard=True)
+                if retries > 0:
+                    retries -= 1
+                    continue
+                self._translate_exception(path, e)
+            except Exception, e:
+                self._pool.release(ftp, discard=not isinstance(e, error_perm))
+                self._translate_exception(path, e)
+            self._pool.release(ftp)
+            return result
+
     def __getstate__(self):
         state = super(FTPFS, self).__getstate__()
         del state['_lock']
+        del state['_pool']
         state.pop('_ftp', None)
         return state
 
@@ -1097,6 +1384,7 @@ class FTPFS(FS):
         super(FTPFS, self).__setstate__(state)
         self._init_dircache()
         self._lock = threading.RLock()
+        self._pool = _FTPConnectionPool(self._connect_ftp, self.pool_size, self.keepalive)
         #self._ftp = None
         #self.ftp
 
@@ -1143,6 +1431,7 @@ class FTPFS(FS):
                 self.ftp.close()
             except FSError:
                 pass
+            self._pool.close()
             self.closed = True
 
     def getpathurl(self, path, allow_none=False):
@@ -1166,24 +1455,56 @@ class FTPFS(FS):
                 raise ResourceNotFoundError(path)
         if 'w' in mode or 'a' in mode or '+' in mode:
             self.refresh_dircache(dirname(path))
-        ftp = self._open_ftp()
-        f = _FTPFile(self, ftp, normpath(path), mode)
+        ftp = self._pool.acquire()
+        try:
+            f = _FTPFile(self, ftp, normpath(path), mode)
+        except:
+            self._pool.release(ftp, discard=True)
+            raise
         return f
 
-    @ftperrors
     def setcontents(self, path, data=b'', encoding=None, errors=None, chunk_size=1024*64):
         path = normpath(path)
         data = iotools.make_bytes_io(data, encoding=encoding, errors=errors)
         self.refresh_dircache(dirname(path))
-        self.ftp.storbinary('STOR %s' % _encode(path), data, blocksize=chunk_size)
+        try:
+            data_start = data.tell()
+        except (AttributeError, IOError):
+            data_start = None
+        attempts = []
+
+        #  A retry appends to whatever part of the file the server has
+        def stor(ftp):
+            offset = 0
+            if attempts:
+                ftp.voidcmd('TYPE I')
+                try:
+                    offset = ftp.size(_encode(path)) or 0
+                except error_perm:
+                    pass
+                data.seek(data_start + offset)
+            attempts.append(offset)
+            if offset:
+                ftp.storbinary('APPE %s' % _encode(path), data, blocksize=chunk_size)
+            else:
+                ftp.storbinary('STOR %s' % _encode(path), data, blocksize=chunk_size)
+
+        retries = self.transfer_retries if data_start is not None else 0
+        try:
+            self._transfer(path, stor, retries)
+        finally:
+            #  Drop any listing read while the upload was in progress
+            self.refresh_dircache(dirname(path))
 
-    @ftperrors
     def getcontents(self, path, mode="rb", encoding=None, errors=None, newline=None):
         path = normpath(path)
         contents = StringIO()
-        self.ftp.retrbinary('RETR %s' % _encode(path), contents.write, blocksize=1024*64)
+        #  A retry restarts the download where the last attempt got to
+        def retr(ftp):
+            ftp.retrbinary('RETR %s' % _encode(path), contents.write, blocksize=1024*64, rest=contents.tell() or None)
+        self._transfer(path, retr, self.transfer_retries)
         data = contents.getvalue()
-        if 'b' in data:
+        if 'b' in mode:
             return data
         return iotools.decode_binary(data, encoding=encoding, errors=errors)
 
@@ -1254,6 +1575,16 @@ class FTPFS(FS):
                                           dirs_only=dirs_only,
                                           files_only=files_only)]
 
+    @ftperrors
+    def scandir(self, path="./"):
+        path = normpath(path)
+        if not self.exists(path):
+            raise ResourceNotFoundError(path)
+        if not self.isdir(path):
+            raise ResourceInvalidError(path)
+        return iter([ScandirEntry(self, path, name, info['try_cwd'], info=self._make_info(info))
+                     for name, info in self._readdir(path).items()])
+
     @ftperrors
     def makedir(self, path, recursive=False, allow_recreate=False):
         path = normpath(path)
@@ -1261,7 +1592,7 @@ class FTPFS(FS):
             return
         def checkdir(path):
             if not self.isdir(path):
-                self.clear_dircache(dirname(path))
+                self.refresh_dircache(dirname(path))
                 try:
                     self.ftp.mkd(_encode(path))
                 except error_reply:
@@ -1320,7 +1651,7 @@ class FTPFS(FS):
                             self.removedir(rpath, force=force)
                     except FSError:
                         pass
-            self.clear_dircache(dirname(path))
+            self.refresh_dircache(dirname(path))
             self.ftp.rmd(_encode(path))
         except error_reply:
             pass
@@ -1330,12 +1661,14 @@ class FTPFS(FS):
                     self.removedir(dirname(path), recursive=True)
             except DirectoryNotEmptyError:
                 pass
-        self.clear_dircache(dirname(path), path)
+        self.refresh_dircache(dirname(path))
+        self.clear_dircache(path)
 
     @ftperrors
     def rename(self, src, dst):
         try:
             self.refresh_dircache(dirname(src), dirname(dst))
+            self.clear_dircache(src, dst)
             self.ftp.rename(_encode(src), _encode(dst))
         except error_perm, exception:
             code, message = str(exception).split(' ', 1)
@@ -1351,7 +1684,11 @@ class FTPFS(FS):
         dirlist, fname = self._check_path(path)
         if not fname:
             return {}
-        info = dirlist[fname].copy()
+        return self._make_info(dirlist[fname])
+
+    @staticmethod
+    def _make_info(dirlist_info):
+        info = dirlist_info.copy()
         info['modified_time'] = datetime.datetime.fromtimestamp(info['mtime'])
         info['created_time'] = info['modified_time']
         return info
@@ -1400,7 +1737,6 @@ class FTPFS(FS):
         finally:
             self.refresh_dircache(src, dirname(src), dst, dirname(dst))
 
-    @ftperrors
     def copy(self, src, dst, overwrite=False, chunk_size=1024*64):
         if not self.isfile(src):
             if self.isdir(src):
@@ -1409,28 +1745,54 @@ class FTPFS(FS):
         if not overwrite and self.exists(dst):
             raise DestinationExistsError(dst)
 
+        src = normpath(src)
         dst = normpath(dst)
-        src_file = None
+
+        #  The file is streamed from one pooled connection to another
+        def retr(src_ftp):
+            def stor(dst_ftp):
+                src_ftp.voidcmd('TYPE I')
+                conn = src_ftp.transfercmd('RETR %s' % _encode(src))
+                try:
+                    src_file = conn.makefile('rb')
+                    try:
+                        dst_ftp.storbinary('STOR %s' % _encode(dst), src_file, blocksize=chunk_size)
+                    finally:
+                        src_file.close()
+                finally:
+                    conn.close()
+                src_ftp.voidresp()
+            self._transfer(dst, stor)
+
         try:
-            src_file = self.open(src, "rb")
-            ftp = self._open_ftp()
-            ftp.voidcmd('TYPE I')
-            ftp.storbinary('STOR %s' % _encode(normpath(dst)), src_file, blocksize=chunk_size)
+            self._transfer(src, retr)
         finally:
             self.refresh_dircache(dirname(dst))
-            if src_file is not None:
-                src_file.close()
-
 
     @ftperrors
     def movedir(self, src, dst, overwrite=False, ignore_errors=False, chunk_size=16384):
-        self.clear_dircache(dirname(src), dirname(dst))
+        self.refresh_dircache(dirname(src), dirname(dst))
+        self.clear_dircache(src, dst)
         super(FTPFS, self).movedir(src, dst, overwrite, ignore_errors, chunk_size)
 
-    @ftperrors
     def copydir(self, src, dst, overwrite=False, ignore_errors=False, chunk_size=16384):
-        self.clear_dircache(dirname(dst))
-        super(FTPFS, self).copydir(src, dst, overwrite, ignore_errors, chunk_size)
+        """Copy a directory from 'src' to 'dst'.
+
+        Up to 'transfer_workers' files are copied at once, each over its
+        own pair of pooled connections.
+        """
+        if not self.isdir(src):
+            raise ResourceInvalidError(src, msg="Source is not a directory: %(path)s")
+        if not overwrite and self.exists(dst):
+            raise DestinationExistsError(dst)
+        self.refresh_dircache(dirname(dst))
+        self.clear_dircache(dst)
+        self.makedir(dst, allow_recreate=True)
+        copier = TreeCopier(workers=self.transfer_workers,
+                            remote_workers=self.transfer_workers,
+                            ignore_errors=ignore_errors,
+                            chunk_size=chunk_size)
+        copier.copydir(self, src, self, dst)
 
 
 if __name__ == "__main__":
@@ -86,7 +86,7 @@ class RawWrapper(object):
         return self._f.read()
 
     def readinto(self, b):
-        if self.is_io:
+        if self.is_io or hasattr(self._f, 'readinto'):
             return self._f.readinto(b)
         data = self._f.read(len(b))
         bytes_read = len(data)
@@ -0,0 +1,124 @@
+"""
+
+  A version of collections.OrderedDict for Python versions that don't have it.
+
+Note that this module can't be named "collections" because it would shadow the
+stdlib module that it tries to emulate.
+
+"""
+
+try:
+    from collections import OrderedDict as OrderedDict
+except ImportError:
+
+    class OrderedDict(dict):
+        """Dictionary that remembers the order in which keys were inserted.
+
+        This implements the subset of the Python 2.7 OrderedDict interface
+        that is used by pyfilesystem.  The keys are kept in a doubly-linked
+        list, so that adding and removing keys takes constant time.
+        """
+
+        def __init__(self, *args, **kwds):
+            super(OrderedDict, self).__init__()
+            self.__root = root = []
+            root[:] = [root, root, None]
+            self.__links = {}
+            self.update(*args, **kwds)
+
+        def __setitem__(self, key, value):
+            if key not in self:
+                root = self.__root
+                last = root[0]
+                last[1] = root[0] = self.__links[key] = [last, root, key]
+            super(OrderedDict, self).__setitem__(key, value)
+
+        def __delitem__(self, key):
+            super(OrderedDict, self).__delitem__(key)
+            (prev, next, _key) = self.__links.pop(key)
+            prev[1] = next
+            next[0] = prev
+
+        def __iter__(self):
+            root = self.__root
+            link = root[1]
+            while link is not root:
+                yield link[2]
+                link = link[1]
+
+        def __reversed__(self):
+            root = self.__root
+            link = root[0]
+            while link is not root:
+                yield link[2]
+                link = link[0]
+
+        def __repr__(self):
+            return "%s(%r)" % (self.__class__.__name__, self.items())
+
+        def clear(self):
+            super(OrderedDict, self).clear()
+            root = self.__root
+            root[:] = [root, root, None]
+            self.__links.clear()
+
+        def update(self, *args, **kwds):
+            if args:
+                other = args[0]
+                if hasattr(other, "keys"):
+                    for key in other.keys():
+                        self[key] = other[key]
+                else:
+                    for (key, value) in other:
+                        self[key] = value
+            for (key, value) in kwds.items():
+                self[key] = value
+
+        def setdefault(self, key, default=None):
+            if key in self:
+                return self[key]
+            self[key] = default
+            return default
+
+        _marker = object()
+
+        def pop(self, key, default=_marker):
+            if key in self:
+                value = self[key]
+                del self[key]
+                return value
+            if default is self._marker:
+                raise KeyError(key)
+            return default
+
+        def popitem(self, last=True):
+            if not self:
+                raise KeyError("dictionary is empty")
+            if last:
+                key = next(reversed(self))
+            else:
+                key = next(iter(self))
+            return (key, self.pop(key))
+
+        def keys(self):
+            return list(self)
+
+        def values(self):
+            return [self[key] for key in self]
+
+        def items(self):
+            return [(key, self[key]) for key in self]
+
+        def iterkeys(self):
+            return iter(self)
+
+        def itervalues(self):
+            for key in self:
+                yield self[key]
+
+        def iteritems(self):
+            for key in self:
+                yield (key, self[key])
+
+        def copy(self):
+            return self.__class__(self)
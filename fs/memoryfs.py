@@ -5,24 +5,73 @@ fs.memoryfs
 
 A Filesystem that exists in memory only. Which makes them extremely fast, but non-permanent.
 
-If you open a file from a `memoryfs` you will get back a StringIO object from the standard library.
+File contents are held in :class:`MemoryBuffer` objects, which store data in
+fixed-size ``bytearray`` chunks. Opening a file from a `memoryfs` gives you a
+file-like object that reads and writes the buffer directly, and
+:meth:`MemoryFS.getmmap` gives random access to a file without copying it.
 
 
 """
 
+import copy
 import datetime
+import itertools
 import stat
+import uuid
+import weakref
 from fs.path import iteratepath, pathsplit, normpath
 from fs.base import *
 from fs.errors import *
 from fs import _thread_synchronize_default
-from fs.filelike import StringIO
 from fs import iotools
-from os import SEEK_END
+from fs.local_collections import OrderedDict
+from os import SEEK_SET, SEEK_CUR, SEEK_END
+from fs.local_functools import wraps
 import threading
 
 import six
-from six import b
+from six import b, PY3
+
+
+# Guards the lazy creation of the per-file locks, open file lists and xattrs
+_lock_init_lock = threading.Lock()
+
+# Identifies which MemoryFS may modify a DirEntry in place (see MemoryFS.snapshot)
+_owner_ids = itertools.count()
+
+try:
+    memoryview
+except NameError:
+    #  Python 2.6 has no memoryview, but read-only buffer objects will do
+    def _view(data, start, end):
+        return buffer(data, start, end - start)
+    def _view_bytes(data, start, end):
+        return str(buffer(data, start, end - start))
+else:
+    def _view(data, start, end):
+        return memoryview(data)[start:end]
+    def _view_bytes(data, start, end):
+        return memoryview(data)[start:end].tobytes()
+
+
+def _reader(func):
+    """Decorator to synchronize a MemoryFS method that doesn't modify the
+    directory tree.
+
+    The lock is skipped if the MemoryFS was created with lock_free_reads=True,
+    as the writers never modify a directory's contents in place.
+
+    """
+    @wraps(func)
+    def acquire_lock(self, *args, **kwargs):
+        if self._lock_free_reads:
+            return func(self, *args, **kwargs)
+        self._lock.acquire()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self._lock.release()
+    return acquire_lock
 
 
 def _check_mode(mode, mode_chars):
@@ -32,16 +81,399 @@ def _check_mode(mode, mode_chars):
     return True
 
 
+class MemoryBuffer(object):
+    """The contents of a file in a MemoryFS.
+
+    Data is stored in a list of ``bytearray`` chunks of `chunk_size` bytes,
+    except for the last chunk which is only as long as it needs to be.  Small
+    files therefore take up little more than their own size, and large files
+    can grow without copying the data they already hold.
+
+    Reads and writes take an explicit position, so a buffer can be shared by
+    any number of open files.  Chunks that have been exported as memoryviews
+    (see :meth:`views`) or shared with a :meth:`copy` are copied before they
+    are next modified, so a view never changes underneath its holder.
+
+    A MemoryFS with a memory limit may :meth:`spill` the contents of a
+    buffer to disk, in which case they are loaded back the next time they
+    are read or written.
+
+    """
+
+    __slots__ = ('_chunks', '_size', '_shared', '_spilled')
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, data=b''):
+        self._chunks = []
+        self._size = 0
+        self._shared = None
+        self._spilled = None
+        if data:
+            self.write(0, data)
+
+    def __len__(self):
+        return self._size
+
+    def __getstate__(self):
+        if self._spilled is not None:
+            return self._spilled.read()
+        return self.getvalue()
+
+    def __setstate__(self, data):
+        self.__init__(data)
+
+    def _writable_chunk(self, index):
+        """Get a chunk that may be modified in place."""
+        chunk = self._chunks[index]
+        shared = self._shared
+        if shared is not None and index in shared:
+            chunk = self._chunks[index] = bytearray(chunk)
+            shared.discard(index)
+        return chunk
+
+    def _share(self, indices):
+        if self._shared is None:
+            self._shared = set()
+        self._shared.update(indices)
+
+    def _locate(self, pos):
+        return divmod(pos, self.chunk_size)
+
+    def _load(self, discard=False):
+        """Bring back the contents of a spilled buffer.
+
+        If `discard` is True, the spilled contents are thrown away instead.
+
+        """
+        spilled = self._spilled
+        with spilled.store.lock:
+            if self._spilled is spilled:
+                if not discard:
+                    self._chunks = MemoryBuffer(spilled.read())._chunks
+                self._shared = None
+                self._spilled = None
+
+    def spill(self, store):
+        """Move the contents of this buffer to a spill store.
+
+        Must be called with the lock for the file held.
+
+        """
+        if self._spilled is None:
+            self._spilled = store.save(self.getvalue())
+            self._chunks = []
+            self._shared = None
+
+    @property
+    def spilled(self):
+        return self._spilled is not None
+
+    def copy(self):
+        """Get a copy of this buffer.
+
+        The copy shares its chunks with this buffer until one of them is
+        written to, so copying is cheap regardless of the size of the data.
+
+        """
+        if self._spilled is not None:
+            self._load()
+        new_buffer = MemoryBuffer()
+        new_buffer._chunks = self._chunks[:]
+        new_buffer._size = self._size
+        indices = xrange(len(self._chunks))
+        self._share(indices)
+        new_buffer._share(indices)
+        return new_buffer
+
+    def getvalue(self):
+        """Get the entire contents as a byte string."""
+        return self.read(0)
+
+    def read(self, pos, size=-1):
+        """Read up to `size` bytes from position `pos`."""
+        if self._spilled is not None:
+            self._load()
+        end = self._size
+        if size is not None and size >= 0:
+            end = min(end, pos + size)
+        if pos >= end:
+            return b''
+        index, offset = self._locate(pos)
+        chunks = self._chunks
+        chunk = chunks[index]
+        if offset + (end - pos) <= len(chunk):
+            return _view_bytes(chunk, offset, offset + end - pos)
+        data = []
+        while pos < end:
+            chunk = chunks[index]
+            count = min(len(chunk) - offset, end - pos)
+            data.append(_view_bytes(chunk, offset, offset + count))
+            pos += count
+            index += 1
+            offset = 0
+        return b''.join(data)
+
+    def readinto(self, pos, buf):
+        """Read from position `pos` into the writable buffer `buf`.
+
+        Returns the number of bytes read.
+
+        """
+        if self._spilled is not None:
+            self._load()
+        size = min(len(buf), self._size - pos)
+        if size <= 0:
+            return 0
+        index, offset = self._locate(pos)
+        chunks = self._chunks
+        copied = 0
+        while copied < size:
+            chunk = chunks[index]
+            count = min(len(chunk) - offset, size - copied)
+            buf[copied:copied + count] = _view(chunk, offset, offset + count)
+            copied += count
+            index += 1
+            offset = 0
+        return size
+
+    def readline(self, pos, size=-1):
+        """Read a line starting at position `pos`, of at most `size` bytes."""
+        if self._spilled is not None:
+            self._load()
+        end = self._size
+        if size is not None and size >= 0:
+            end = min(end, pos + size)
+        if pos >= end:
+            return b''
+        index, offset = self._locate(pos)
+        chunk_start = pos - offset
+        chunks = self._chunks
+        while chunk_start < end:
+            newline = chunks[index].find(b'\n', offset)
+            if newline != -1:
+                end = min(end, chunk_start + newline + 1)
+                break
+            chunk_start += len(chunks[index])
+            index += 1
+            offset = 0
+        return self.read(pos, end - pos)
+
+    def views(self, start=0, end=None):
+        """Get a list of memoryviews covering the data from `start` to `end`.
+
+        No data is copied; the views remain valid (and unchanged) even if
+        the buffer is subsequently modified.  On Python 2.6, which has no
+        memoryview, read-only buffer objects are returned instead.
+
+        """
+        if self._spilled is not None:
+            self._load()
+        if end is None or end > self._size:
+            end = self._size
+        if start >= end:
+            return []
+        index, offset = self._locate(start)
+        first = index
+        chunks = self._chunks
+        views = []
+        pos = start
+        while pos < end:
+            chunk = chunks[index]
+            count = min(len(chunk) - offset, end - pos)
+            views.append(_view(chunk, offset, offset + count))
+            pos += count
+            index += 1
+            offset = 0
+        self._share(xrange(first, index))
+        return views
+
+    def write(self, pos, data):
+        """Write `data` at position `pos`, extending the buffer if required.
+
+        Any gap between the end of the buffer and `pos` is filled with
+        null bytes.
+
+        """
+        if not PY3 and isinstance(data, unicode):
+            #  As with files on Python 2, unicode is accepted if it's ASCII
+            data = str(data)
+        if self._spilled is not None:
+            self._load()
+        if pos > self._size:
+            self.write(self._size, b'\0' * (pos - self._size))
+        size = len(data)
+        if not size:
+            return
+        chunk_size = self.chunk_size
+        chunks = self._chunks
+        if not chunks and size <= chunk_size:
+            chunks.append(bytearray(data))
+            self._size = size
+            return
+        index, offset = self._locate(pos)
+        written = 0
+        while written < size:
+            count = min(chunk_size - offset, size - written)
+            if index == len(chunks):
+                chunks.append(bytearray(_view(data, written, written + count)))
+            else:
+                chunk = self._writable_chunk(index)
+                chunk[offset:offset + count] = _view(data, written, written + count)
+            written += count
+            index += 1
+            offset = 0
+        self._size = max(self._size, pos + size)
+
+    def truncate(self, size):
+        """Truncate (or extend with null bytes) to `size` bytes."""
+        if self._spilled is not None:
+            self._load(discard=not size)
+        if size >= self._size:
+            self.write(size, b'')
+            return
+        chunk_size = self.chunk_size
+        count = (size + chunk_size - 1) // chunk_size
+        del self._chunks[count:]
+        if self._shared is not None:
+            self._shared = set(i for i in self._shared if i < count)
+        if count:
+            last_size = size - (count - 1) * chunk_size
+            if len(self._chunks[-1]) > last_size:
+                del self._writable_chunk(count - 1)[last_size:]
+        self._size = size
+
+
+class _SpilledData(object):
+    """The contents of a MemoryBuffer that have been written to a spill store."""
+
+    __slots__ = ('store', 'path')
+
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+
+    def read(self):
+        return self.store.spill_fs.getcontents(self.path, 'rb')
+
+    def __del__(self):
+        try:
+            self.store.discard(self.path)
+        except Exception:
+            pass
+
+
+class _SpillStore(object):
+    """Keeps the file contents of a MemoryFS within a memory limit.
+
+    Files are tracked in least recently used order.  When the contents of
+    the files in memory exceed the limit, the contents of the least recently
+    used files are moved to the spill filesystem (a TempFS, by default).
+    Files that are open are never spilled.
+
+    """
+
+    # Files smaller than this stay in memory, as they aren't worth the
+    # overhead of a file on disk
+    min_spill_size = 1024
+
+    def __init__(self, memory_limit, spill_fs=None):
+        self.memory_limit = memory_limit
+        self.lock = threading.RLock()
+        self.users = 1
+        self.closed = False
+        self._spill_fs = spill_fs
+        self._owns_spill_fs = spill_fs is None
+        #  Spill files are named uniquely to this store, as the spill_fs may
+        #  be shared with other stores (such as that of an unpickled copy)
+        self._spill_prefix = uuid.uuid4().hex
+        self._spill_ids = itertools.count()
+        #  Maps id(dir_entry) to a weakref of the DirEntry and the size of its
+        #  contents, least recently used first.
+        self._resident = OrderedDict()
+        self._resident_size = 0
+
+    @property
+    def spill_fs(self):
+        if self._spill_fs is None:
+            from fs.tempfs import TempFS
+            self._spill_fs = TempFS(identifier="MemoryFS")
+        return self._spill_fs
+
+    def save(self, data):
+        path = u"%s-%i" % (self._spill_prefix, next(self._spill_ids))
+        self.spill_fs.setcontents(path, data)
+        return _SpilledData(self, path)
+
+    def discard(self, path):
+        if not self.closed:
+            try:
+                self.spill_fs.remove(path)
+            except FSError:
+                pass
+
+    def _forget(self, key):
+        with self.lock:
+            record = self._resident.pop(key, None)
+            if record is not None:
+                self._resident_size -= record[1]
+
+    def touch(self, dir_entry):
+        """Record that a file has been used, and spill files if required."""
+        key = id(dir_entry)
+        with self.lock:
+            record = self._resident.pop(key, None)
+            if record is None:
+                ref = weakref.ref(dir_entry, lambda ref: self._forget(key))
+            else:
+                ref, size = record
+                self._resident_size -= size
+            mem_file = dir_entry.mem_file
+            if not mem_file.spilled:
+                size = len(mem_file)
+                self._resident[key] = (ref, size)
+                self._resident_size += size
+            if self._resident_size > self.memory_limit:
+                self._spill(dir_entry)
+
+    def _spill(self, keep):
+        for key, (ref, size) in self._resident.items():
+            if self._resident_size <= self.memory_limit:
+                break
+            dir_entry = ref()
+            if dir_entry is None or dir_entry is keep or dir_entry._open_files:
+                continue
+            if size < self.min_spill_size:
+                continue
+            lock = dir_entry.lock
+            if not lock.acquire(False):
+                continue
+            try:
+                if dir_entry._open_files:
+                    continue
+                dir_entry.mem_file.spill(self)
+            finally:
+                lock.release()
+            del self._resident[key]
+            self._resident_size -= size
+
+    def close(self):
+        with self.lock:
+            self.users -= 1
+            if self.users > 0 or self.closed:
+                return
+            self.closed = True
+            if self._owns_spill_fs and self._spill_fs is not None:
+                self._spill_fs.close()
+
+
 class MemoryFile(object):
 
-    def seek_and_lock(f):
+    def locked(f):
         def deco(self, *args, **kwargs):
+            self._lock.acquire()
             try:
-                self._lock.acquire()
-                self.mem_file.seek(self.pos)
-                ret = f(self, *args, **kwargs)
-                self.pos = self.mem_file.tell()
-                return ret
+                return f(self, *args, **kwargs)
             finally:
                 self._lock.release()
         return deco
@@ -59,16 +491,14 @@ class MemoryFile(object):
         if _check_mode(mode, 'a'):
             lock.acquire()
             try:
-                self.mem_file.seek(0, SEEK_END)
-                self.pos = self.mem_file.tell()
+                self.pos = len(self.mem_file)
             finally:
                 lock.release()
 
         elif _check_mode(mode, 'w'):
             lock.acquire()
             try:
-                self.mem_file.seek(0)
-                self.mem_file.truncate()
+                self.mem_file.truncate(0)
             finally:
                 lock.release()
 
@@ -87,27 +517,36 @@ class MemoryFile(object):
         if not self.closed:
             self.close()
 
+    def _check_readable(self):
+        if 'r' not in self.mode and '+' not in self.mode:
+            raise IOError("File not open for reading")
+
+    def _check_writable(self):
+        if 'r' in self.mode and '+' not in self.mode:
+            raise IOError("File not open for writing")
+
     def flush(self):
         pass
 
     def __iter__(self):
-        if 'r' not in self.mode and '+' not in self.mode:
-            raise IOError("File not open for reading")
-        self.mem_file.seek(self.pos)
-        for line in self.mem_file:
-            yield line
+        self._check_readable()
+        return self
 
-    @seek_and_lock
+    @locked
     def next(self):
-        if 'r' not in self.mode and '+' not in self.mode:
-            raise IOError("File not open for reading")
-        return self.mem_file.next()
-
-    @seek_and_lock
-    def readline(self, *args, **kwargs):
-        if 'r' not in self.mode and '+' not in self.mode:
-            raise IOError("File not open for reading")
-        return self.mem_file.readline(*args, **kwargs)
+        self._check_readable()
+        line = self.mem_file.readline(self.pos)
+        if not line:
+            raise StopIteration
+        self.pos += len(line)
+        return line
+
+    @locked
+    def readline(self, size=-1):
+        self._check_readable()
+        line = self.mem_file.readline(self.pos, size)
+        self.pos += len(line)
+        return line
 
     def close(self):
         do_close = False
@@ -121,44 +560,173 @@ class MemoryFile(object):
         if do_close:
             self.memory_fs._on_close_memory_file(self, self.path)
 
-    @seek_and_lock
+    @locked
     def read(self, size=None):
-        if 'r' not in self.mode and '+' not in self.mode:
-            raise IOError("File not open for reading")
-        if size is None:
-            size = -1
-        return self.mem_file.read(size)
+        self._check_readable()
+        data = self.mem_file.read(self.pos, size)
+        self.pos += len(data)
+        return data
 
-    @seek_and_lock
-    def seek(self, *args, **kwargs):
-        return self.mem_file.seek(*args, **kwargs)
+    @locked
+    def readinto(self, buf):
+        self._check_readable()
+        count = self.mem_file.readinto(self.pos, buf)
+        self.pos += count
+        return count
+
+    @locked
+    def seek(self, offset, whence=SEEK_SET):
+        if whence == SEEK_CUR:
+            offset += self.pos
+        elif whence == SEEK_END:
+            offset += len(self.mem_file)
+        self.pos = max(0, offset)
 
-    @seek_and_lock
     def tell(self):
         return self.pos
 
-    @seek_and_lock
-    def truncate(self, *args, **kwargs):
-        if 'r' in self.mode and '+' not in self.mode:
-            raise IOError("File not open for writing")
-        return self.mem_file.truncate(*args, **kwargs)
+    @locked
+    def truncate(self, size=None):
+        self._check_writable()
+        if size is None:
+            size = self.pos
+        self.mem_file.truncate(size)
 
-    #@seek_and_lock
     def write(self, data):
-        if 'r' in self.mode and '+' not in self.mode:
-            raise IOError("File not open for writing")
+        self._check_writable()
         self.memory_fs._on_modify_memory_file(self.path)
         self._lock.acquire()
         try:
-            self.mem_file.seek(self.pos)
-            self.mem_file.write(data)
-            self.pos = self.mem_file.tell()
+            self.mem_file.write(self.pos, data)
+            self.pos += len(data)
+        finally:
+            self._lock.release()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class MemoryMap(object):
+    """Random access to the contents of a MemoryFS file.
+
+    Returned by :meth:`MemoryFS.getmmap`, this supports the familiar parts
+    of the ``mmap.mmap`` interface -- indexing, slicing, read, write, seek
+    -- without reading the whole file into a string.  The :meth:`views`
+    method returns memoryviews of the underlying storage, for consumers that
+    can work on buffers without copying them.
+
+    """
+
+    def __init__(self, path, memory_fs, mem_file, lock, read_only=False):
+        self.path = path
+        self.memory_fs = memory_fs
+        self.mem_file = mem_file
+        self.read_only = read_only
+        self.closed = False
+        self._lock = lock
+        self._pos = 0
+
+    def __len__(self):
+        return len(self.mem_file)
+
+    def size(self):
+        return len(self.mem_file)
+
+    def _check_writable(self, pos, size):
+        if self.read_only:
+            raise TypeError("mmap can't modify a readonly memory map.")
+        if pos + size > len(self.mem_file):
+            raise ValueError("data out of range")
+
+    def _write(self, pos, data):
+        self._lock.acquire()
+        try:
+            self._check_writable(pos, len(data))
+            self.mem_file.write(pos, data)
+        finally:
+            self._lock.release()
+        if self.memory_fs is not None:
+            self.memory_fs._on_modify_memory_file(self.path)
+
+    def __getitem__(self, index):
+        size = len(self.mem_file)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(size)
+            if step == 1:
+                return self.mem_file.read(start, max(0, stop - start))
+            return b''.join(self.mem_file.read(i, 1) for i in xrange(start, stop, step))
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("mmap index out of range")
+        return self.mem_file.read(index, 1)
+
+    def __setitem__(self, index, value):
+        size = len(self.mem_file)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(size)
+            if step != 1 or len(value) != max(0, stop - start):
+                raise IndexError("mmap slice assignment is wrong size")
+            self._write(start, value)
+            return
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("mmap index out of range")
+        if len(value) != 1:
+            raise IndexError("mmap assignment must be single-character string")
+        self._write(index, value)
+
+    def read(self, size=None):
+        data = self.mem_file.read(self._pos, size)
+        self._pos += len(data)
+        return data
+
+    def readline(self):
+        line = self.mem_file.readline(self._pos)
+        self._pos += len(line)
+        return line
+
+    def write(self, data):
+        self._write(self._pos, data)
+        self._pos += len(data)
+
+    def seek(self, pos, whence=SEEK_SET):
+        if whence == SEEK_CUR:
+            pos += self._pos
+        elif whence == SEEK_END:
+            pos += len(self.mem_file)
+        if not 0 <= pos <= len(self.mem_file):
+            raise ValueError("seek out of range")
+        self._pos = pos
+
+    def tell(self):
+        return self._pos
+
+    def views(self, start=0, end=None):
+        """Get a list of memoryviews of the data, without copying it."""
+        self._lock.acquire()
+        try:
+            return self.mem_file.views(start, end)
         finally:
             self._lock.release()
 
-    @seek_and_lock
-    def writelines(self, *args, **kwargs):
-        return self.mem_file.writelines(*args, **kwargs)
+    def flush(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.memory_fs is not None:
+                self.memory_fs._on_close_memory_file(self, self.path)
 
     def __enter__(self):
         return self
@@ -170,6 +738,10 @@ class MemoryFile(object):
 
 class DirEntry(object):
 
+    __slots__ = ('type', 'name', 'contents', 'mem_file', 'created_time',
+                 'modified_time', 'accessed_time', '_open_files', '_xattrs',
+                 '_lock', '_owner', '__weakref__')
+
     def sync(f):
         def deco(self, *args, **kwargs):
             if self.lock is not None:
@@ -192,19 +764,43 @@ class DirEntry(object):
         if contents is None and type == "dir":
             contents = {}
 
-        self.open_files = []
         self.contents = contents
         self.mem_file = None
         self.created_time = datetime.datetime.now()
         self.modified_time = self.created_time
         self.accessed_time = self.created_time
 
-        self.xattrs = {}
-
-        self.lock = None
+        # Open files, xattrs and the lock are created on first use
+        self._open_files = None
+        self._xattrs = None
+        self._lock = None
+        self._owner = None
         if self.type == 'file':
-            self.mem_file = StringIO()
-            self.lock = threading.RLock()
+            self.mem_file = MemoryBuffer()
+
+    @property
+    def open_files(self):
+        if self._open_files is None:
+            with _lock_init_lock:
+                if self._open_files is None:
+                    self._open_files = []
+        return self._open_files
+
+    @property
+    def xattrs(self):
+        if self._xattrs is None:
+            with _lock_init_lock:
+                if self._xattrs is None:
+                    self._xattrs = {}
+        return self._xattrs
+
+    @property
+    def lock(self):
+        if self._lock is None and self.type == 'file':
+            with _lock_init_lock:
+                if self._lock is None:
+                    self._lock = threading.RLock()
+        return self._lock
 
     def get_value(self):
         self.lock.acquire()
@@ -231,27 +827,57 @@ class DirEntry(object):
 
     @sync
     def __getstate__(self):
-        state = self.__dict__.copy()
-        state.pop('lock')
+        state = dict((name, getattr(self, name)) for name in self.__slots__
+                     if name != '__weakref__')
+        state.pop('_lock')
         if self.mem_file is not None:
-            state['mem_file'] = self.data
+            # Doesn't load spilled contents back into memory
+            state['mem_file'] = self.mem_file.__getstate__()
         return state
 
     def __setstate__(self, state):
-        self.__dict__.update(state)
-        if self.type == 'file':
-            self.lock = threading.RLock()
-        else:
-            self.lock = None
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+        self._lock = None
         if self.mem_file is not None:
-            data = self.mem_file
-            self.mem_file = StringIO()
-            self.mem_file.write(data)
+            self.mem_file = MemoryBuffer(self.mem_file)
+
+
+class _MemoryScandirEntry(ScandirEntry):
+    """ScandirEntry that gets its info directly from the DirEntry."""
+
+    __slots__ = ('_dir_entry',)
+
+    def __init__(self, fs, dir_path, name, dir_entry):
+        super(_MemoryScandirEntry, self).__init__(fs, dir_path, name, dir_entry.isdir())
+        self._dir_entry = dir_entry
+
+    def _load_info(self):
+        return self.fs._dir_entry_info(self._dir_entry)
 
 
 class MemoryFS(FS):
     """An in-memory filesystem.
 
+    By default every method is synchronized on a single lock.  With
+    `lock_free_reads` enabled, methods that only read the tree (exists,
+    isdir, getinfo, listdir, getcontents, opening existing files etc.) take
+    no lock at all and can run concurrently with each other and with
+    writers.  Writers remain serialized, and replace a directory's contents
+    dict with a modified copy rather than changing it in place, so readers
+    always see a consistent directory.  This makes modifying very large
+    directories more expensive, in exchange for uncontended reads.
+
+    :meth:`snapshot` creates a copy-on-write clone of a MemoryFS.  Directory
+    entries are shared between a filesystem and its snapshots until one of
+    them modifies an entry, at which point that filesystem replaces the
+    entry (and its parent directories) with a private copy.
+
+    If `memory_limit` is given, the contents of the least recently used
+    files are moved to disk when the files in memory add up to more than
+    that many bytes.  They are loaded back into memory when next used.
+    The directory structure is always kept in memory.
+
     """
 
     _meta = {'thread_safe': True,
@@ -267,10 +893,28 @@ class MemoryFS(FS):
              'atomic.setcontents': False}
 
     def _make_dir_entry(self, *args, **kwargs):
-        return self.dir_entry_factory(*args, **kwargs)
+        dir_entry = self.dir_entry_factory(*args, **kwargs)
+        dir_entry._owner = self._owner
+        return dir_entry
+
+    def __init__(self, file_factory=None, lock_free_reads=False, memory_limit=None, spill_fs=None):
+        """
+        :param file_factory: A callable that creates the file objects returned by open
+        :param lock_free_reads: If True, methods that don't modify the filesystem run without taking the lock
+        :param memory_limit: Maximum number of bytes of file contents to keep in memory, or None for no limit
+        :param spill_fs: Filesystem to store file contents that exceed the memory limit (defaults to a TempFS).
+            It is pickled along with the MemoryFS, so an unpickled copy spills to (a copy of) the same filesystem
 
-    def __init__(self, file_factory=None):
+        """
         super(MemoryFS, self).__init__(thread_synchronize=_thread_synchronize_default)
+        self._lock_free_reads = lock_free_reads
+        self._memory_limit = memory_limit
+        self._spill_fs = spill_fs
+        self._spill_store = None
+        if memory_limit is not None:
+            self._spill_store = _SpillStore(memory_limit, spill_fs)
+        self._owner = next(_owner_ids)
+        self._writable_files = weakref.WeakKeyDictionary()
 
         self.dir_entry_factory = DirEntry
         self.file_factory = file_factory or MemoryFile
@@ -288,7 +932,128 @@ class MemoryFS(FS):
     def __unicode__(self):
         return "<MemoryFS>"
 
+    def __getstate__(self):
+        state = super(MemoryFS, self).__getstate__()
+        del state['_writable_files']
+        del state['_spill_store']
+        return state
+
+    def __setstate__(self, state):
+        super(MemoryFS, self).__setstate__(state)
+        self._writable_files = weakref.WeakKeyDictionary()
+        self._spill_store = None
+        if self._memory_limit is not None:
+            self._spill_store = _SpillStore(self._memory_limit, self._spill_fs)
+
+    def close(self):
+        if not self.closed and self._spill_store is not None:
+            self._spill_store.close()
+        super(MemoryFS, self).close()
+
+    def _touch_file(self, dir_entry):
+        if self._spill_store is not None:
+            self._spill_store.touch(dir_entry)
+
     @synchronize
+    def snapshot(self):
+        """Returns a copy-on-write clone of this filesystem.
+
+        The clone initially shares all its directory entries and file
+        contents with this filesystem, so taking a snapshot is quick no matter
+        how many files there are.  Changes made to either filesystem are not
+        visible in the other.
+
+        """
+        snapshot = copy.copy(self)
+        if self._spill_store is not None:
+            with self._spill_store.lock:
+                self._spill_store.users += 1
+            snapshot._spill_store = self._spill_store
+        self._owner = next(_owner_ids)
+        snapshot._owner = next(_owner_ids)
+        # Files open for writing keep writing to this filesystem, so give
+        # the snapshot its own copy of them
+        for open_file in self._writable_files.keys():
+            if open_file.closed:
+                continue
+            snapshot._get_writable_dir_entry(open_file.path)
+            self._get_writable_dir_entry(open_file.path, share_data=True)
+        return snapshot
+
+    def _fork_dir_entry(self, dir_entry, share_data=False):
+        """Copy a DirEntry shared with a snapshot, so it may be modified."""
+        if dir_entry.isdir():
+            new_entry = self._make_dir_entry("dir", dir_entry.name, dir_entry.contents.copy())
+        else:
+            new_entry = self._make_dir_entry("file", dir_entry.name)
+            if share_data:
+                new_entry.mem_file = dir_entry.mem_file
+                new_entry._lock = dir_entry.lock
+                new_entry._open_files = dir_entry._open_files
+            else:
+                lock = dir_entry.lock
+                lock.acquire()
+                try:
+                    new_entry.mem_file = dir_entry.mem_file.copy()
+                finally:
+                    lock.release()
+                # Files that this filesystem has open follow the copy
+                if dir_entry._open_files:
+                    open_files = dir_entry._open_files
+                    new_entry._open_files = [f for f in open_files if f.memory_fs is self]
+                    open_files[:] = [f for f in open_files if f.memory_fs is not self]
+        new_entry.created_time = dir_entry.created_time
+        new_entry.modified_time = dir_entry.modified_time
+        new_entry.accessed_time = dir_entry.accessed_time
+        if dir_entry._xattrs:
+            new_entry._xattrs = dir_entry._xattrs.copy()
+        return new_entry
+
+    def _get_writable_child(self, dir_entry, name, share_data=False):
+        child = dir_entry.contents.get(name, None)
+        if child is not None and child._owner != self._owner:
+            child = self._fork_dir_entry(child, share_data=share_data)
+            self._set_dir_item(dir_entry, name, child)
+        return child
+
+    def _get_writable_dir_entry(self, path, share_data=False):
+        """Get a DirEntry that this filesystem may modify in place.
+
+        Any entries on the path that are shared with a snapshot are replaced
+        with copies.  Must be called with the lock held.
+
+        """
+        if self.root._owner != self._owner:
+            self.root = self._fork_dir_entry(self.root)
+        current_dir = self.root
+        path_components = iteratepath(normpath(path))
+        last = len(path_components) - 1
+        for i, path_component in enumerate(path_components):
+            if current_dir.contents is None:
+                return None
+            current_dir = self._get_writable_child(current_dir, path_component,
+                                                   share_data=share_data and i == last)
+            if current_dir is None:
+                return None
+        return current_dir
+
+    def _set_dir_item(self, dir_entry, name, item):
+        if self._lock_free_reads:
+            contents = dir_entry.contents.copy()
+            contents[name] = item
+            dir_entry.contents = contents
+        else:
+            dir_entry.contents[name] = item
+
+    def _del_dir_item(self, dir_entry, name):
+        if self._lock_free_reads:
+            contents = dir_entry.contents.copy()
+            del contents[name]
+            dir_entry.contents = contents
+        else:
+            del dir_entry.contents[name]
+
+    @_reader
     def _get_dir_entry(self, dirpath):
         dirpath = normpath(dirpath)
         current_dir = self.root
@@ -301,14 +1066,14 @@ class MemoryFS(FS):
             current_dir = dir_entry
         return current_dir
 
-    @synchronize
+    @_reader
     def _dir_entry(self, path):
         dir_entry = self._get_dir_entry(path)
         if dir_entry is None:
             raise ResourceNotFoundError(path)
         return dir_entry
 
-    @synchronize
+    @_reader
     def desc(self, path):
         if self.isdir(path):
             return "Memory dir"
@@ -317,7 +1082,7 @@ class MemoryFS(FS):
         else:
             return "No description available"
 
-    @synchronize
+    @_reader
     def isdir(self, path):
         path = normpath(path)
         if path in ('', '/'):
@@ -327,7 +1092,7 @@ class MemoryFS(FS):
             return False
         return dir_item.isdir()
 
-    @synchronize
+    @_reader
     def isfile(self, path):
         path = normpath(path)
         if path in ('', '/'):
@@ -337,7 +1102,7 @@ class MemoryFS(FS):
             return False
         return dir_item.isfile()
 
-    @synchronize
+    @_reader
     def exists(self, path):
         path = normpath(path)
         if path in ('', '/'):
@@ -374,12 +1139,12 @@ class MemoryFS(FS):
                     raise ResourceInvalidError(dirname, msg="Can not create a directory, because path references a file: %(path)s")
                 current_dir = dir_item
 
-            current_dir = self.root
+            current_dir = self._get_writable_dir_entry('/')
             for path_component in iteratepath(dirpath):
-                dir_item = current_dir.contents.get(path_component, None)
+                dir_item = self._get_writable_child(current_dir, path_component)
                 if dir_item is None:
                     new_dir = self._make_dir_entry("dir", path_component)
-                    current_dir.contents[path_component] = new_dir
+                    self._set_dir_item(current_dir, path_component, new_dir)
                     current_dir = new_dir
                 else:
                     current_dir = dir_item
@@ -387,7 +1152,7 @@ class MemoryFS(FS):
             parent_dir = current_dir
 
         else:
-            parent_dir = self._get_dir_entry(dirpath)
+            parent_dir = self._get_writable_dir_entry(dirpath)
             if parent_dir is None:
                 raise ParentDirectoryMissingError(dirname, msg="Could not make dir, as parent dir does not exist: %(path)s")
 
@@ -400,7 +1165,7 @@ class MemoryFS(FS):
                 raise ResourceInvalidError(dirname, msg="Can not create a directory, because path references a file: %(path)s")
 
         if dir_item is None:
-            parent_dir.contents[dirname] = self._make_dir_entry("dir", dirname)
+            self._set_dir_item(parent_dir, dirname, self._make_dir_entry("dir", dirname))
 
 
     #@synchronize
@@ -409,45 +1174,59 @@ class MemoryFS(FS):
     #        f.close()
 
 
-    @synchronize
     @iotools.filelike_to_stream
     def open(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None, line_buffering=False, **kwargs):
         path = normpath(path)
+        if 'r' in mode and '+' not in mode:
+            return self._open_existing(path, mode)
+        return self._open_writable(path, mode)
+
+    @_reader
+    def _open_existing(self, path, mode):
         filepath, filename = pathsplit(path)
         parent_dir_entry = self._get_dir_entry(filepath)
 
         if parent_dir_entry is None or not parent_dir_entry.isdir():
             raise ResourceNotFoundError(path)
 
-        if 'r' in mode or 'a' in mode:
-            if filename not in parent_dir_entry.contents:
-                raise ResourceNotFoundError(path)
-
-            file_dir_entry = parent_dir_entry.contents[filename]
-            if file_dir_entry.isdir():
-                raise ResourceInvalidError(path)
+        file_dir_entry = parent_dir_entry.contents.get(filename)
+        if file_dir_entry is None:
+            raise ResourceNotFoundError(path)
+        if file_dir_entry.isdir():
+            raise ResourceInvalidError(path)
 
-            file_dir_entry.accessed_time = datetime.datetime.now()
+        file_dir_entry.accessed_time = datetime.datetime.now()
 
-            mem_file = self.file_factory(path, self, file_dir_entry.mem_file, mode, file_dir_entry.lock)
+        mem_file = self.file_factory(path, self, file_dir_entry.mem_file, mode, file_dir_entry.lock)
+        # An entry shared with a snapshot may be renamed by the snapshot, so
+        # only entries that this filesystem owns keep track of its files
+        if file_dir_entry._owner == self._owner:
             file_dir_entry.open_files.append(mem_file)
-            return mem_file
+        return mem_file
 
-        elif 'w' in mode:
-            if filename not in parent_dir_entry.contents:
-                file_dir_entry = self._make_dir_entry("file", filename)
-                parent_dir_entry.contents[filename] = file_dir_entry
-            else:
-                file_dir_entry = parent_dir_entry.contents[filename]
+    @synchronize
+    def _open_writable(self, path, mode):
+        filepath, filename = pathsplit(path)
+        parent_dir_entry = self._get_writable_dir_entry(filepath)
+
+        if parent_dir_entry is None or not parent_dir_entry.isdir():
+            raise ResourceNotFoundError(path)
 
-            file_dir_entry.accessed_time = datetime.datetime.now()
+        file_dir_entry = self._get_writable_child(parent_dir_entry, filename)
+        if file_dir_entry is None:
+            if 'w' not in mode:
+                raise ResourceNotFoundError(path)
+            file_dir_entry = self._make_dir_entry("file", filename)
+            self._set_dir_item(parent_dir_entry, filename, file_dir_entry)
+        elif file_dir_entry.isdir():
+            raise ResourceInvalidError(path)
 
-            mem_file = self.file_factory(path, self, file_dir_entry.mem_file, mode, file_dir_entry.lock)
-            file_dir_entry.open_files.append(mem_file)
-            return mem_file
+        file_dir_entry.accessed_time = datetime.datetime.now()
 
-        if parent_dir_entry is None:
-            raise ResourceNotFoundError(path)
+        mem_file = self.file_factory(path, self, file_dir_entry.mem_file, mode, file_dir_entry.lock)
+        file_dir_entry.open_files.append(mem_file)
+        self._writable_files[mem_file] = True
+        return mem_file
 
     @synchronize
     def remove(self, path):
@@ -460,8 +1239,8 @@ class MemoryFS(FS):
             raise ResourceInvalidError(path, msg="That's a directory, not a file: %(path)s")
 
         pathname, dirname = pathsplit(path)
-        parent_dir = self._get_dir_entry(pathname)
-        del parent_dir.contents[dirname]
+        parent_dir = self._get_writable_dir_entry(pathname)
+        self._del_dir_item(parent_dir, dirname)
 
     @synchronize
     def removedir(self, path, recursive=False, force=False):
@@ -482,19 +1261,19 @@ class MemoryFS(FS):
             rpathname = path
             while rpathname:
                 rpathname, dirname = pathsplit(rpathname)
-                parent_dir = self._get_dir_entry(rpathname)
+                parent_dir = self._get_writable_dir_entry(rpathname)
                 if not dirname:
                     raise RemoveRootError(path)
-                del parent_dir.contents[dirname]
+                self._del_dir_item(parent_dir, dirname)
                 # stop recursing if the directory has other contents
                 if parent_dir.contents:
                     break
         else:
             pathname, dirname = pathsplit(path)
-            parent_dir = self._get_dir_entry(pathname)
+            parent_dir = self._get_writable_dir_entry(pathname)
             if not dirname:
                 raise RemoveRootError(path)
-            del parent_dir.contents[dirname]
+            self._del_dir_item(parent_dir, dirname)
 
     @synchronize
     def rename(self, src, dst):
@@ -504,25 +1283,26 @@ class MemoryFS(FS):
         src_entry = self._get_dir_entry(src)
         if src_entry is None:
             raise ResourceNotFoundError(src)
-        open_files = src_entry.open_files[:]
-        for f in open_files:
-            f.flush()
-            f.path = dst
 
         dst_dir,dst_name = pathsplit(dst)
         dst_entry = self._get_dir_entry(dst)
         if dst_entry is not None:
             raise DestinationExistsError(dst)
 
-        src_dir_entry = self._get_dir_entry(src_dir)
+        src_dir_entry = self._get_writable_dir_entry(src_dir)
         src_xattrs = src_dir_entry.xattrs.copy()
-        dst_dir_entry = self._get_dir_entry(dst_dir)
+        dst_dir_entry = self._get_writable_dir_entry(dst_dir)
         if dst_dir_entry is None:
             raise ParentDirectoryMissingError(dst)
-        dst_dir_entry.contents[dst_name] = src_dir_entry.contents[src_name]
-        dst_dir_entry.contents[dst_name].name = dst_name
+        # Fork the entry first, so only this filesystem's files are moved
+        src_entry = self._get_writable_child(src_dir_entry, src_name)
+        for f in src_entry.open_files[:]:
+            f.flush()
+            f.path = dst
+        src_entry.name = dst_name
+        self._set_dir_item(dst_dir_entry, dst_name, src_entry)
         dst_dir_entry.xattrs.update(src_xattrs)
-        del src_dir_entry.contents[src_name]
+        self._del_dir_item(src_dir_entry, src_name)
 
     @synchronize
     def settimes(self, path, accessed_time=None, modified_time=None):
@@ -532,27 +1312,33 @@ class MemoryFS(FS):
         if modified_time is None:
             modified_time = now
 
-        dir_entry = self._get_dir_entry(path)
+        dir_entry = self._get_writable_dir_entry(path)
         if dir_entry is not None:
             dir_entry.accessed_time = accessed_time
             dir_entry.modified_time = modified_time
             return True
         return False
 
-    @synchronize
+    @_reader
     def _on_close_memory_file(self, open_file, path):
+        self._writable_files.pop(open_file, None)
         dir_entry = self._get_dir_entry(path)
-        if dir_entry is not None and open_file in dir_entry.open_files:
-            dir_entry.open_files.remove(open_file)
+        if dir_entry is not None:
+            try:
+                dir_entry.open_files.remove(open_file)
+            except ValueError:
+                pass
+            if dir_entry.isfile():
+                self._touch_file(dir_entry)
 
 
-    @synchronize
+    @_reader
     def _on_modify_memory_file(self, path):
         dir_entry = self._get_dir_entry(path)
         if dir_entry is not None:
             dir_entry.modified_time = datetime.datetime.now()
 
-    @synchronize
+    @_reader
     def listdir(self, path="/", wildcard=None, full=False, absolute=False, dirs_only=False, files_only=False):
         dir_entry = self._get_dir_entry(path)
         if dir_entry is None:
@@ -565,13 +1351,28 @@ class MemoryFS(FS):
                 paths[i] = unicode(p)
         return self._listdir_helper(path, paths, wildcard, full, absolute, dirs_only, files_only)
 
-    @synchronize
+    @_reader
+    def scandir(self, path="/"):
+        dir_entry = self._get_dir_entry(path)
+        if dir_entry is None:
+            raise ResourceNotFoundError(path)
+        if dir_entry.isfile():
+            raise ResourceInvalidError(path, msg="not a directory: %(path)s")
+        path = normpath(path)
+        return iter([_MemoryScandirEntry(self, path, unicode(name), entry)
+                     for name, entry in dir_entry.contents.items()])
+
+    @_reader
     def getinfo(self, path):
         dir_entry = self._get_dir_entry(path)
 
         if dir_entry is None:
             raise ResourceNotFoundError(path)
 
+        return self._dir_entry_info(dir_entry)
+
+    @_reader
+    def _dir_entry_info(self, dir_entry):
         info = {}
         info['created_time'] = dir_entry.created_time
         info['modified_time'] = dir_entry.modified_time
@@ -580,7 +1381,7 @@ class MemoryFS(FS):
         if dir_entry.isdir():
             info['st_mode'] = 0755 | stat.S_IFDIR
         else:
-            info['size'] = len(dir_entry.data or b(''))
+            info['size'] = len(dir_entry.mem_file)
             info['st_mode'] = 0666 | stat.S_IFREG
 
         return info
@@ -592,7 +1393,7 @@ class MemoryFS(FS):
             raise ResourceNotFoundError(src)
         src_xattrs = src_dir_entry.xattrs.copy()
         super(MemoryFS, self).copydir(src, dst, overwrite, ignore_errors=ignore_errors, chunk_size=chunk_size)
-        dst_dir_entry = self._get_dir_entry(dst)
+        dst_dir_entry = self._get_writable_dir_entry(dst)
         if dst_dir_entry is not None:
             dst_dir_entry.xattrs.update(src_xattrs)
 
@@ -603,7 +1404,7 @@ class MemoryFS(FS):
             raise ResourceNotFoundError(src)
         src_xattrs = src_dir_entry.xattrs.copy()
         super(MemoryFS, self).movedir(src, dst, overwrite, ignore_errors=ignore_errors, chunk_size=chunk_size)
-        dst_dir_entry = self._get_dir_entry(dst)
+        dst_dir_entry = self._get_writable_dir_entry(dst)
         if dst_dir_entry is not None:
             dst_dir_entry.xattrs.update(src_xattrs)
 
@@ -614,7 +1415,7 @@ class MemoryFS(FS):
             raise ResourceNotFoundError(src)
         src_xattrs = src_dir_entry.xattrs.copy()
         super(MemoryFS, self).copy(src, dst, overwrite, chunk_size)
-        dst_dir_entry = self._get_dir_entry(dst)
+        dst_dir_entry = self._get_writable_dir_entry(dst)
         if dst_dir_entry is not None:
             dst_dir_entry.xattrs.update(src_xattrs)
 
@@ -625,11 +1426,11 @@ class MemoryFS(FS):
             raise ResourceNotFoundError(src)
         src_xattrs = src_dir_entry.xattrs.copy()
         super(MemoryFS, self).move(src, dst, overwrite, chunk_size)
-        dst_dir_entry = self._get_dir_entry(dst)
+        dst_dir_entry = self._get_writable_dir_entry(dst)
         if dst_dir_entry is not None:
             dst_dir_entry.xattrs.update(src_xattrs)
 
-    @synchronize
+    @_reader
     def getcontents(self, path, mode="rb", encoding=None, errors=None, newline=None):
         dir_entry = self._get_dir_entry(path)
         if dir_entry is None:
@@ -637,6 +1438,7 @@ class MemoryFS(FS):
         if not dir_entry.isfile():
             raise ResourceInvalidError(path, msg="not a file: %(path)s")
         data = dir_entry.data or b('')
+        self._touch_file(dir_entry)
         if 'b' not in mode:
             return iotools.decode_binary(data, encoding=encoding, errors=errors, newline=newline)
         return data
@@ -646,12 +1448,11 @@ class MemoryFS(FS):
         if isinstance(data, six.binary_type):
             if not self.exists(path):
                 self.open(path, 'wb').close()
-            dir_entry = self._get_dir_entry(path)
+            dir_entry = self._get_writable_dir_entry(path)
             if not dir_entry.isfile():
                 raise ResourceInvalidError('Not a directory %(path)s', path)
-            new_mem_file = StringIO()
-            new_mem_file.write(data)
-            dir_entry.mem_file = new_mem_file
+            dir_entry.mem_file = MemoryBuffer(data)
+            self._touch_file(dir_entry)
             return len(data)
 
         return super(MemoryFS, self).setcontents(path, data=data, encoding=encoding, errors=errors, chunk_size=chunk_size)
@@ -668,13 +1469,50 @@ class MemoryFS(FS):
         # new_mem_file.write(data)
         # dir_entry.mem_file = new_mem_file
 
+    @synchronize
+    def getmmap(self, path, read_only=False, copy=False):
+        """Returns a :class:`MemoryMap` for random access to a file.
+
+        :param path: A path to a file
+        :param read_only: If True, the map may not be written to
+        :param copy: If True, the map is backed by a copy of the file, so
+            writes to the map don't change the file (and vice versa).
+            The copy shares storage with the file until either is modified.
+
+        """
+        path = normpath(path)
+        if read_only or copy:
+            dir_entry = self._get_dir_entry(path)
+        else:
+            dir_entry = self._get_writable_dir_entry(path)
+        if dir_entry is None:
+            raise ResourceNotFoundError(path)
+        if not dir_entry.isfile():
+            raise ResourceInvalidError(path, msg="not a file: %(path)s")
+        lock = dir_entry.lock
+        if copy:
+            lock.acquire()
+            try:
+                mem_file = dir_entry.mem_file.copy()
+            finally:
+                lock.release()
+            return MemoryMap(path, None, mem_file, threading.RLock(), read_only=read_only)
+        mmap = MemoryMap(path, self, dir_entry.mem_file, lock, read_only=read_only)
+        if dir_entry._owner == self._owner:
+            dir_entry.open_files.append(mmap)
+        if not read_only:
+            self._writable_files[mmap] = True
+        return mmap
+
     @synchronize
     def setxattr(self, path, key, value):
-        dir_entry = self._dir_entry(path)
+        dir_entry = self._get_writable_dir_entry(path)
+        if dir_entry is None:
+            raise ResourceNotFoundError(path)
         key = unicode(key)
         dir_entry.xattrs[key] = value
 
-    @synchronize
+    @_reader
     def getxattr(self, path, key, default=None):
         key = unicode(key)
         dir_entry = self._dir_entry(path)
@@ -682,13 +1520,15 @@ class MemoryFS(FS):
 
     @synchronize
     def delxattr(self, path, key):
-        dir_entry = self._dir_entry(path)
+        dir_entry = self._get_writable_dir_entry(path)
+        if dir_entry is None:
+            raise ResourceNotFoundError(path)
         try:
             del dir_entry.xattrs[key]
         except KeyError:
             pass
 
-    @synchronize
+    @_reader
     def listxattrs(self, path):
         dir_entry = self._dir_entry(path)
         return dir_entry.xattrs.keys()
@@ -79,6 +79,26 @@ def _os_makedirs(name, mode=0777):
     os.mkdir(name, mode)
 
 
+class _OSFSScandirEntry(ScandirEntry):
+    """ScandirEntry that gets its info from the os-level directory entry.
+
+    The stat result is cached by the directory entry, and on some platforms
+    (e.g. win32) it is retrieved along with the listing.
+    """
+
+    __slots__ = ('_dir_entry',)
+
+    def __init__(self, fs, dir_path, name, dir_entry):
+        super(_OSFSScandirEntry, self).__init__(fs, dir_path, name,
+                                                dir_entry.is_dir(),
+                                                dir_entry.is_file())
+        self._dir_entry = dir_entry
+
+    @convert_os_errors
+    def _load_info(self):
+        return self.fs._stat_info(self._dir_entry.stat())
+
+
 class OSFS(OSFSXAttrMixin, OSFSWatchMixin, FS):
     """Expose the underlying operating-system filesystem as an FS object.
 
@@ -280,6 +300,19 @@ class OSFS(OSFSXAttrMixin, OSFSWatchMixin, FS):
 
             return self._listdir_helper(path, paths, wildcard, full, absolute, False, False)
 
+    @convert_os_errors
+    def scandir(self, path="./"):
+        _decode_path = self._decode_path
+        sys_path = self.getsyspath(path)
+        path = normpath(path)
+        if scandir is None:
+            return iter([ScandirEntry(self, path, _decode_path(p),
+                                      _isdir(os.path.join(sys_path, p)),
+                                      _isfile(os.path.join(sys_path, p)))
+                         for p in os.listdir(sys_path)])
+        return iter([_OSFSScandirEntry(self, path, _decode_path(dir_entry.name), dir_entry)
+                     for dir_entry in scandir(sys_path)])
+
     @convert_os_errors
     def makedir(self, path, recursive=False, allow_recreate=False):
         sys_path = self.getsyspath(path)
@@ -363,7 +396,11 @@ class OSFS(OSFSXAttrMixin, OSFSWatchMixin, FS):
 
     @convert_os_errors
     def getinfo(self, path):
-        stats = self._stat(path)
+        return self._stat_info(self._stat(path))
+
+    @staticmethod
+    def _stat_info(stats):
+        """Build an info dict from the result of a stat call."""
         info = dict((k, getattr(stats, k)) for k in dir(stats) if k.startswith('st_'))
         info['size'] = info['st_size']
         #  TODO: this doesn't actually mean 'creation time' on unix
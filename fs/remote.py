@@ -11,6 +11,10 @@ FS subclasses interfacing with a remote filesystem.  These include:
   * RemoteFileBuffer:  a file-like object that locally buffers the contents of
                        a remote file, writing them back on flush() or close().
 
+  * RemoteRangeReader:  base class for objects giving RemoteFileBuffer random
+                        access to the contents of a remote file, so that only
+                        the byte ranges actually used are downloaded.
+
   * ConnectionManagerFS:  a WrapFS subclass that tracks the connection state
                           of a remote FS, and allows client code to wait for
                           a connection to be re-established.
@@ -33,6 +37,7 @@ from fs.wrapfs.lazyfs import LazyFS
 from fs.path import *
 from fs.errors import *
 from fs.local_functools import wraps
+from fs.local_collections import OrderedDict
 from fs.filelike import StringIO, SpooledTemporaryFile, FileWrapper
 from fs import SEEK_SET, SEEK_CUR, SEEK_END
 
@@ -42,6 +47,41 @@ _SENTINAL = object()
 from six import PY3, b
 
 
+class RemoteRangeReader(object):
+    """Random access to the contents of a remote file.
+
+    Instances of this class can be given to RemoteFileBuffer in place of a
+    read()-able remote file.  The buffer then fetches only the byte ranges
+    that are actually read (plus some read-ahead for sequential access),
+    instead of downloading the file from the start up to the current
+    position.  Subclasses must implement read_range(), e.g. with an HTTP
+    'Range' request, and may override iter_range() to fetch large ranges
+    in several pieces at once.
+    """
+
+    #  Upper limit on read-ahead for RemoteFileBuffers using this reader,
+    #  or None for the buffer's default.
+    max_readahead = None
+
+    def __init__(self, size):
+        self.size = size
+
+    def read_range(self, offset, length):
+        """Read 'length' bytes starting at 'offset' in the remote file.
+
+        Fewer bytes may only be returned at the end of the file.  This must
+        be implemented by subclasses; the base class raises UnsupportedError.
+        """
+        raise UnsupportedError("read range")
+
+    def iter_range(self, offset, length):
+        """Iterate over (offset, data) pieces of the given range, in order."""
+        yield (offset, self.read_range(offset, length))
+
+    def close(self):
+        pass
+
+
 class RemoteFileBuffer(FileWrapper):
     """File-like object providing buffer for local file operations.
 
@@ -64,10 +104,20 @@ class RemoteFileBuffer(FileWrapper):
             self._put_remote_file(path,file)
 
     The contents of the remote file are read into the buffer on-demand.
+    If 'rfile' is a RemoteRangeReader, only the parts of the file that are
+    needed are read, and the buffer keeps track of which extents have been
+    filled; otherwise the file is read sequentially up to the furthest
+    position that has been accessed.
     """
 
     max_size_in_memory = 1024 * 8
 
+    #  Limits on the amount of data read ahead of sequential reads, when
+    #  using a RemoteRangeReader.  The amount read ahead doubles with each
+    #  sequential read, and drops back to zero on a seek.
+    min_readahead = 1024 * 64
+    max_readahead = 1024 * 1024 * 4
+
     def __init__(self, fs, path, mode, rfile=None, write_on_flush=True):
         """RemoteFileBuffer constructor.
 
@@ -83,6 +133,7 @@ class RemoteFileBuffer(FileWrapper):
         self._readlen = 0  # How many bytes already loaded from rfile
         self._rfile = None  # Reference to remote file object
         self._eof = False  # Reached end of rfile?
+        self._extents = None  # Filled (start,end) extents, for RemoteRangeReaders
         if getattr(fs, "_lock", None) is not None:
             self._lock = fs._lock.__class__()
         else:
@@ -94,7 +145,16 @@ class RemoteFileBuffer(FileWrapper):
                 self._changed = True
                 self._eof = True
 
-            if not hasattr(rfile, "read"):
+            if hasattr(rfile, "read_range"):
+                self._extents = []
+                self._remote_size = rfile.size  # Size of the data in rfile
+                self._size = rfile.size  # Size of the file in the buffer
+                self._next_read = 0  # Where a sequential read would start
+                self._readahead = 0
+                self._max_readahead = getattr(rfile, "max_readahead", None) or self.max_readahead
+                if not rfile.size:
+                    self._eof = True
+            elif not hasattr(rfile, "read"):
                 #rfile = StringIO(unicode(rfile))
                 rfile = StringIO(rfile)
 
@@ -123,6 +183,15 @@ class RemoteFileBuffer(FileWrapper):
 
     def _write(self,data,flushing=False):
         with self._lock:
+            if self._extents is not None:
+                #  Written data replaces the remote data, so it never needs
+                #  to be fetched.
+                pos = self.wrapped_file.tell()
+                self.wrapped_file.write(data)
+                self._add_extent(pos, pos + len(data))
+                self._size = max(self._size, pos + len(data))
+                self._changed = True
+                return
             #  Do we need to discard info from the buffer?
             toread = len(data) - (self._readlen - self.wrapped_file.tell())
             if toread > 0:
@@ -163,6 +232,58 @@ class RemoteFileBuffer(FileWrapper):
             self._rfile.close()
         self._readlen += bytes_read
 
+    def _missing_extents(self, start, end):
+        """Get the (start,end) extents between start and end not yet filled."""
+        missing = []
+        for (s, e) in self._extents:
+            if e <= start:
+                continue
+            if s >= end:
+                break
+            if s > start:
+                missing.append((start, s))
+            start = e
+        if start < end:
+            missing.append((start, end))
+        return missing
+
+    def _add_extent(self, start, end):
+        """Mark the given extent as filled, merging it with its neighbours."""
+        if start >= end:
+            return
+        extents = []
+        for (s, e) in self._extents:
+            if e < start or s > end:
+                extents.append((s, e))
+            else:
+                start = min(start, s)
+                end = max(end, e)
+        extents.append((start, end))
+        extents.sort()
+        self._extents = extents
+
+    def _fill_extents(self, start, end):
+        """Fetch the unfilled parts of the given range from the remote file.
+
+        This leaves the position of the buffer file undefined.
+        """
+        if self._eof:
+            return
+        end = min(end, self._remote_size)
+        for (s, e) in self._missing_extents(start, end):
+            for (offset, data) in self._rfile.iter_range(s, e - s):
+                self.wrapped_file.seek(offset)
+                self.wrapped_file.write(data)
+                self._add_extent(offset, offset + len(data))
+            missing = self._missing_extents(s, e)
+            if missing:
+                #  The remote file is shorter than it used to be
+                self._remote_size = missing[0][0]
+                break
+        if not self._missing_extents(0, self._remote_size):
+            self._eof = True
+            self._rfile.close()
+
     def _fillbuffer(self, length=None):
         """Fill the local buffer, leaving file position unchanged.
 
@@ -193,14 +314,46 @@ class RemoteFileBuffer(FileWrapper):
         if length is not None and length < 0:
             length = None
         with self._lock:
+            if self._extents is not None:
+                return self._read_extents(length)
             self._fillbuffer(length)
             data = self.wrapped_file.read(length if length != None else -1)
             if not data:
                 data = None
             return data
 
+    def _read_extents(self, length=None):
+        pos = self.wrapped_file.tell()
+        if pos >= self._size:
+            return None
+        if length is None:
+            end = self._size
+        else:
+            end = min(self._size, pos + length)
+        sequential = (pos == self._next_read)
+        self._next_read = end
+        if not sequential:
+            self._readahead = 0
+        if not self._eof and self._missing_extents(pos, min(end, self._remote_size)):
+            if sequential:
+                self._readahead = max(self.min_readahead, self._readahead * 2)
+                self._readahead = min(self._readahead, self._max_readahead)
+            self._fill_extents(pos, end + self._readahead)
+        self.wrapped_file.seek(pos)
+        data = self.wrapped_file.read(end - pos)
+        if not data:
+            data = None
+        return data
+
     def _seek(self,offset,whence=SEEK_SET):
         with self._lock:
+            if self._extents is not None:
+                #  Nothing needs fetching until the data is read
+                if whence == SEEK_END:
+                    self.wrapped_file.seek(self._size + offset)
+                else:
+                    self.wrapped_file.seek(offset, whence)
+                return
             if not self._eof:
                 # Count absolute position of seeking
                 if whence == SEEK_SET:
@@ -225,6 +378,18 @@ class RemoteFileBuffer(FileWrapper):
 
     def _truncate(self,size):
         with self._lock:
+            if self._extents is not None:
+                if size is None:
+                    size = self.wrapped_file.tell()
+                #  Data past the new size must not be fetched again
+                if size < self._remote_size:
+                    self._remote_size = size
+                    self._extents = [(s, min(e, size)) for (s, e) in self._extents if s < size]
+                self._size = size
+                self.wrapped_file.truncate(size)
+                self._changed = True
+                self.flush()
+                return
             if not self._eof and self._readlen < size:
                 # Read the rest of file
                 self._fillbuffer(size - self._readlen)
@@ -256,7 +421,12 @@ class RemoteFileBuffer(FileWrapper):
 
         # If not all data loaded, load until eof
         if not self._eof:
-            self._fillbuffer()
+            if self._extents is not None:
+                pos = self.wrapped_file.tell()
+                self._fill_extents(0, self._remote_size)
+                self.wrapped_file.seek(pos)
+            else:
+                self._fillbuffer()
 
         if "w" in self.mode or "a" in self.mode or "+" in self.mode:
             pos = self.wrapped_file.tell()
@@ -404,7 +574,10 @@ wrap_fs_methods(_ConnectionManagerFS_method_wrapper,ConnectionManagerFS)
 
 
 class CachedInfo(object):
-    """Info objects stored in cache for CacheFS."""
+    """Info objects stored in cache for CacheFS.
+
+    An info of None records that the path does not exist.
+    """
     __slots__ = ("timestamp","info","has_full_info","has_full_children")
     def __init__(self,info={},has_full_info=True,has_full_children=False):
         self.timestamp = time.time()
@@ -428,6 +601,9 @@ class CachedInfo(object):
     def new_dir_stub(cls):
         info = {"info" : 0700 | statinfo.S_IFDIR}
         return cls(info,has_full_info=False)
+    @classmethod
+    def new_missing_stub(cls):
+        return cls(None)
 
 
 class CacheFSMixin(FS):
@@ -456,20 +632,37 @@ class CacheFSMixin(FS):
         timeout in seconds.  The default timeout is 1 second.  To prevent
         cache entries from ever timing out, set it to None.
 
+        The optional keyword argument 'negative_cache_timeout' specifies the
+        timeout in seconds for entries recording that a path does not exist.
+        The default of 0 disables such entries, so files created behind the
+        back of the cache are seen straight away.  To prevent them from ever
+        timing out, set it to None.
+
         The optional keyword argument 'max_cache_size' specifies the maximum
         number of entries to keep in the cache.  To allow the cache to grow
-        without bound, set it to None.  The default is 1000.
+        without bound, set it to None.  The default is 1000.  When the cache
+        is full, the least-recently-used entries are evicted first.
         """
         self.cache_timeout = kwds.pop("cache_timeout",1)
+        self.negative_cache_timeout = kwds.pop("negative_cache_timeout",0)
         self.max_cache_size = kwds.pop("max_cache_size",1000)
+        self.__init_cache()
+        super(CacheFSMixin,self).__init__(*args,**kwds)
+
+    def __init_cache(self):
+        #  The PathMap allows whole subtrees to be found and dropped, while
+        #  the OrderedDict holds the same entries in least-recently-used
+        #  order, keyed by absolute path.
         self.__cache = PathMap()
-        self.__cache_size = 0
+        self.__lru = OrderedDict()
         self.__cache_lock = threading.RLock()
-        super(CacheFSMixin,self).__init__(*args,**kwds)
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
 
     def clear_cache(self,path=""):
         with self.__cache_lock:
-            self.__cache.clear(path)
+            self.__cache_clear(path)
         try:
             scc = super(CacheFSMixin,self).clear_cache
         except AttributeError:
@@ -477,66 +670,137 @@ class CacheFSMixin(FS):
         else:
             scc()
 
+    def get_cache_stats(self):
+        """Get statistics about the use of the meta-data cache.
+
+        Returns a dictionary with the number of cache 'hits', 'misses' and
+        'evictions' so far, and the current number of entries ('size').
+        """
+        with self.__cache_lock:
+            return {"hits": self.__hits,
+                    "misses": self.__misses,
+                    "evictions": self.__evictions,
+                    "size": len(self.__lru)}
+
     def __getstate__(self):
         state = super(CacheFSMixin,self).__getstate__()
-        state.pop("_CacheFSMixin__cache",None)
-        state.pop("_CacheFSMixin__cache_size",None)
-        state.pop("_CacheFSMixin__cache_lock",None)
+        for attr in ("cache","lru","cache_lock","hits","misses","evictions"):
+            state.pop("_CacheFSMixin__" + attr,None)
         return state
 
     def __setstate__(self,state):
         super(CacheFSMixin,self).__setstate__(state)
-        self.__cache = PathMap()
-        self.__cache_size = 0
-        self.__cache_lock = threading.RLock()
+        self.__init_cache()
 
     def __get_cached_info(self,path,default=_SENTINAL):
-        try:
-            info = self.__cache[path]
-            if self.cache_timeout is not None:
-                now = time.time()
-                if info.timestamp < (now - self.cache_timeout):
-                    with self.__cache_lock:
-                        self.__expire_from_cache(path)
-                        raise KeyError
-            return info
-        except KeyError:
-            if default is not _SENTINAL:
-                return default
-            raise
+        path = abspath(normpath(path))
+        with self.__cache_lock:
+            ci = self.__lru.pop(path,None)
+            if ci is not None:
+                if ci.info is None:
+                    timeout = self.negative_cache_timeout
+                else:
+                    timeout = self.cache_timeout
+                if timeout is not None and ci.timestamp < (time.time() - timeout):
+                    self.__cache.pop(path,None)
+                    self.__parent_lost_child(path)
+                    ci = None
+            if ci is None:
+                self.__misses += 1
+                if default is not _SENTINAL:
+                    return default
+                raise KeyError(path)
+            self.__lru[path] = ci
+            self.__hits += 1
+            return ci
 
     def __set_cached_info(self,path,new_ci,old_ci=None):
         was_room = True
+        path = abspath(normpath(path))
         with self.__cache_lock:
-            #  Free up some room in the cache
-            if self.max_cache_size is not None and old_ci is None:
-                while self.__cache_size >= self.max_cache_size:
-                    try:
-                        to_del = iter(self.__cache).next()
-                    except StopIteration:
-                        break
-                    else:
-                        was_room = False
-                        self.__expire_from_cache(to_del)
             #  Atomically add to the cache.
             #  If there's a race, newest information wins
-            ci = self.__cache.setdefault(path,new_ci)
-            if ci is new_ci:
-                self.__cache_size += 1
+            ci = self.__lru.get(path)
+            if ci is None:
+                if self.max_cache_size is not None:
+                    was_room = len(self.__lru) < self.max_cache_size
+                self.__cache_put(path,new_ci)
             else:
                 if old_ci is None or ci is old_ci:
                     if ci.timestamp < new_ci.timestamp:
                         ci.update_from(new_ci)
         return was_room
 
-    def __expire_from_cache(self,path):
-        del self.__cache[path]
-        self.__cache_size -= 1
-        for ancestor in recursepath(path):
-            try:
-                self.__cache[ancestor].has_full_children = False
-            except KeyError:
-                pass
+    def __set_missing(self,path):
+        """Record that the given path does not exist."""
+        if self.negative_cache_timeout == 0:
+            return
+        path = abspath(normpath(path))
+        with self.__cache_lock:
+            self.__cache_clear(path)
+            self.__cache_put(path,CachedInfo.new_missing_stub())
+
+    def __cache_put(self,path,ci):
+        #  Must be called holding the cache lock, with a normalised path
+        self.__cache[path] = ci
+        self.__lru.pop(path,None)
+        self.__lru[path] = ci
+        if self.max_cache_size is not None:
+            while len(self.__lru) > self.max_cache_size:
+                (old_path,_old_ci) = self.__lru.popitem(last=False)
+                self.__cache.pop(old_path,None)
+                self.__evictions += 1
+                self.__parent_lost_child(old_path)
+
+    def __parent_lost_child(self,path):
+        #  Must be called holding the cache lock, after dropping the entry
+        #  for a path.  The parent no longer has all its children cached.
+        pci = self.__lru.get(dirname(path))
+        if pci is not None:
+            pci.has_full_children = False
+
+    def __cache_remove(self,path):
+        #  Must be called holding the cache lock
+        path = abspath(normpath(path))
+        if self.__lru.pop(path,None) is not None:
+            self.__cache.pop(path,None)
+
+    def __cache_clear(self,path):
+        #  Must be called holding the cache lock
+        for (subpath,_ci) in self.__cache.iteritems(path):
+            self.__lru.pop(subpath,None)
+        self.__cache.clear(path)
+
+    def __invalidate(self,path):
+        """Drop cached info for a path that is being created or modified.
+
+        Everything below the path is dropped, along with any record of its
+        ancestors not existing.
+        """
+        with self.__cache_lock:
+            self.__cache_clear(path)
+            for ancestor in recursepath(abspath(normpath(path)))[:-1]:
+                pci = self.__lru.get(ancestor)
+                if pci is not None and pci.info is None:
+                    self.__cache_remove(ancestor)
+
+    def __copy_cached(self,src,dst):
+        """Copy cached info for everything below src to below dst."""
+        with self.__cache_lock:
+            self.__invalidate(dst)
+            for (subpath,ci) in self.__cache.items(src):
+                if ci.info is not None:
+                    dstpath = pathjoin(dst,relpath(frombase(abspath(normpath(src)),subpath)))
+                    self.__cache_put(abspath(normpath(dstpath)),ci.clone())
+
+    def __has_cached_children(self,path):
+        """Check whether anything below the path is known to exist."""
+        path = abspath(normpath(path))
+        with self.__cache_lock:
+            for (subpath,ci) in self.__cache.iteritems(path):
+                if subpath != path and ci.info is not None:
+                    return True
+        return False
 
     def open(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None, line_buffering=False, **kwargs):
         #  Try to validate the entry using the cached info
@@ -551,17 +815,20 @@ class CacheFSMixin(FS):
             except KeyError:
                 pass
             else:
-                if not fs.utils.isdir(super(CacheFSMixin, self), ppath, pci.info):
-                    raise ResourceInvalidError(path)
-                if pci.has_full_children:
-                    raise ResourceNotFoundError(path)
+                if pci.info is not None:
+                    if not fs.utils.isdir(super(CacheFSMixin, self), ppath, pci.info):
+                        raise ResourceInvalidError(path)
+                    if pci.has_full_children:
+                        raise ResourceNotFoundError(path)
         else:
-            if not fs.utils.isfile(super(CacheFSMixin, self), path, ci.info):
+            if ci.info is None:
+                if "w" not in mode and "a" not in mode:
+                    raise ResourceNotFoundError(path)
+            elif not fs.utils.isfile(super(CacheFSMixin, self), path, ci.info):
                 raise ResourceInvalidError(path)
         f = super(CacheFSMixin, self).open(path, mode=mode, buffering=buffering, encoding=encoding, errors=errors, newline=newline, line_buffering=line_buffering, **kwargs)
         if "w" in mode or "a" in mode or "+" in mode:
-            with self.__cache_lock:
-                self.__cache.clear(path)
+            self.__invalidate(path)
             f = self._CacheInvalidatingFile(self, path, f, mode)
         return f
 
@@ -572,13 +839,11 @@ class CacheFSMixin(FS):
             sup.__init__(wrapped_file, mode)
             self.owner = owner
         def _write(self, string, flushing=False):
-            with self.owner._CacheFSMixin__cache_lock:
-                self.owner._CacheFSMixin__cache.clear(self.path)
+            self.owner._CacheFSMixin__invalidate(self.path)
             sup = super(CacheFSMixin._CacheInvalidatingFile, self)
             return sup._write(string, flushing=flushing)
         def _truncate(self, size):
-            with self.owner._CacheFSMixin__cache_lock:
-                self.owner._CacheFSMixin__cache.clear(self.path)
+            self.owner._CacheFSMixin__invalidate(self.path)
             sup = super(CacheFSMixin._CacheInvalidatingFile, self)
             return sup._truncate(size)
 
@@ -591,13 +856,8 @@ class CacheFSMixin(FS):
             return True
 
     def isdir(self, path):
-        try:
-            self.__cache.iternames(path).next()
+        if self.__has_cached_children(path):
             return True
-        except StopIteration:
-            pass
-        except RuntimeError:
-            pass
         try:
             info = self.getinfo(path)
         except ResourceNotFoundError:
@@ -606,13 +866,8 @@ class CacheFSMixin(FS):
             return fs.utils.isdir(super(CacheFSMixin, self), path, info)
 
     def isfile(self, path):
-        try:
-            self.__cache.iternames(path).next()
+        if self.__has_cached_children(path):
             return False
-        except StopIteration:
-            pass
-        except RuntimeError:
-            pass
         try:
             info = self.getinfo(path)
         except ResourceNotFoundError:
@@ -623,11 +878,17 @@ class CacheFSMixin(FS):
     def getinfo(self, path):
         try:
             ci = self.__get_cached_info(path)
+            if ci.info is None:
+                raise ResourceNotFoundError(path)
             if not ci.has_full_info:
                 raise KeyError
             info = ci.info
         except KeyError:
-            info = super(CacheFSMixin, self).getinfo(path)
+            try:
+                info = super(CacheFSMixin, self).getinfo(path)
+            except ResourceNotFoundError:
+                self.__set_missing(path)
+                raise
             self.__set_cached_info(path, CachedInfo(info))
         return info
 
@@ -652,7 +913,7 @@ class CacheFSMixin(FS):
                 if nm not in names:
                     to_del.append(nm)
             for nm in to_del:
-                self.__cache.clear(pathjoin(path,nm))
+                self.__cache_clear(pathjoin(path,nm))
             #try:
             #    pci = self.__cache[path]
             #except KeyError:
@@ -676,69 +937,67 @@ class CacheFSMixin(FS):
         supsc = super(CacheFSMixin, self).setcontents
         res = supsc(path, data, encoding=None, errors=None, chunk_size=chunk_size)
         with self.__cache_lock:
-            self.__cache.clear(path)
-            self.__cache[path] = CachedInfo.new_file_stub()
+            self.__invalidate(path)
+            self.__cache_put(abspath(normpath(path)),CachedInfo.new_file_stub())
         return res
 
     def createfile(self, path, wipe=False):
         super(CacheFSMixin,self).createfile(path, wipe=wipe)
         with self.__cache_lock:
-            self.__cache.clear(path)
-            self.__cache[path] = CachedInfo.new_file_stub()
+            self.__invalidate(path)
+            self.__cache_put(abspath(normpath(path)),CachedInfo.new_file_stub())
 
     def makedir(self,path,*args,**kwds):
         super(CacheFSMixin,self).makedir(path,*args,**kwds)
         with self.__cache_lock:
-            self.__cache.clear(path)
-            self.__cache[path] = CachedInfo.new_dir_stub()
+            self.__invalidate(path)
+            self.__cache_put(abspath(normpath(path)),CachedInfo.new_dir_stub())
 
     def remove(self,path):
         super(CacheFSMixin,self).remove(path)
         with self.__cache_lock:
-            self.__cache.clear(path)
+            self.__cache_clear(path)
+            self.__set_missing(path)
 
     def removedir(self,path,**kwds):
         super(CacheFSMixin,self).removedir(path,**kwds)
         with self.__cache_lock:
-            self.__cache.clear(path)
+            self.__cache_clear(path)
+            self.__set_missing(path)
 
     def rename(self,src,dst):
         super(CacheFSMixin,self).rename(src,dst)
         with self.__cache_lock:
-            for (subpath,ci) in self.__cache.items(src):
-                self.__cache[pathjoin(dst,subpath)] = ci.clone()
-            self.__cache.clear(src)
+            self.__copy_cached(src,dst)
+            self.__cache_clear(src)
+            self.__set_missing(src)
 
     def copy(self,src,dst,**kwds):
         super(CacheFSMixin,self).copy(src,dst,**kwds)
-        with self.__cache_lock:
-            for (subpath,ci) in self.__cache.items(src):
-                self.__cache[pathjoin(dst,subpath)] = ci.clone()
+        self.__copy_cached(src,dst)
 
     def copydir(self,src,dst,**kwds):
         super(CacheFSMixin,self).copydir(src,dst,**kwds)
-        with self.__cache_lock:
-            for (subpath,ci) in self.__cache.items(src):
-                self.__cache[pathjoin(dst,subpath)] = ci.clone()
+        self.__copy_cached(src,dst)
 
     def move(self,src,dst,**kwds):
         super(CacheFSMixin,self).move(src,dst,**kwds)
         with self.__cache_lock:
-            for (subpath,ci) in self.__cache.items(src):
-                self.__cache[pathjoin(dst,subpath)] = ci.clone()
-            self.__cache.clear(src)
+            self.__copy_cached(src,dst)
+            self.__cache_clear(src)
+            self.__set_missing(src)
 
     def movedir(self,src,dst,**kwds):
         super(CacheFSMixin,self).movedir(src,dst,**kwds)
         with self.__cache_lock:
-            for (subpath,ci) in self.__cache.items(src):
-                self.__cache[pathjoin(dst,subpath)] = ci.clone()
-            self.__cache.clear(src)
+            self.__copy_cached(src,dst)
+            self.__cache_clear(src)
+            self.__set_missing(src)
 
     def settimes(self,path,*args,**kwds):
         super(CacheFSMixin,self).settimes(path,*args,**kwds)
         with self.__cache_lock:
-            self.__cache.pop(path,None)
+            self.__cache_remove(path)
 
 
 class CacheFS(CacheFSMixin,WrapFS):
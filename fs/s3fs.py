@@ -11,21 +11,27 @@ interface for objects stored in Amazon Simple Storage Service (S3).
 
 """
 
+from __future__ import with_statement
+
 import os
+import sys
 import datetime
-import tempfile
+import calendar
+import threading
 from fnmatch import fnmatch
 import stat as statinfo
 
 import boto.s3.connection
 from boto.s3.prefix import Prefix
+from boto.s3.multipart import MultiPartUpload
 from boto.exception import S3ResponseError
 
 from fs.base import *
 from fs.path import *
 from fs.errors import *
 from fs.remote import *
-from fs.filelike import LimitBytesFile
+from fs.filelike import LimitBytesFile, FileLikeBase
+from fs.threadpool import ThreadPool
 from fs import iotools
 
 import six
@@ -46,6 +52,224 @@ else:
             self._map[(threading.currentThread(),attr)] = value
 
 
+class _S3RangeReader(RemoteRangeReader):
+    """RemoteRangeReader fetching byte ranges of a key with ranged GETs.
+
+    Ranges larger than the download part size of the S3FS are split into
+    parts, which are fetched in parallel but returned in order.  Every
+    request is made conditional on the key's ETag, so a key that changes
+    during a download gives an error rather than a mix of old and new data.
+    """
+
+    def __init__(self,fs,key):
+        super(_S3RangeReader,self).__init__(key.size or 0)
+        self.fs = fs
+        self._key = key
+        self.max_readahead = fs._download_part_size * fs._download_workers
+
+    def read_range(self,offset,length):
+        #  Boto objects can't be shared between threads, so use a key
+        #  object from the calling thread's own bucket object.
+        key = self.fs._s3bukt.new_key(self._key.name)
+        headers = {"Range":"bytes=%d-%d" % (offset,offset + length - 1)}
+        if self._key.etag:
+            headers["If-Match"] = self._key.etag
+        return key.get_contents_as_string(headers=headers)
+
+    def _read_part(self,part):
+        (offset,length) = part
+        return (offset,self.read_range(offset,length))
+
+    def iter_range(self,offset,length):
+        part_size = self.fs._download_part_size
+        workers = self.fs._download_workers
+        if length <= part_size or workers < 2:
+            yield (offset,self.read_range(offset,length))
+            return
+        end = offset + length
+        parts = ((o,min(part_size,end - o)) for o in xrange(offset,end,part_size))
+        #  Parts that haven't been fetched are cancelled if the
+        #  generator is closed early.
+        pool = self.fs._get_download_pool()
+        for item in pool.imap(self._read_part,parts,max_pending=workers):
+            yield item
+
+
+class _S3DownloadFile(FileLikeBase):
+    """File object streaming the contents of a key in parallel parts.
+
+    This is returned by S3FS.open() in streamed-read mode ("r-") for large
+    keys.  Parts are fetched on a pool of threads and handed out in order,
+    so no more than download_part_size * download_workers bytes are held
+    in memory at once.
+    """
+
+    def __init__(self,reader):
+        super(_S3DownloadFile,self).__init__()
+        self.mode = "r-"
+        self.size = reader.size
+        self._parts = reader.iter_range(0,reader.size)
+
+    def _read(self,sizehint=-1):
+        for (offset,data) in self._parts:
+            if data:
+                return data
+        return None
+
+    def close(self):
+        super(_S3DownloadFile,self).close()
+        self._parts.close()
+
+
+#  S3 rejects multipart uploads with parts smaller than this (except the last)
+MIN_PART_SIZE = 5 * 1024 * 1024
+#  ...or with more parts than this
+MAX_PARTS = 10000
+#  The most keys that can be deleted in a single request
+MAX_DELETE_KEYS = 1000
+#  The largest key that can be copied in a single request
+MAX_COPY_SIZE = 5 * 1024 * 1024 * 1024
+
+
+def _batches(iterable,size):
+    """Split an iterable into lists of up to 'size' items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _read_part(f,size):
+    """Read 'size' bytes from a file, or fewer only if it reaches EOF."""
+    chunks = []
+    while size > 0:
+        data = f.read(size)
+        if not data:
+            break
+        chunks.append(data)
+        size -= len(data)
+    return b"".join(chunks)
+
+
+class _S3MultipartUpload(object):
+    """A multipart upload whose parts are sent on the S3FS's upload threads.
+
+    No more than 'workers' parts are in flight at once; adding another part
+    blocks until the oldest one has been sent.  This bounds memory use to
+    roughly part_size * workers.
+    """
+
+    def __init__(self,fs,s3path,workers):
+        self.fs = fs
+        self._mp = fs._s3bukt.initiate_multipart_upload(s3path)
+        self._workers = workers
+        self._pool = fs._get_upload_pool()
+        self._pending = []
+        self._num_parts = 0
+        self.size = 0
+
+    def _upload_part(self,part_num,data):
+        #  Boto objects can't be shared between threads, so each part
+        #  is sent through the calling thread's own bucket object.
+        mp = MultiPartUpload(self.fs._s3bukt)
+        mp.key_name = self._mp.key_name
+        mp.id = self._mp.id
+        mp.upload_part_from_file(six.BytesIO(data),part_num,size=len(data))
+
+    def add_part(self,data):
+        while len(self._pending) >= self._workers:
+            self._pending.pop(0).get()
+        self._num_parts += 1
+        self.size += len(data)
+        result = self._pool.apply_async(self._upload_part,(self._num_parts,data))
+        self._pending.append(result)
+
+    def complete(self):
+        """Wait for all parts to be sent, and complete the upload."""
+        while self._pending:
+            self._pending.pop(0).get()
+        return self._mp.complete_upload()
+
+    def cancel(self):
+        """Abort the upload, discarding any parts already sent."""
+        for result in self._pending:
+            result.cancel()
+        #  Let any parts already being sent finish before aborting
+        for result in self._pending:
+            result.wait()
+        del self._pending[:]
+        try:
+            self._mp.cancel_upload()
+        except S3ResponseError:
+            pass
+
+
+class _S3UploadFile(FileLikeBase):
+    """File object streaming its contents to S3 in a multipart upload.
+
+    This is returned by S3FS.open() in streamed-write mode ("w-").  Data is
+    sent in parts as soon as a full part has been written, so the file is
+    never held locally in its entirety.  Files smaller than one part are
+    uploaded with a single PUT when they are closed.
+    """
+
+    def __init__(self,fs,s3path):
+        super(_S3UploadFile,self).__init__()
+        self.mode = "w-"
+        self.fs = fs
+        self.s3path = s3path
+        self._buffer = []
+        self._buffered = 0
+        self._upload = None
+
+    def _write(self,data,flushing=False):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        part_size = self.fs._part_size
+        if self._buffered >= part_size:
+            data = b"".join(self._buffer)
+            try:
+                if self._upload is None:
+                    self._upload = _S3MultipartUpload(self.fs,self.s3path,self.fs._upload_workers)
+                while len(data) >= part_size:
+                    self._upload.add_part(data[:part_size])
+                    data = data[part_size:]
+            except Exception:
+                self._abort()
+            self._buffer = [data]
+            self._buffered = len(data)
+
+    def _abort(self):
+        (exc_type,exc_value,tb) = sys.exc_info()
+        if self._upload is not None:
+            self._upload.cancel()
+            self._upload = None
+        self._buffer = []
+        self._buffered = 0
+        self.closed = True
+        raise exc_type,exc_value,tb
+
+    def close(self):
+        if not self.closed:
+            super(_S3UploadFile,self).close()
+            data = b"".join(self._buffer)
+            self._buffer = []
+            try:
+                if self._upload is None:
+                    self.fs._sync_set_contents(self.s3path,data)
+                else:
+                    if data:
+                        self._upload.add_part(data)
+                    completed = self._upload.complete()
+                    self.fs._sync_multipart_key(self.s3path,completed,self._upload.size)
+            except Exception:
+                self._abort()
+
+
 class S3FS(FS):
     """A filesystem stored in Amazon S3.
 
@@ -76,7 +300,7 @@ class S3FS(FS):
         PATH_MAX = None
         NAME_MAX = None
 
-    def __init__(self, bucket, prefix="", aws_access_key=None, aws_secret_key=None, separator="/", thread_synchronize=True, key_sync_timeout=1, **conn_kwargs):
+    def __init__(self, bucket, prefix="", aws_access_key=None, aws_secret_key=None, separator="/", thread_synchronize=True, key_sync_timeout=1, multipart_threshold=16*1024*1024, part_size=8*1024*1024, upload_workers=4, download_part_size=8*1024*1024, download_workers=4, bulk_workers=4, listing_cache_timeout=0, **conn_kwargs):
         """Constructor for S3FS objects.
 
         S3FS objects require the name of the S3 bucket in which to store
@@ -98,7 +322,40 @@ class S3FS(FS):
 
         By default the path separator is "/", but this can be overridden
         by specifying the keyword 'separator' in the constructor.
+
+        Files larger than 'multipart_threshold' bytes are uploaded in a
+        multipart upload, in parts of 'part_size' bytes (at least 5MB), with
+        up to 'upload_workers' parts being sent at once.  Opening a file in
+        streamed-write mode ("w-") uploads its contents in the same way as
+        they are written, rather than spooling them to a local file first.
+
+        Reads of more than 'download_part_size' bytes are split into ranges
+        of that size, with up to 'download_workers' of them being fetched at
+        once.
+
+        Forcibly removing a directory deletes its contents in multi-object
+        delete requests of up to 1000 keys, and copying or moving a directory
+        copies its keys with server-side copy requests (in parts, for keys
+        over the 5GB limit of a single copy).  Up to 'bulk_workers' of these
+        requests are sent at once.
+
+        If 'listing_cache_timeout' is nonzero, directory listings fetched
+        from S3 are kept in memory for that many seconds (or indefinitely if
+        it is None), and used to answer exists(), isdir(), isfile() and the
+        checks made by makedir() without further requests.  Changes made
+        through this S3FS object keep the cached listings up to date, but
+        changes made by other clients won't be seen until they expire; call
+        clear_cache() to discard them sooner.  The default of 0 disables the
+        listing cache.
         """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError("part_size must be at least %d bytes" % (MIN_PART_SIZE,))
+        self._multipart_threshold = max(multipart_threshold,part_size)
+        self._part_size = part_size
+        self._upload_workers = max(1,upload_workers)
+        self._download_part_size = download_part_size
+        self._download_workers = max(1,download_workers)
+        self._bulk_workers = max(1,bulk_workers)
         self._bucket_name = bucket
         if aws_access_key is not None:
             conn_kwargs['aws_access_key_id'] = aws_access_key
@@ -107,6 +364,7 @@ class S3FS(FS):
         self._conn_kwargs = conn_kwargs
         self._separator = separator
         self._key_sync_timeout = key_sync_timeout
+        self._listing_cache_timeout = listing_cache_timeout
         # Normalise prefix to this form: path/to/files/
         prefix = normpath(prefix)
         while prefix.startswith(separator):
@@ -117,6 +375,8 @@ class S3FS(FS):
             prefix = prefix.encode("utf8")
         self._prefix = prefix
         self._tlocal = thread_local()
+        self._init_listings()
+        self._init_pools()
         super(S3FS, self).__init__(thread_synchronize=thread_synchronize)
 
     #  Make _s3conn and _s3bukt properties that are created on demand,
@@ -161,11 +421,51 @@ class S3FS(FS):
     def __getstate__(self):
         state = super(S3FS,self).__getstate__()
         del state['_tlocal']
+        for attr in ("_listings","_listings_lock","_listings_gen","_pools","_pools_lock"):
+            del state[attr]
         return state
 
     def __setstate__(self,state):
         super(S3FS,self).__setstate__(state)
         self._tlocal = thread_local()
+        self._init_listings()
+        self._init_pools()
+
+    def _init_pools(self):
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+
+    def _get_pool(self,name,workers):
+        """Get the named pool of threads used to send requests in parallel.
+
+        Pools are kept until the S3FS is closed, so that the S3 connections
+        belonging to their threads are reused from one request to the next.
+        """
+        with self._pools_lock:
+            pool = self._pools.get(name)
+            if pool is None:
+                pool = self._pools[name] = ThreadPool(workers,name="fs.s3fs."+name)
+            return pool
+
+    def _get_download_pool(self):
+        """Get the pool of threads that fetch parts of keys in parallel."""
+        return self._get_pool("download",self._download_workers)
+
+    def _get_upload_pool(self):
+        """Get the pool of threads that send the parts of multipart uploads."""
+        return self._get_pool("upload",self._upload_workers)
+
+    def _get_bulk_pool(self):
+        """Get the pool of threads that send requests for many keys at once."""
+        return self._get_pool("bulk",self._bulk_workers)
+
+    def close(self):
+        with self._pools_lock:
+            pools = self._pools.values()
+            self._pools.clear()
+        for pool in pools:
+            pool.close(wait=False)
+        super(S3FS,self).close()
 
     def __repr__(self):
         args = (self.__class__.__name__,self._bucket_name,self._prefix)
@@ -194,6 +494,159 @@ class S3FS(FS):
         i = len(roots3path)
         return s3path[i:]
 
+    def _init_listings(self):
+        #  Maps directory prefix => (time listed, {key name: key}), with key
+        #  names as utf8-encoded strings.  The generation is bumped by every
+        #  change, so listings that were in progress during a change aren't
+        #  stored.
+        self._listings = {}
+        self._listings_lock = threading.RLock()
+        self._listings_gen = 0
+
+    def _s3dir(self,s3path):
+        """Get the prefix of the directory containing the given key."""
+        if s3path.endswith(self._separator):
+            s3path = s3path[:-1]
+        return s3path[:s3path.rfind(self._separator) + 1]
+
+    def _get_listing(self,s3dir):
+        """Get the cached listing of a directory, or None if there isn't one.
+
+        The listing is a dict mapping key names to keys, and should only be
+        used while holding the listings lock.
+        """
+        if self._listing_cache_timeout == 0:
+            return None
+        with self._listings_lock:
+            try:
+                (ltime,entries) = self._listings[s3dir]
+            except KeyError:
+                return None
+            timeout = self._listing_cache_timeout
+            if timeout is not None and ltime + timeout < time.time():
+                del self._listings[s3dir]
+                return None
+            return entries
+
+    def _list_dir(self,s3dir):
+        """Iterate over the keys directly within the given directory.
+
+        Cached listings are used where available.  Otherwise the directory
+        is listed with a delimited list request, which is added to the cache
+        once it has been fully consumed.
+        """
+        with self._listings_lock:
+            entries = self._get_listing(s3dir)
+            if entries is not None:
+                return sorted(entries.itervalues(),key=lambda k: k.name)
+        return self._fetch_listing(s3dir)
+
+    def _fetch_listing(self,s3dir):
+        ks = self._s3bukt.list(prefix=s3dir,delimiter=self._separator)
+        if self._listing_cache_timeout == 0:
+            for k in ks:
+                yield k
+            return
+        ltime = time.time()
+        gen = self._listings_gen
+        entries = {}
+        for k in ks:
+            entries[_utf8(k.name)] = k
+            yield k
+        with self._listings_lock:
+            if self._listings_gen == gen:
+                self._listings[s3dir] = (ltime,entries)
+
+    def _parent_listing(self,s3path):
+        """Get the cached listing of the directory containing a key."""
+        return self._get_listing(self._s3dir(s3path))
+
+    def _listing_add(self,k):
+        """Record a key written by this FS in the cached listings."""
+        if self._listing_cache_timeout == 0:
+            return
+        sep = self._separator
+        name = _utf8(k.name)
+        with self._listings_lock:
+            self._listings_gen += 1
+            entries = self._parent_listing(name)
+            if entries is not None:
+                if name.endswith(sep):
+                    #  Listings roll directory keys up into their prefix
+                    entries[name] = Prefix(bucket=k.bucket,name=name)
+                else:
+                    entries[name] = k
+            if name.endswith(sep):
+                entries = self._get_listing(name)
+                if entries is not None:
+                    entries[name] = k
+            #  Every directory above the key now exists as well
+            s3dir = self._s3dir(name)
+            while len(s3dir) > len(self._prefix):
+                parent = self._s3dir(s3dir)
+                entries = self._get_listing(parent)
+                if entries is not None:
+                    if s3dir in entries:
+                        break
+                    entries[s3dir] = Prefix(bucket=k.bucket,name=s3dir)
+                s3dir = parent
+
+    def _listing_remove(self,name,recursive=False):
+        """Record the removal of a key by this FS in the cached listings.
+
+        If 'recursive' is True, the key is a directory prefix and everything
+        beneath it has been removed too.
+        """
+        if self._listing_cache_timeout == 0:
+            return
+        sep = self._separator
+        name = _utf8(name)
+        with self._listings_lock:
+            self._listings_gen += 1
+            if name.endswith(sep):
+                s3dir = name
+            else:
+                s3dir = self._s3dir(name)
+            if recursive:
+                for ldir in list(self._listings):
+                    if ldir.startswith(s3dir):
+                        del self._listings[ldir]
+                entries = {}
+            else:
+                entries = self._get_listing(s3dir)
+                if entries is not None:
+                    entries.pop(name,None)
+            #  A directory disappears along with the last key beneath it,
+            #  which may leave its parent empty in turn.
+            while len(s3dir) > len(self._prefix):
+                parent = self._s3dir(s3dir)
+                if entries is None:
+                    #  We can't tell whether the directory still exists,
+                    #  so forget about all the directories above it.
+                    while len(s3dir) > len(self._prefix):
+                        s3dir = self._s3dir(s3dir)
+                        self._listings.pop(s3dir,None)
+                    break
+                if entries:
+                    break
+                entries = self._get_listing(parent)
+                if entries is not None:
+                    entries.pop(s3dir,None)
+                s3dir = parent
+
+    def clear_cache(self,path=""):
+        """Discard cached directory listings for the given path."""
+        s3path = self._s3path(path)
+        with self._listings_lock:
+            if self._prefix.startswith(s3path):
+                self._listings.clear()
+            else:
+                s3dir = s3path + self._separator
+                for ldir in list(self._listings):
+                    if ldir.startswith(s3dir):
+                        del self._listings[ldir]
+                self._listings.pop(self._s3dir(s3path),None)
+
     def _sync_key(self,k):
         """Synchronise on contents of the given key.
 
@@ -205,7 +658,11 @@ class S3FS(FS):
         Note that this could easily fail if the key is modified by another
         program, meaning the content will never be as specified in the given
         key.  This is the reason for the timeout argument to the construtcor.
+
+        Since every key written by this FS passes through here, it is also
+        where the key is added to the cached directory listings.
         """
+        self._listing_add(k)
         timeout = self._key_sync_timeout
         if timeout is None:
             return k
@@ -220,10 +677,17 @@ class S3FS(FS):
         return k2
 
     def _sync_set_contents(self,key,contents):
-        """Synchronously set the contents of a key."""
+        """Synchronously set the contents of a key.
+
+        Contents larger than the multipart threshold are sent in a multipart
+        upload.  Streams that can't be sized are read one part at a time,
+        and switch to a multipart upload once they exceed a single part.
+        """
         if isinstance(key,basestring):
             key = self._s3bukt.new_key(key)
         if isinstance(contents,basestring):
+            if len(contents) > self._multipart_threshold:
+                return self._multipart_upload(key.name,six.BytesIO(contents),len(contents))
             key.set_contents_from_string(contents)
         elif hasattr(contents,"md5"):
             hexmd5 = contents.md5
@@ -231,19 +695,53 @@ class S3FS(FS):
             key.set_contents_from_file(contents,md5=(hexmd5,b64md5))
         else:
             try:
+                contents.seek(0,2)
+                size = contents.tell()
                 contents.seek(0)
             except (AttributeError,EnvironmentError):
-                tf = tempfile.TemporaryFile()
-                data = contents.read(524288)
-                while data:
-                    tf.write(data)
-                    data = contents.read(524288)
-                tf.seek(0)
-                key.set_contents_from_file(tf)
+                data = _read_part(contents,self._part_size)
+                if len(data) < self._part_size:
+                    key.set_contents_from_string(data)
+                else:
+                    return self._multipart_upload(key.name,contents,first_part=data)
             else:
+                if size > self._multipart_threshold:
+                    return self._multipart_upload(key.name,contents,size)
                 key.set_contents_from_file(contents)
         return self._sync_key(key)
 
+    def _multipart_upload(self,s3path,f,size=None,first_part=None):
+        """Upload the contents of a file to a key in a multipart upload.
+
+        If the upload fails, it is aborted so that no parts are left
+        behind in the bucket.
+        """
+        part_size = self._part_size
+        if size is not None:
+            #  Large files need larger parts to stay within the part limit
+            part_size = max(part_size,-(-size // MAX_PARTS))
+        upload = _S3MultipartUpload(self,s3path,self._upload_workers)
+        try:
+            data = first_part
+            if data is None:
+                data = _read_part(f,part_size)
+            while data:
+                upload.add_part(data)
+                data = _read_part(f,part_size)
+            completed = upload.complete()
+        except Exception:
+            (exc_type,exc_value,tb) = sys.exc_info()
+            upload.cancel()
+            raise exc_type,exc_value,tb
+        return self._sync_multipart_key(s3path,completed,upload.size)
+
+    def _sync_multipart_key(self,s3path,completed,size):
+        """Synchronise on the key written by a completed multipart upload."""
+        key = self._s3bukt.new_key(s3path)
+        key.etag = completed.etag
+        key.size = size
+        return self._sync_key(key)
+
     def makepublic(self, path):
         """Mark given path as publicly accessible using HTTP(S)"""
         s3path = self._s3path(path)
@@ -286,10 +784,19 @@ class S3FS(FS):
         This method downloads the file contents into a local temporary file
         so that it can be worked on efficiently.  Any changes made to the
         file are only sent back to S3 when the file is flushed or closed.
+
+        In streamed-read mode ("r-") the contents are read straight from S3,
+        and in streamed-write mode ("w-") they are uploaded as they are
+        written.
         """
         if self.isdir(path):
             raise ResourceInvalidError(path)
         s3path = self._s3path(path)
+        #  For streaming writes, upload the data as it is written
+        if "w" in mode and "-" in mode:
+            if not self.isdir(dirname(path)):
+                raise ParentDirectoryMissingError(path)
+            return _S3UploadFile(self,s3path)
         # Truncate the file if requested
         if "w" in mode:
             k = self._sync_set_contents(s3path,"")
@@ -302,14 +809,16 @@ class S3FS(FS):
             if not self.isdir(dirname(path)):
                 raise ParentDirectoryMissingError(path)
             k = self._sync_set_contents(s3path,"")
-        #  Make sure nothing tries to read past end of socket data
-        f = LimitBytesFile(k.size,k,"r")
-        #  For streaming reads, return the key object directly
-        if mode == "r-":
-            return f
-        #  For everything else, use a RemoteFileBuffer.
-        #  This will take care of closing the socket when it's done.
-        return RemoteFileBuffer(self,path,mode,f)
+        #  For streaming reads, return the key object directly, or fetch
+        #  several parts at once if it is large.
+        if "r" in mode and "-" in mode:
+            if k.size > self._download_part_size and self._download_workers > 1:
+                return _S3DownloadFile(_S3RangeReader(self,k))
+            #  Make sure nothing tries to read past end of socket data
+            return LimitBytesFile(k.size,k,"r")
+        #  For everything else, use a RemoteFileBuffer.  It will only
+        #  download the byte ranges of the key that are actually used.
+        return RemoteFileBuffer(self,path,mode,_S3RangeReader(self,k))
 
     def exists(self,path):
         """Check whether a path exists."""
@@ -318,6 +827,10 @@ class S3FS(FS):
         # The root directory always exists
         if self._prefix.startswith(s3path):
             return True
+        with self._listings_lock:
+            entries = self._parent_listing(s3path)
+            if entries is not None:
+                return s3path in entries or s3pathD in entries
         ks = self._s3bukt.list(prefix=s3path,delimiter=self._separator)
         for k in ks:
             # A regular file
@@ -334,6 +847,12 @@ class S3FS(FS):
         # Root is always a directory
         if s3path == "/" or s3path == self._prefix:
             return True
+        with self._listings_lock:
+            entries = self._parent_listing(s3path)
+            if entries is not None:
+                return s3path in entries
+            if self._get_listing(s3path):
+                return True
         # Use a list request so that we return true if there are any files
         # in that directory.  This avoids requiring a special file for the
         # the directory itself, which other tools may not create.
@@ -351,6 +870,10 @@ class S3FS(FS):
         # Root is never a file
         if self._prefix.startswith(s3path):
             return False
+        with self._listings_lock:
+            entries = self._parent_listing(s3path)
+            if entries is not None:
+                return s3path in entries
         k = self._s3bukt.get_key(s3path)
         if k is not None:
             return True
@@ -382,6 +905,12 @@ class S3FS(FS):
                                          dirs_only,files_only)
         return ((nm,self._get_key_info(k,nm)) for (nm,k) in entries)
 
+    def scandir(self,path="./"):
+        path = normpath(path)
+        return (ScandirEntry(self,path,nm,self._key_is_dir(k),
+                             info=self._get_key_info(k,nm))
+                for (nm,k) in self._iter_keys(path))
+
     def _iter_keys(self,path):
         """Iterator over keys contained in the given directory.
 
@@ -393,7 +922,7 @@ class S3FS(FS):
         if s3path == "/":
             s3path = ""
         isDir = False
-        for k in self._s3bukt.list(prefix=s3path,delimiter=self._separator):
+        for k in self._list_dir(s3path):
             if not isDir:
                 isDir = True
             # Skip over the entry for the directory itself, if it exists
@@ -461,7 +990,7 @@ class S3FS(FS):
         if s3pathP:
             s3pathP = s3pathP + self._separator
         # Check various preconditions using list of parent dir
-        ks = self._s3bukt.list(prefix=s3pathP,delimiter=self._separator)
+        ks = self._list_dir(s3pathP)
         if s3pathP == self._prefix:
             parentExists = True
         else:
@@ -494,7 +1023,12 @@ class S3FS(FS):
     def remove(self,path):
         """Remove the file at the given path."""
         s3path = self._s3path(path)
-        ks = self._s3bukt.list(prefix=s3path,delimiter=self._separator)
+        with self._listings_lock:
+            ks = self._parent_listing(s3path)
+            if ks is not None:
+                ks = [ks[nm] for nm in (s3path,s3path + "/") if nm in ks]
+        if ks is None:
+            ks = self._s3bukt.list(prefix=s3path,delimiter=self._separator)
         for k in ks:
             if _eq_utf8(k.name,s3path):
                 break
@@ -504,6 +1038,7 @@ class S3FS(FS):
         else:
             raise ResourceNotFoundError(path)
         self._s3bukt.delete_key(s3path)
+        self._listing_remove(s3path)
         k = self._s3bukt.get_key(s3path)
         while k:
             k = self._s3bukt.get_key(s3path)
@@ -517,25 +1052,27 @@ class S3FS(FS):
             s3path = s3path + self._separator
         if force:
             #  If we will be forcibly removing any directory contents, we
-            #  might as well get the un-delimited list straight away.
+            #  might as well get the un-delimited list straight away, and
+            #  delete the keys (including the directory's own) as they
+            #  are listed.
             ks = self._s3bukt.list(prefix=s3path)
+            found = self._delete_keys(path,(k.name for k in ks)) > 0
         else:
-            ks = self._s3bukt.list(prefix=s3path,delimiter=self._separator)
-        # Fail if the directory is not empty, or remove them if forced
-        found = False
-        for k in ks:
-            found = True
-            if not _eq_utf8(k.name,s3path):
-                if not force:
+            # Fail if the directory is not empty
+            found = False
+            for k in self._list_dir(s3path):
+                found = True
+                if not _eq_utf8(k.name,s3path):
                     raise DirectoryNotEmptyError(path)
-                self._s3bukt.delete_key(k.name)
         if not found:
             if self.isfile(path):
                 msg = "removedir() called on a regular file: %(path)s"
                 raise ResourceInvalidError(path,msg=msg)
             if path not in ("","/"):
                 raise ResourceNotFoundError(path)
-        self._s3bukt.delete_key(s3path)
+        if not force:
+            self._s3bukt.delete_key(s3path)
+        self._listing_remove(s3path,recursive=force)
         if recursive and path not in ("","/"):
             pdir = dirname(path)
             try:
@@ -543,6 +1080,33 @@ class S3FS(FS):
             except DirectoryNotEmptyError:
                 pass
 
+    def _delete_keys(self,path,names):
+        """Delete the named keys in multi-object delete requests.
+
+        Names are sent in batches as they are read from the iterable, with
+        up to 'bulk_workers' requests in flight at once.  Returns the number
+        of keys deleted; if any can't be deleted, OperationFailedError is
+        raised naming the given path.
+        """
+        batches = _batches(names,MAX_DELETE_KEYS)
+        workers = self._bulk_workers
+        results = self._get_bulk_pool().imap_unordered(self._delete_batch,batches,max_pending=workers)
+        count = 0
+        try:
+            for (num,errors) in results:
+                if errors:
+                    msg = "Unable to delete %s: %s" % (errors[0].key,errors[0].message)
+                    raise OperationFailedError("delete",path,msg=msg.replace("%","%%"))
+                count += num
+        finally:
+            #  Batches that haven't been sent yet are cancelled
+            results.close()
+        return count
+
+    def _delete_batch(self,names):
+        result = self._s3bukt.delete_keys(names,quiet=True)
+        return (len(names),result.errors)
+
     def rename(self,src,dst):
         """Rename the file at 'src' to 'dst'."""
         # Actually, in S3 'rename' is exactly the same as 'move'
@@ -556,6 +1120,13 @@ class S3FS(FS):
         if path in ("","/"):
             k = Prefix(bucket=self._s3bukt,name="/")
         else:
+            with self._listings_lock:
+                entries = self._parent_listing(s3path)
+                if entries is not None and s3path not in entries:
+                    k = entries.get(s3path + self._separator)
+                    if k is None:
+                        raise ResourceNotFoundError(path)
+                    return self._get_key_info(k,path)
             k = self._s3bukt.get_key(s3path)
             if k is None:
                 ks = self._s3bukt.list(prefix=s3path,delimiter=self._separator)
@@ -576,23 +1147,37 @@ class S3FS(FS):
             info["st_mode"] = 0700 | statinfo.S_IFDIR
         else:
             info["st_mode"] =  0700 | statinfo.S_IFREG
-        if hasattr(key,"size"):
+        if getattr(key,"size",None) is not None:
             info['size'] = int(key.size)
         etag = getattr(key,"etag",None)
         if etag is not None:
             if isinstance(etag,unicode):
                etag = etag.encode("utf8")
             info['etag'] = etag.strip('"').strip("'")
-        if hasattr(key,"last_modified"):
-            # TODO: does S3 use any other formats?
-            fmt = "%a, %d %b %Y %H:%M:%S %Z"
-            try:
-                mtime = datetime.datetime.strptime(key.last_modified,fmt)
+        if getattr(key,"last_modified",None) is not None:
+            mtime = self._parse_last_modified(key.last_modified)
+            if mtime is not None:
                 info['modified_time'] = mtime
-            except ValueError:
-                pass
         return info
 
+    #  Keys from a GET or HEAD have an RFC 1123 date, keys from a bucket
+    #  listing have an ISO 8601 one.  Both are in UTC.
+    _last_modified_formats = ("%a, %d %b %Y %H:%M:%S %Z",
+                              "%Y-%m-%dT%H:%M:%S.%fZ",
+                              "%Y-%m-%dT%H:%M:%SZ")
+
+    def _parse_last_modified(self,last_modified):
+        """Parse a last_modified timestamp into a local time datetime."""
+        for fmt in self._last_modified_formats:
+            try:
+                mtime = datetime.datetime.strptime(last_modified,fmt)
+            except ValueError:
+                continue
+            #  Other filesystems give naive datetimes in local time
+            timestamp = calendar.timegm(mtime.timetuple())
+            return datetime.datetime.fromtimestamp(timestamp).replace(microsecond=mtime.microsecond)
+        return None
+
     def desc(self,path):
         return "No description available"
 
@@ -648,6 +1233,116 @@ class S3FS(FS):
         """Move a file from one location to another."""
         self.copy(src,dst,overwrite=overwrite)
         self._s3bukt.delete_key(self._s3path(src))
+        self._listing_remove(self._s3path(src))
+
+    def copydir(self,src,dst,overwrite=False,ignore_errors=False,chunk_size=16384):
+        """Copy a directory from 'src' to 'dst'.
+
+        The keys beneath 'src' are copied with server-side copy requests,
+        several at once.
+        """
+        if not self.isdir(src):
+            raise ResourceInvalidError(src,msg="Source is not a directory: %(path)s")
+        if not overwrite and self.exists(dst):
+            raise DestinationExistsError(dst)
+        self.makedir(dst,allow_recreate=True)
+        for name in self._copy_keys(src,dst,ignore_errors):
+            pass
+
+    def movedir(self,src,dst,overwrite=False,ignore_errors=False,chunk_size=16384):
+        """Move a directory from 'src' to 'dst'.
+
+        The keys beneath 'src' are copied with server-side copy requests,
+        several at once, and deleted in batches as they are copied.
+        """
+        if not self.isdir(src):
+            if self.isfile(src):
+                raise ResourceInvalidError(src,msg="Source is not a directory: %(path)s")
+            raise ResourceNotFoundError(src)
+        if not overwrite and self.exists(dst):
+            raise DestinationExistsError(dst)
+        self.makedir(dst,allow_recreate=overwrite)
+        self._delete_keys(src,self._copy_keys(src,dst,ignore_errors))
+        if ignore_errors:
+            #  Some keys may have been left behind, so the listings can't
+            #  be updated with any certainty.
+            self.clear_cache()
+        else:
+            self._listing_remove(self._s3path(src) + self._separator,recursive=True)
+
+    def _copy_keys(self,src,dst,ignore_errors=False):
+        """Copy all the keys beneath one directory to another.
+
+        The source directory is listed once, and its keys are copied as
+        they are listed, with up to 'bulk_workers' requests in flight at
+        once.  This generator yields the name of each source key once it
+        has been dealt with, including the directory's own key (which isn't
+        copied, since the destination directory must already exist).  If
+        'ignore_errors' is True, keys that can't be copied are skipped.
+        """
+        sep = self._separator
+        s3src = self._s3path(src) + sep
+        if s3src == sep:
+            s3src = ""
+        s3dst = self._s3path(dst) + sep
+        if s3dst == sep:
+            s3dst = ""
+
+        def copy_key(k):
+            name = _utf8(k.name)
+            if name == s3src:
+                return name
+            dst_name = s3dst + name[len(s3src):]
+            try:
+                etag = self._copy_key(dst_name,name,k.size)
+            except S3ResponseError:
+                if not ignore_errors:
+                    raise
+                return None
+            #  The copy has the same contents as the source key
+            dst_key = self._s3bukt.new_key(dst_name)
+            dst_key.size = k.size
+            dst_key.etag = etag
+            self._listing_add(dst_key)
+            return name
+
+        keys = self._s3bukt.list(prefix=s3src)
+        if s3dst.startswith(s3src):
+            #  Don't copy the copies when copying into a subdirectory
+            keys = (k for k in keys if not _startswith_utf8(k.name,s3dst))
+        workers = self._bulk_workers
+        results = self._get_bulk_pool().imap_unordered(copy_key,keys,max_pending=workers)
+        try:
+            for name in results:
+                if name is not None:
+                    yield name
+        finally:
+            results.close()
+
+    def _copy_key(self,dst_name,src_name,size):
+        """Copy a key with server-side copy requests, returning its new etag.
+
+        Keys larger than MAX_COPY_SIZE can't be copied in a single request,
+        so they are copied in parts of up to that size in a multipart upload.
+        """
+        bucket = self._s3bukt
+        if size is None or size <= MAX_COPY_SIZE:
+            return bucket.copy_key(dst_name,self._bucket_name,src_name).etag
+        num_parts = -(-size // MAX_COPY_SIZE)
+        part_size = max(MIN_PART_SIZE,-(-size // num_parts))
+        mp = bucket.initiate_multipart_upload(dst_name)
+        try:
+            for (i,start) in enumerate(xrange(0,size,part_size)):
+                end = min(start + part_size,size) - 1
+                mp.copy_part_from_key(self._bucket_name,src_name,i + 1,start,end)
+            return mp.complete_upload().etag
+        except Exception:
+            (exc_type,exc_value,tb) = sys.exc_info()
+            try:
+                mp.cancel_upload()
+            except S3ResponseError:
+                pass
+            raise exc_type,exc_value,tb
 
     def walkfiles(self,
               path="/",
@@ -685,8 +1380,8 @@ class S3FS(FS):
               ignore_errors=False ):
         if search != "breadth" or dir_wildcard is not None:
             args = (wildcard,dir_wildcard,search,ignore_errors)
-            for item in super(S3FS,self).walkfiles(path,*args):
-                yield (item,self.getinfo(item))
+            for item in super(S3FS,self).walkinfo(path,*args):
+                yield item
         else:
             prefix = self._s3path(path)
             for k in self._s3bukt.list(prefix=prefix):
@@ -712,8 +1407,8 @@ class S3FS(FS):
               ignore_errors=False ):
         if search != "breadth" or dir_wildcard is not None:
             args = (wildcard,dir_wildcard,search,ignore_errors)
-            for item in super(S3FS,self).walkfiles(path,*args):
-                yield (item,self.getinfo(item))
+            for item in super(S3FS,self).walkfilesinfo(path,*args):
+                yield item
         else:
             prefix = self._s3path(path)
             for k in self._s3bukt.list(prefix=prefix):
@@ -733,6 +1428,11 @@ class S3FS(FS):
 
 
 
+def _utf8(name):
+    if isinstance(name,unicode):
+        name = name.encode("utf8")
+    return name
+
 def _eq_utf8(name1,name2):
     if isinstance(name1,unicode):
         name1 = name1.encode("utf8")
@@ -8,6 +8,8 @@ Filesystem accessing an SFTP server (via paramiko)
 
 """
 
+from __future__ import with_statement
+
 import datetime
 import stat as statinfo
 import threading
@@ -15,6 +17,9 @@ import os
 import paramiko
 from getpass import getuser
 import errno
+from fs.local_functools import wraps
+
+import six
 
 from fs.base import *
 from fs.path import *
@@ -51,6 +56,87 @@ else:
             self._map[(threading.currentThread().ident, attr)] = value
 
 
+class SFTPClientPool(object):
+    """A pool of SFTP clients, each using its own channel.
+
+    New clients are opened on the given transports in turn, so that their
+    channels are spread evenly across them.  Clients that are released are
+    kept for reuse, up to 'max_idle' of them (or any number if None); any
+    more are closed.  If a single client is given instead of transports,
+    it is shared by everyone.
+    """
+
+    def __init__(self, transports=(), max_idle=None, client=None):
+        self.transports = list(transports)
+        self.max_idle = max_idle
+        self.shared_client = client
+        self._lock = threading.Lock()
+        self._idle = []
+        self._num_opened = 0
+
+    def acquire(self):
+        """Get a client for the exclusive use of the caller."""
+        if self.shared_client is not None:
+            return self.shared_client
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            transport = self.transports[self._num_opened % len(self.transports)]
+            self._num_opened += 1
+        return paramiko.SFTPClient.from_transport(transport)
+
+    def release(self, client):
+        """Return a client to the pool once the caller is done with it."""
+        if client is self.shared_client:
+            return
+        with self._lock:
+            if self.max_idle is None or len(self._idle) < self.max_idle:
+                self._idle.append(client)
+                return
+        client.close()
+
+    def close(self):
+        """Close all the idle clients."""
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for client in idle:
+            try:
+                client.close()
+            except (EnvironmentError, paramiko.SSHException):
+                pass
+
+
+def _leases_client(func):
+    """Decorator making an SFTPFS method use a single client throughout.
+
+    A client is taken from the pool when the outermost such method is
+    called, and returned when it finishes.  Threads that have used the
+    'client' property directly keep their own client instead.
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwds):
+        tlocal = self._tlocal
+        if tlocal is None:
+            return func(self, *args, **kwds)
+        depth = getattr(tlocal, "depth", 0)
+        if depth == 0 and getattr(tlocal, "client", None) is None and not self.closed:
+            tlocal.client = self._pool.acquire()
+            tlocal.leased = True
+        tlocal.depth = depth + 1
+        try:
+            return func(self, *args, **kwds)
+        finally:
+            tlocal.depth = depth
+            if depth == 0 and getattr(tlocal, "leased", False):
+                tlocal.leased = False
+                client = tlocal.client
+                tlocal.client = None
+                if client is not None:
+                    self._pool.release(client)
+    return wrapper
+
+
 if not hasattr(paramiko.SFTPFile, "__enter__"):
     paramiko.SFTPFile.__enter__ = lambda self: self
     paramiko.SFTPFile.__exit__ = lambda self,et,ev,tb: self.close() and False
@@ -87,7 +173,10 @@ class SFTPFS(FS):
                  pkey=None,
                  agent_auth=True,
                  no_auth=False,
-                 look_for_keys=True):
+                 look_for_keys=True,
+                 transports=1,
+                 pool_size=None,
+                 thread_synchronize=True):
         """SFTPFS constructor.
 
         The only required argument is 'connection', which must be something
@@ -113,6 +202,16 @@ class SFTPFS(FS):
         :param no_auth: attempt to log in without any kind of authorization
         :param look_for_keys: Look for keys in the same locations as ssh,
             if other authentication is not succesful
+        :param transports: Number of SSH connections to open to the server,
+            when given a hostname; SFTP channels are spread across them
+        :param pool_size: Maximum number of idle SFTP channels to keep open
+            for reuse, or None for no limit
+        :param thread_synchronize: If False, operations are not serialized
+            with a lock, so several threads can use the server at once
+
+        Every operation uses an SFTP channel of its own from a pool, as does
+        every open file until it is closed.  To have threads actually run
+        operations in parallel, pass thread_synchronize=False.
 
         """
         credentials = dict(username=username,
@@ -128,7 +227,10 @@ class SFTPFS(FS):
         self._credentials = credentials
         self._tlocal = thread_local()
         self._transport = None
+        self._transports = []
         self._client = None
+        self._pool_size = pool_size
+        self._pool = None
 
         self.hostname = None
         if isinstance(connection, basestring):
@@ -136,18 +238,33 @@ class SFTPFS(FS):
         elif isinstance(connection, tuple):
             self.hostname = '%s:%s' % connection
 
-        super(SFTPFS, self).__init__()
+        super(SFTPFS, self).__init__(thread_synchronize=thread_synchronize)
         self.root_path = abspath(normpath(root_path))
 
         if isinstance(connection,paramiko.Channel):
             self._transport = None
             self._client = paramiko.SFTPClient(connection)
-        else:
-            if not isinstance(connection,paramiko.Transport):
-                connection = paramiko.Transport(connection)
-                connection.daemon = True
-                self._owns_transport = True
-
+            self._pool = SFTPClientPool(client=self._client)
+            return
+
+        address = connection
+        if not isinstance(connection,paramiko.Transport):
+            connection = paramiko.Transport(connection)
+            connection.daemon = True
+            self._owns_transport = True
+        self._connect(connection, hostkey, username, password, pkey,
+                      agent_auth, no_auth, look_for_keys)
+        if self._owns_transport:
+            for i in xrange(transports - 1):
+                extra = paramiko.Transport(address)
+                extra.daemon = True
+                self._connect(extra, hostkey, username, password, pkey,
+                              agent_auth, no_auth, look_for_keys)
+        self._pool = SFTPClientPool(self._transports, pool_size)
+
+    def _connect(self, connection, hostkey, username, password, pkey,
+                 agent_auth, no_auth, look_for_keys):
+        """Start and authenticate an SSH transport."""
         if hostkey is not None:
             key = self.get_remote_server_key()
             if hostkey != key:
@@ -196,7 +313,9 @@ class SFTPFS(FS):
                 self.close()
                 raise RemoteConnectionError(msg='SSH exception (%s)' % str(e), details=e)
 
-        self._transport = connection
+        if self._transport is None:
+            self._transport = connection
+        self._transports.append(connection)
 
     def __unicode__(self):
         return u'<SFTPFS: %s>' % self.desc('/')
@@ -260,8 +379,10 @@ class SFTPFS(FS):
     def __getstate__(self):
         state = super(SFTPFS,self).__getstate__()
         del state["_tlocal"]
+        del state["_pool"]
         if self._owns_transport:
             state['_transport'] = self._transport.getpeername()
+            state['_transports'] = len(self._transports)
         return state
 
     def __setstate__(self,state):
@@ -271,39 +392,55 @@ class SFTPFS(FS):
         #self._lock = threading.RLock()
         self._tlocal = thread_local()
         if self._owns_transport:
-            self._transport = paramiko.Transport(self._transport)
-            self._transport.connect(**self._credentials)
+            address = self._transport
+            self._transports = []
+            for i in xrange(state['_transports']):
+                transport = paramiko.Transport(address)
+                transport.connect(**self._credentials)
+                self._transports.append(transport)
+            self._transport = self._transports[0]
+        self._pool = SFTPClientPool(self._transports, self._pool_size, self._client)
 
     @property
-    @synchronize
     def client(self):
+        """The SFTP client used by the current thread.
+
+        Within an operation this is the client leased for it.  Otherwise,
+        the thread is given a client of its own, which it keeps.
+        """
         if self.closed:
             return None
         client = getattr(self._tlocal, 'client', None)
         if client is None:
-            if self._transport is None:
-                return self._client
-            client = paramiko.SFTPClient.from_transport(self._transport)
+            client = self._pool.acquire()
             self._tlocal.client = client
         return client
-#        try:
-#            return self._tlocal.client
-#        except AttributeError:
-#            #if self._transport is None:
-#            #    return self._client
-#            client = paramiko.SFTPClient.from_transport(self._transport)
-#            self._tlocal.client = client
-#            return client
+
+    def _detach_client(self):
+        """Take the current thread's client for use by an open file.
+
+        This ends the lease of the calling operation's client, if it is the
+        outermost one; otherwise a new client is taken from the pool.  The
+        client should be given back with self._pool.release().
+        """
+        tlocal = self._tlocal
+        if getattr(tlocal, "leased", False) and tlocal.depth == 1:
+            client = tlocal.client
+            tlocal.client = None
+            tlocal.leased = False
+            return client
+        return self._pool.acquire()
 
     @synchronize
     def close(self):
         """Close the connection to the remote server."""
         if not self.closed:
             self._tlocal = None
-            #if self.client:
-            #    self.client.close()
-            if self._owns_transport and self._transport and self._transport.is_active:
-                self._transport.close()
+            if self._pool is not None:
+                self._pool.close()
+            if self._owns_transport:
+                for transport in self._transports:
+                    transport.close()
             self.closed = True
 
     def _normpath(self, path):
@@ -330,16 +467,45 @@ class SFTPFS(FS):
         return url
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     @iotools.filelike_to_stream
-    def open(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None, line_buffering=False, bufsize=-1, **kwargs):
+    def open(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None, line_buffering=False, bufsize=-1, pipelined=False, **kwargs):
+        """Open a file on the server.
+
+        If 'pipelined' is True, a file opened only for reading prefetches
+        its whole contents with many requests in flight, and other files
+        send writes without waiting for each one to be acknowledged (any
+        error is then raised by a later write, or by close()).  This is
+        much faster for sequential transfers over high-latency links.
+        """
         npath = self._normpath(path)
         if self.isdir(path):
             msg = "that's a directory: %(path)s"
             raise ResourceInvalidError(path, msg=msg)
         #  paramiko implements its own buffering and write-back logic,
-        #  so we don't need to use a RemoteFileBuffer here.
-        f = self.client.open(npath, mode, bufsize)
+        #  so we don't need to use a RemoteFileBuffer here.  The file gets
+        #  a client of its own, returned to the pool when it is closed.
+        client = self._detach_client()
+        try:
+            f = client.open(npath, mode, bufsize)
+        except Exception:
+            self._pool.release(client)
+            raise
+        if pipelined:
+            if 'r' in mode and '+' not in mode:
+                f.prefetch()
+            else:
+                f.set_pipelined(True)
+        old_close = f.close
+
+        def new_close():
+            if not f._closed:
+                try:
+                    old_close()
+                finally:
+                    self._pool.release(client)
+        f.close = new_close
         #  Unfortunately it has a broken truncate() method.
         #  TODO: implement this as a wrapper
         old_truncate = f.truncate
@@ -351,7 +517,40 @@ class SFTPFS(FS):
         f.truncate = new_truncate
         return f
 
+    def getcontents(self, path, mode='rb', encoding=None, errors=None, newline=None):
+        if 'r' not in mode:
+            raise ValueError("mode must contain 'r' to be readable")
+        f = self.open(path, mode=mode, encoding=encoding, errors=errors, newline=newline, pipelined=True)
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def setcontents(self, path, data=b'', encoding=None, errors=None, chunk_size=1024*64):
+        if hasattr(data, 'read'):
+            read = data.read
+            chunk = read(chunk_size)
+        else:
+            read = None
+            chunk = data
+        if isinstance(chunk, six.text_type):
+            f = self.open(path, 'wt', encoding=encoding, errors=errors, pipelined=True)
+        else:
+            f = self.open(path, 'wb', pipelined=True)
+        bytes_written = 0
+        try:
+            while chunk:
+                f.write(chunk)
+                bytes_written += len(chunk)
+                if read is None:
+                    break
+                chunk = read(chunk_size)
+        finally:
+            f.close()
+        return bytes_written
+
     @synchronize
+    @_leases_client
     def desc(self, path):
         npath = self._normpath(path)
         if self.hostname:
@@ -361,6 +560,7 @@ class SFTPFS(FS):
             return u'sftp://%s:%i%s' % (addr, port, self.client.normalize(npath))
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def exists(self, path):
         if path in ('', '/'):
@@ -375,6 +575,7 @@ class SFTPFS(FS):
         return True
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def isdir(self,path):
         if normpath(path) in ('', '/'):
@@ -389,6 +590,7 @@ class SFTPFS(FS):
         return statinfo.S_ISDIR(stat.st_mode) != 0
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def isfile(self,path):
         npath = self._normpath(path)
@@ -400,18 +602,17 @@ class SFTPFS(FS):
             raise
         return statinfo.S_ISREG(stat.st_mode) != 0
 
-    @synchronize
     @convert_os_errors
-    def listdir(self,path="./",wildcard=None,full=False,absolute=False,dirs_only=False,files_only=False):
+    def _listdir_stats(self, client, path):
+        """List a directory with a single listdir_attr request.
+
+        Returns a list of (name, stats) pairs, where 'stats' is a dict of
+        the entry's st_* attributes.  Symlinks are described by the stats
+        of their target, which costs one extra request per link.
+        """
         npath = self._normpath(path)
         try:
-            attrs_map = None
-            if dirs_only or files_only:
-                attrs = self.client.listdir_attr(npath)
-                attrs_map = dict((a.filename, a) for a in attrs)
-                paths = list(attrs_map.iterkeys())
-            else:
-                paths = self.client.listdir(npath)
+            attrs = client.listdir_attr(npath)
         except IOError, e:
             if getattr(e,"errno",None) == ENOENT:
                 if self.isfile(path):
@@ -421,71 +622,88 @@ class SFTPFS(FS):
                 raise ResourceInvalidError(path,msg="Can't list directory contents of a file: %(path)s")
             raise
 
-        if attrs_map:
-            if dirs_only:
-                filter_paths = []
-                for apath, attr in attrs_map.iteritems():
-                    if isdir(self, path, attr.__dict__):
-                        filter_paths.append(apath)
-                paths = filter_paths
-            elif files_only:
-                filter_paths = []
-                for apath, attr in attrs_map.iteritems():
-                    if isfile(self, apath, attr.__dict__):
-                        filter_paths.append(apath)
-                paths = filter_paths
-
-        for (i,p) in enumerate(paths):
-            if not isinstance(p,unicode):
-                paths[i] = p.decode(self.encoding)
-
-        return self._listdir_helper(path, paths, wildcard, full, absolute, False, False)
+        entries = []
+        for attr in attrs:
+            name = attr.filename
+            if not isinstance(name, unicode):
+                name = name.decode(self.encoding)
+            if attr.st_mode and statinfo.S_ISLNK(attr.st_mode):
+                try:
+                    attr = client.stat(pathjoin(npath, name))
+                except IOError:
+                    #  A dangling link; describe the link itself
+                    pass
+            entries.append((name, attr.__dict__))
+        return entries
+
+    def _stats_entry(self, dir_path, name, stats):
+        """Make a ScandirEntry from an entry listed by _listdir_stats."""
+        entry_path = pathcombine(dir_path, name)
+        return ScandirEntry(self, dir_path, name,
+                            isdir(self, entry_path, stats),
+                            isfile(self, entry_path, stats),
+                            info=self._extract_info(stats))
 
     @synchronize
+    @_leases_client
     @convert_os_errors
-    def listdirinfo(self,path="./",wildcard=None,full=False,absolute=False,dirs_only=False,files_only=False):
-        npath = self._normpath(path)
-        try:
-            attrs = self.client.listdir_attr(npath)
-            attrs_map = dict((a.filename, a) for a in attrs)
-            paths = attrs_map.keys()
-        except IOError, e:
-            if getattr(e,"errno",None) == ENOENT:
-                if self.isfile(path):
+    def listdir(self,path="./",wildcard=None,full=False,absolute=False,dirs_only=False,files_only=False):
+        if not (dirs_only or files_only):
+            npath = self._normpath(path)
+            try:
+                paths = self.client.listdir(npath)
+            except IOError, e:
+                if getattr(e,"errno",None) == ENOENT:
+                    if self.isfile(path):
+                        raise ResourceInvalidError(path,msg="Can't list directory contents of a file: %(path)s")
+                    raise ResourceNotFoundError(path)
+                elif self.isfile(path):
                     raise ResourceInvalidError(path,msg="Can't list directory contents of a file: %(path)s")
-                raise ResourceNotFoundError(path)
-            elif self.isfile(path):
-                raise ResourceInvalidError(path,msg="Can't list directory contents of a file: %(path)s")
-            raise
+                raise
+            for (i,p) in enumerate(paths):
+                if not isinstance(p,unicode):
+                    paths[i] = p.decode(self.encoding)
+            return self._listdir_helper(path, paths, wildcard, full, absolute, False, False)
 
+        return [p for (p, info) in self.listdirinfo(path, wildcard, full, absolute,
+                                                    dirs_only, files_only)]
+
+    @synchronize
+    @_leases_client
+    @convert_os_errors
+    def listdirinfo(self,path="./",wildcard=None,full=False,absolute=False,dirs_only=False,files_only=False):
+        path = normpath(path)
+        entries = self._scandir_entries(path)
         if dirs_only:
-            filter_paths = []
-            for path, attr in attrs_map.iteritems():
-                if isdir(self, path, attr.__dict__):
-                    filter_paths.append(path)
-            paths = filter_paths
+            entries = [e for e in entries if e.is_dir()]
         elif files_only:
-            filter_paths = []
-            for path, attr in attrs_map.iteritems():
-                if isfile(self, path, attr.__dict__):
-                    filter_paths.append(path)
-            paths = filter_paths
-
-        for (i, p) in enumerate(paths):
-            if not isinstance(p, unicode):
-                paths[i] = p.decode(self.encoding)
-
-        def getinfo(p):
-            resourcename = basename(p)
-            info = attrs_map.get(resourcename)
-            if info is None:
-                return self.getinfo(pathjoin(path, p))
-            return self._extract_info(info.__dict__)
-
-        return [(p, getinfo(p)) for p in
-                    self._listdir_helper(path, paths, wildcard, full, absolute, False, False)]
+            entries = [e for e in entries if e.is_file()]
+
+        infos = dict((e.name, e.getinfo()) for e in entries)
+        paths = self._listdir_helper(path, list(infos), wildcard, full, absolute, False, False)
+        return [(p, infos[basename(p)]) for p in paths]
+
+    @_leases_client
+    def _scandir_entries(self, path):
+        """List a directory as a list of ScandirEntry objects."""
+        return [self._stats_entry(path, name, stats)
+                for (name, stats) in self._listdir_stats(self.client, path)]
+
+    @synchronize
+    def scandir(self,path="./"):
+        return iter(self._scandir_entries(normpath(path)))
+
+    def _walk_entries(self, path, dir_wildcard, search, ignore_errors):
+        #  Each directory is listed with a single listdir_attr request, on a
+        #  client leased for that listing only, so that an abandoned walk
+        #  doesn't keep a client from the pool.  The walk doesn't take the
+        #  FS lock.
+        return super(SFTPFS, self)._walk_entries(path, dir_wildcard, search,
+                                                 ignore_errors,
+                                                 scandir=self._scandir_entries)
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def makedir(self,path,recursive=False,allow_recreate=False):
         npath = self._normpath(path)
@@ -514,6 +732,7 @@ class SFTPFS(FS):
                     raise ResourceInvalidError(path,msg="Can't create directory, there's already a file of that name: %(path)s")
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def remove(self,path):
         npath = self._normpath(path)
@@ -527,6 +746,7 @@ class SFTPFS(FS):
             raise
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def removedir(self,path,recursive=False,force=False):
         npath = self._normpath(path)
@@ -559,6 +779,7 @@ class SFTPFS(FS):
                 pass
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def rename(self,src,dst):
         nsrc = self._normpath(src)
@@ -573,6 +794,7 @@ class SFTPFS(FS):
             raise
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def move(self,src,dst,overwrite=False,chunk_size=16384):
         nsrc = self._normpath(src)
@@ -591,6 +813,7 @@ class SFTPFS(FS):
             raise
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def movedir(self,src,dst,overwrite=False,ignore_errors=False,chunk_size=16384):
         nsrc = self._normpath(src)
@@ -626,6 +849,7 @@ class SFTPFS(FS):
         return info
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def getinfo(self, path):
         npath = self._normpath(path)
@@ -644,6 +868,7 @@ class SFTPFS(FS):
         return info
 
     @synchronize
+    @_leases_client
     @convert_os_errors
     def getsize(self, path):
         npath = self._normpath(path)
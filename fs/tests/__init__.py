@@ -338,6 +338,26 @@ class FSTestCases(object):
         self.assertRaises(ResourceNotFoundError, self.fs.listdirinfo, "zebra")
         self.assertRaises(ResourceInvalidError, self.fs.listdirinfo, "foo")
 
+    def test_scandir(self):
+        self.fs.setcontents("a", b('hello'))
+        self.fs.setcontents("bar", b(''))
+        self.fs.makedir("p/1", recursive=True)
+        self.fs.setcontents("p/1/foo", b('foo'))
+        entries = dict((e.name, e) for e in self.fs.scandir())
+        self.assertEqual(sorted(entries), [u"a", u"bar", u"p"])
+        for name, entry in entries.iteritems():
+            self.assertTrue(isinstance(entry.name, unicode))
+            self.assertEqual(entry.is_dir(), name == "p")
+            self.assertEqual(entry.is_file(), name != "p")
+        self.assertEqual(entries["a"].getinfo().get("size"), 5)
+        entries = list(self.fs.scandir("p/1"))
+        self.assertEqual([e.name for e in entries], [u"foo"])
+        self.assertEqual(entries[0].path, u"p/1/foo")
+        self.assertTrue(entries[0].is_file())
+        self.assertEqual(entries[0].getinfo().get("size"), 3)
+        self.assertRaises(ResourceNotFoundError, lambda: list(self.fs.scandir("zebra")))
+        self.assertRaises(ResourceInvalidError, lambda: list(self.fs.scandir("a")))
+
     def test_walk(self):
         self.fs.setcontents('a.txt', b('hello'))
         self.fs.setcontents('b.txt', b('world'))
@@ -404,6 +424,22 @@ class FSTestCases(object):
         self.assertEquals(sorted(self.fs.walkdirs(
             wildcard="*foo*")), ["/", "/foo", "/foo/baz"])
 
+    def test_walkinfo(self):
+        self.fs.makeopendir('bar').setcontents('a.txt', b('123'))
+        self.fs.makeopendir('foo').makeopendir(
+            "baz").setcontents('b', b('12345'))
+        infos = dict(self.fs.walkinfo())
+        self.assertEquals(sorted(infos), [
+                          "/bar", "/bar/a.txt", "/foo", "/foo/baz", "/foo/baz/b"])
+        self.assertEquals(infos["/bar/a.txt"]["size"], 3)
+        file_infos = dict(self.fs.walkfilesinfo())
+        self.assertEquals(sorted(file_infos), ["/bar/a.txt", "/foo/baz/b"])
+        self.assertEquals(file_infos["/foo/baz/b"]["size"], 5)
+        self.assertEquals([p for (p, info) in self.fs.walkfilesinfo(wildcard="*.txt")],
+                          ["/bar/a.txt"])
+        self.assertEquals(sorted(p for (p, info) in self.fs.walkfilesinfo(search="depth")),
+                          ["/bar/a.txt", "/foo/baz/b"])
+
     def test_unicode(self):
         alpha = u"\N{GREEK SMALL LETTER ALPHA}"
         beta = u"\N{GREEK SMALL LETTER BETA}"
@@ -16,6 +16,7 @@ from fs.tests import FSTestCases, ThreadingTestCases
 from fs.tempfs import TempFS
 from fs.osfs import OSFS
 from fs.memoryfs import MemoryFS
+from fs.wrapfs import WrapFS
 from fs.path import *
 from fs.errors import *
 
@@ -55,6 +56,126 @@ class TestSFTPFS(TestRPCFS):
         # TODO: do this using a paramiko.Transport() connection
         pass
 
+    def test_pipelined_binary(self):
+        data = b("0123456789") * 20000
+        self.assertEquals(self.fs.setcontents("a.bin", data), len(data))
+        self.assertEquals(self.fs.getcontents("a.bin", "rb"), data)
+        with self.fs.open("a.bin", "rb", pipelined=True) as f:
+            self.assertEquals(f.read(10), data[:10])
+            f.seek(100000)
+            self.assertEquals(f.read(), data[100000:])
+        with self.fs.open("b.bin", "wb", pipelined=True) as f:
+            for i in xrange(0, len(data), 4096):
+                f.write(data[i:i + 4096])
+        self.assertEquals(self.fs.getcontents("b.bin", "rb"), data)
+        written = self.fs.setcontents("c.bin", six.BytesIO(data), chunk_size=1000)
+        self.assertEquals(written, len(data))
+        self.assertEquals(self.fs.getsize("c.bin"), len(data))
+
+    def test_pipelined_text(self):
+        text = u"\u2603 snowman\n" * 1000
+        self.assertEquals(self.fs.setcontents("a.txt", text), len(text))
+        self.assertEquals(self.fs.getcontents("a.txt", "rb"), text.encode("utf-8"))
+        self.assertEquals(self.fs.getcontents("a.txt", "r"), text)
+        with self.fs.open("b.txt", "w", pipelined=True) as f:
+            for line in text.splitlines(True):
+                f.write(line)
+        with self.fs.open("b.txt", "r", pipelined=True) as f:
+            self.assertEquals(f.read(), text)
+        self.assertEquals(self.fs.setcontents("c.txt", six.StringIO(text)), len(text))
+        self.assertEquals(self.fs.getcontents("c.txt", "r"), text)
+
+    def _no_stat_requests(self):
+        client = self.fs.client
+        def stat(path):
+            raise AssertionError("stat request for %s" % (path,))
+        client.stat = client.lstat = stat
+
+    def test_listdir_stats(self):
+        self.fs.makedir("a")
+        self.fs.setcontents("b.txt", b("hello"))
+        stats = dict(self.fs._listdir_stats(self.fs.client, "/"))
+        self.assertEquals(sorted(stats), [u"a", u"b.txt"])
+        self.assertEquals(stats[u"b.txt"]["st_size"], 5)
+        self.assertRaises(ResourceNotFoundError,
+                          self.fs._listdir_stats, self.fs.client, "c")
+        self.assertRaises(ResourceInvalidError,
+                          self.fs._listdir_stats, self.fs.client, "b.txt")
+
+    def test_listdir_types_from_stats(self):
+        self.fs.makedir("a")
+        self.fs.makedir("b")
+        self.fs.setcontents("c.txt", b("c"))
+        self._no_stat_requests()
+        self.assertEquals(sorted(self.fs.listdir(dirs_only=True)), ["a", "b"])
+        self.assertEquals(self.fs.listdir(files_only=True), ["c.txt"])
+        self.assertEquals(self.fs.listdir(wildcard="*.txt", files_only=True,
+                                          full=True), ["c.txt"])
+        infos = dict(self.fs.listdirinfo())
+        self.assertEquals(infos["c.txt"]["size"], 1)
+
+    def test_walk_listings(self):
+        self.fs.makedir("a/b", recursive=True)
+        self.fs.setcontents("a/one.txt", b("one"))
+        self.fs.setcontents("a/b/two.txt", b("two!"))
+        self.assertRaises(ResourceNotFoundError, list, self.fs.walk("c"))
+        self._no_stat_requests()
+        self.assertEquals(sorted(self.fs.walk()),
+                          [("/", []), ("/a", ["one.txt"]), ("/a/b", ["two.txt"])])
+        sizes = [(p, info["size"]) for (p, info) in self.fs.walkfilesinfo(search="depth")]
+        self.assertEquals(sorted(sizes), [("/a/b/two.txt", 4), ("/a/one.txt", 3)])
+
+    def test_abandoned_walk(self):
+        self.fs.makedir("a/b", recursive=True)
+        pool = self.fs._pool
+        num_idle = len(pool._idle)
+        walk = self.fs.walk()
+        self.assertEquals(next(walk), ("/", []))
+        #  No client is held between directories
+        self.assertEquals(len(pool._idle), num_idle)
+        self.assertEquals(next(walk), ("/a", []))
+        self.assertEquals(len(pool._idle), num_idle)
+        walk.close()
+
+
+class _KeepOpenFS(WrapFS):
+    """WrapFS that leaves the wrapped FS open when it is closed."""
+
+    def close(self):
+        pass
+
+
+class TestPooledSFTPFS(TestSFTPFS):
+
+    def makeServer(self,fs,addr):
+        # The test server closes its filesystem whenever an SFTP channel is
+        # closed, which the pool does with clients beyond its size.
+        return BaseSFTPServer(addr,_KeepOpenFS(fs))
+
+    def setUp(self):
+        self.startServer()
+        self.fs = sftpfs.SFTPFS(self.server_addr, no_auth=True,
+                                transports=2, pool_size=4,
+                                thread_synchronize=False)
+
+    def test_pool_size(self):
+        pool = self.fs._pool
+        clients = [pool.acquire() for i in xrange(6)]
+        self.assertEquals(len(set(clients)), 6)
+        for client in clients:
+            pool.release(client)
+        #  Only pool_size clients are kept, the rest are closed
+        self.assertEquals(len(pool._idle), 4)
+        closed = [client for client in clients if client.sock.closed]
+        self.assertEquals(len(closed), 2)
+        self.assertTrue(pool.acquire() in clients)
+        self.fs.setcontents("a.txt", b("hello"))
+        self.assertEquals(self.fs.getcontents("a.txt", "rb"), b("hello"))
+        idle = list(pool._idle)
+        pool.close()
+        self.assertEquals(pool._idle, [])
+        self.assertTrue(all(client.sock.closed for client in idle))
+
 
 try:
     from fs.expose import fuse
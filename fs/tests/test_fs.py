@@ -14,6 +14,8 @@ import os
 import sys
 import shutil
 import tempfile
+import threading
+import pickle
 
 
 from fs import osfs
@@ -63,6 +65,245 @@ class TestMemoryFS(unittest.TestCase,FSTestCases,ThreadingTestCases):
     def setUp(self):
         self.fs = memoryfs.MemoryFS()
 
+    def test_chunked_contents(self):
+        chunk_size = memoryfs.MemoryBuffer.chunk_size
+        data = b"".join(chr(i % 251) for i in xrange(chunk_size * 3 + 100))
+        self.fs.setcontents("big", data)
+        self.assertEquals(self.fs.getsize("big"), len(data))
+        self.assertEquals(self.fs.getcontents("big"), data)
+        with self.fs.open("big", "r+b") as f:
+            f.seek(chunk_size - 5)
+            self.assertEquals(f.read(10), data[chunk_size - 5:chunk_size + 5])
+            buf = bytearray(chunk_size + 10)
+            self.assertEquals(f.readinto(buf), len(buf))
+            self.assertEquals(bytes(buf), data[chunk_size + 5:chunk_size * 2 + 15])
+            f.seek(chunk_size * 2 - 2)
+            f.write(b"XXXX")
+            f.seek(len(data) + 10)
+            f.write(b"end")
+        data = data[:chunk_size * 2 - 2] + b"XXXX" + data[chunk_size * 2 + 2:] + b"\0" * 10 + b"end"
+        self.assertEquals(self.fs.getcontents("big"), data)
+        with self.fs.open("big", "r+b") as f:
+            f.truncate(chunk_size + 1)
+        self.assertEquals(self.fs.getcontents("big"), data[:chunk_size + 1])
+
+    def test_write_unicode(self):
+        with self.fs.open("a.txt", "wb") as f:
+            f.write(u"Hello")
+            f.writelines([u", ", b"World"])
+        self.assertEquals(self.fs.getcontents("a.txt"), b"Hello, World")
+        with self.fs.open("a.txt", "wb") as f:
+            self.assertRaises(UnicodeEncodeError, f.write, u"\N{SNOWMAN}")
+
+    def test_getmmap(self):
+        self.fs.setcontents("a.txt", b"Hello, World!\nSecond line\n")
+        mm = self.fs.getmmap("a.txt")
+        self.assertEquals(len(mm), 26)
+        self.assertEquals(mm[0], b"H")
+        self.assertEquals(mm[7:12], b"World")
+        self.assertEquals(mm.readline(), b"Hello, World!\n")
+        mm[7:12] = b"There"
+        self.assertEquals(self.fs.getcontents("a.txt"), b"Hello, There!\nSecond line\n")
+        self.assertRaises(IndexError, mm.__setitem__, slice(0, 2), b"abc")
+        self.assertRaises(ValueError, mm.write, b"x" * 100)
+        views = mm.views()
+        self.assertEquals(b"".join(bytes(bytearray(v)) for v in views), b"Hello, There!\nSecond line\n")
+        # Views are unaffected by subsequent writes
+        self.fs.open("a.txt", "r+b").write(b"J")
+        self.assertEquals(bytes(bytearray(views[0]))[:5], b"Hello")
+        self.assertEquals(mm[:5], b"Jello")
+        copy_mm = self.fs.getmmap("a.txt", copy=True)
+        copy_mm[0] = b"M"
+        self.assertEquals(copy_mm[:5], b"Mello")
+        self.assertEquals(self.fs.getcontents("a.txt")[:5], b"Jello")
+        read_only_mm = self.fs.getmmap("a.txt", read_only=True)
+        self.assertRaises(TypeError, read_only_mm.__setitem__, 0, b"x")
+        self.assertRaises(errors.ResourceNotFoundError, self.fs.getmmap, "nothere")
+        self.fs.makedir("dir")
+        self.assertRaises(errors.ResourceInvalidError, self.fs.getmmap, "dir")
+
+    def test_snapshot(self):
+        self.fs.makedir("foo/bar", recursive=True)
+        self.fs.setcontents("foo/bar/a.txt", b"template")
+        self.fs.setcontents("foo/b.txt", b"shared")
+        self.fs.setxattr("foo/b.txt", "tag", "x")
+        snapshot = self.fs.snapshot()
+        self.assertEquals(snapshot.getcontents("foo/bar/a.txt"), b"template")
+        # Unchanged entries are shared
+        self.assert_(snapshot.root is self.fs.root)
+        snapshot.setcontents("foo/bar/a.txt", b"changed")
+        with snapshot.open("foo/b.txt", "ab") as f:
+            f.write(b" and appended")
+        snapshot.makedir("new")
+        snapshot.setxattr("foo/b.txt", "tag", "y")
+        self.assertEquals(self.fs.getcontents("foo/bar/a.txt"), b"template")
+        self.assertEquals(self.fs.getcontents("foo/b.txt"), b"shared")
+        self.assertEquals(self.fs.getxattr("foo/b.txt", "tag"), "x")
+        self.assertFalse(self.fs.exists("new"))
+        self.assertEquals(snapshot.getcontents("foo/b.txt"), b"shared and appended")
+        self.assertEquals(snapshot.getxattr("foo/b.txt", "tag"), "y")
+        # Changes to the original don't show in the snapshot
+        self.fs.remove("foo/b.txt")
+        self.fs.rename("foo/bar", "foo/baz")
+        self.assertEquals(sorted(snapshot.listdir("foo")), [u"b.txt", u"bar"])
+        self.assertEquals(sorted(self.fs.listdir("foo")), [u"baz"])
+        # Snapshots of snapshots
+        snapshot2 = snapshot.snapshot()
+        snapshot2.removedir("foo", force=True)
+        self.assertTrue(snapshot.exists("foo/bar/a.txt"))
+        self.assertEquals(snapshot2.listdir(), [u"new"])
+
+    def test_snapshot_open_file(self):
+        f = self.fs.open("a.txt", "wb")
+        try:
+            f.write(b"before")
+            f.flush()
+            snapshot = self.fs.snapshot()
+            f.write(b" after")
+        finally:
+            f.close()
+        self.assertEquals(self.fs.getcontents("a.txt"), b"before after")
+        self.assertEquals(snapshot.getcontents("a.txt"), b"before")
+        mm = self.fs.getmmap("a.txt")
+        snapshot = self.fs.snapshot()
+        mm[:6] = b"BEFORE"
+        self.assertEquals(self.fs.getcontents("a.txt"), b"BEFORE after")
+        self.assertEquals(snapshot.getcontents("a.txt"), b"before after")
+
+    def test_snapshot_rename_open_file(self):
+        self.fs.setcontents("a.txt", b"hello")
+        f = self.fs.open("a.txt", "rb")
+        snapshot = self.fs.snapshot()
+        snapshot.rename("a.txt", "b.txt")
+        self.assertEquals(f._f.path, "a.txt")
+        f.close()
+        self.assertEquals(self.fs._get_dir_entry("a.txt").open_files, [])
+        # Files opened after the snapshot aren't recorded in shared entries
+        f = snapshot.open("b.txt", "rb")
+        g = self.fs.open("a.txt", "rb")
+        self.fs.rename("a.txt", "c.txt")
+        self.assertEquals(f._f.path, "b.txt")
+        self.assertEquals(f.read(), b"hello")
+        f.close()
+        g.close()
+        self.assertEquals(snapshot._get_dir_entry("b.txt").open_files, [])
+        self.assertEquals(self.fs._get_dir_entry("c.txt").open_files, [])
+        # Files open before a snapshot follow renames in their own filesystem
+        f = self.fs.open("c.txt", "rb")
+        snapshot = self.fs.snapshot()
+        self.fs.rename("c.txt", "d.txt")
+        self.assertEquals(f._f.path, "d.txt")
+        f.close()
+        self.assertEquals(self.fs._get_dir_entry("d.txt").open_files, [])
+        self.assertEquals(snapshot._get_dir_entry("c.txt").open_files, [])
+
+    def test_snapshot_pickle(self):
+        self.fs.setcontents("a.txt", b"hello")
+        snapshot = self.fs.snapshot()
+        snapshot.setcontents("a.txt", b"world")
+        snapshot = pickle.loads(pickle.dumps(snapshot))
+        self.assertEquals(snapshot.getcontents("a.txt"), b"world")
+        snapshot.setcontents("b.txt", b"!")
+        self.assertEquals(sorted(snapshot.listdir()), [u"a.txt", u"b.txt"])
+
+
+class TestMemoryFS_lock_free_reads(TestMemoryFS):
+
+    def setUp(self):
+        self.fs = memoryfs.MemoryFS(lock_free_reads=True)
+
+    def test_reads_skip_lock(self):
+        self.fs.makedir("foo")
+        self.fs.setcontents("foo/a.txt", b"hello")
+        locked = threading.Event()
+        release = threading.Event()
+        def hold_lock():
+            self.fs._lock.acquire()
+            try:
+                locked.set()
+                release.wait()
+            finally:
+                self.fs._lock.release()
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            locked.wait()
+            self.assertTrue(self.fs.exists("foo/a.txt"))
+            self.assertTrue(self.fs.isdir("foo"))
+            self.assertEquals(self.fs.listdir("foo"), [u"a.txt"])
+            self.assertEquals(self.fs.getinfo("foo/a.txt")["size"], 5)
+            self.assertEquals(self.fs.getcontents("foo/a.txt"), b"hello")
+            with self.fs.open("foo/a.txt", "rb") as f:
+                self.assertEquals(f.read(), b"hello")
+        finally:
+            release.set()
+            holder.join()
+
+
+class TestMemoryFS_memory_limit(TestMemoryFS):
+
+    def setUp(self):
+        self.spill_fs = memoryfs.MemoryFS()
+        self.fs = memoryfs.MemoryFS(memory_limit=4096, spill_fs=self.spill_fs)
+
+    def tearDown(self):
+        self.fs.close()
+
+    def test_spill(self):
+        contents = dict(("f%i" % i, chr(ord("a") + i) * 2000) for i in xrange(5))
+        for name in sorted(contents):
+            self.fs.setcontents(name, contents[name])
+        # Only the most recently used files stay in memory
+        self.assertEquals(len(self.spill_fs.listdir()), 3)
+        self.assertEquals(self.fs.getsize("f0"), 2000)
+        self.assertEquals(len(self.spill_fs.listdir()), 3)
+        for name in sorted(contents):
+            self.assertEquals(self.fs.getcontents(name), contents[name])
+        self.assertEquals(len(self.spill_fs.listdir()), 3)
+        # Open files are never spilled
+        with self.fs.open("f0", "r+b") as f:
+            self.fs.getcontents("f1")
+            self.fs.getcontents("f2")
+            self.fs.getcontents("f3")
+            f.seek(0, 2)
+            f.write(b"!")
+        self.assertEquals(self.fs.getcontents("f0"), contents["f0"] + "!")
+        # Overwritten and removed files don't leave anything behind
+        self.fs.setcontents("f1", b"small")
+        self.fs.remove("f2")
+        self.fs.remove("f4")
+        self.fs.open("f3", "wb").close()
+        self.assertEquals(self.fs.getcontents("f3"), b"")
+        self.assertEquals(self.spill_fs.listdir(), [])
+
+    def test_spill_snapshot(self):
+        self.fs.setcontents("a", b"a" * 3000)
+        self.fs.setcontents("b", b"b" * 3000)
+        snapshot = self.fs.snapshot()
+        snapshot.setcontents("a", b"changed")
+        self.assertEquals(self.fs.getcontents("a"), b"a" * 3000)
+        self.fs.close()
+        self.assertEquals(snapshot.getcontents("b"), b"b" * 3000)
+        snapshot.close()
+
+    def test_spill_pickle(self):
+        for name in ("a", "b", "c"):
+            self.fs.setcontents(name, name * 2000)
+        fs2 = pickle.loads(pickle.dumps(self.fs))
+        try:
+            # The copy spills to a copy of the given spill_fs
+            spill_fs = fs2._spill_store.spill_fs
+            self.assert_(isinstance(spill_fs, memoryfs.MemoryFS))
+            spilled = set(spill_fs.listdir())
+            fs2.setcontents("d", b"d" * 2000)
+            for name in ("a", "b", "c", "d"):
+                self.assertEquals(fs2.getcontents(name), name * 2000)
+            self.assertEquals(len(set(spill_fs.listdir()) - spilled), 2)
+            for name in ("a", "b", "c", "d"):
+                self.assertEquals(fs2.getcontents(name), name * 2000)
+        finally:
+            fs2.close()
+
 
 from fs import mountfs
 class TestMountFS(unittest.TestCase,FSTestCases,ThreadingTestCases):
@@ -9,6 +9,9 @@ import shutil
 import tempfile
 import subprocess
 import time
+import socket
+import io
+import ftplib
 from os.path import abspath
 import urllib
 
@@ -24,6 +27,7 @@ except ImportError:
         raise ImportError("Requires pyftpdlib <https://github.com/giampaolo/pyftpdlib>")
 
 from fs.path import *
+from fs.errors import *
 
 from fs import ftpfs
 
@@ -82,6 +86,157 @@ class TestFTPFS(unittest.TestCase, FSTestCases, ThreadingTestCases):
         shutil.rmtree(self.temp_dir)
         self.fs.close()
 
+    def test_pooled_connections(self):
+        self.fs.setcontents("a.txt", b"hello")
+        self.assertEqual(self.fs.getcontents("a.txt"), b"hello")
+        idle = len(self.fs._pool._idle)
+        self.assertTrue(idle >= 1)
+        self.fs.copy("a.txt", "b.txt")
+        self.assertEqual(self.fs.getcontents("b.txt"), b"hello")
+        self.assertEqual(len(self.fs._pool._idle), max(idle, 2))
+
+    def test_cache_tree(self):
+        self.fs.makedir("a/b", recursive=True)
+        self.fs.setcontents("a/b/c.txt", b"hello")
+        self.assertEqual(self.fs.cache_tree("a"), 2)
+        self.assertTrue("/a/b" in self.fs.dircache)
+        self.assertEqual(self.fs.getsize("a/b/c.txt"), 5)
+        self.fs.remove("a/b/c.txt")
+        self.assertFalse(self.fs.exists("a/b/c.txt"))
+
+    def test_dircache_timeout(self):
+        self.fs.makedir("a")
+        self.fs.dircache.timeout = 60
+        self.assertEqual(self.fs.listdir("a"), [])
+        self.assertTrue("/a" in self.fs.dircache)
+        open(os.path.join(self.temp_dir, "a", "b.txt"), "wb").close()
+        self.assertEqual(self.fs.listdir("a"), [])
+        #  Age the listing past the timeout
+        self.fs.dircache._read_times["/a"] -= 120
+        self.assertFalse("/a" in self.fs.dircache)
+        self.assertEqual(self.fs.listdir("a"), ["b.txt"])
+
+    def test_dircache_size(self):
+        for name in ("a", "b", "c"):
+            self.fs.makedir(name)
+        self.fs.dircache.max_size = 3
+        self.fs.listdir("a")
+        self.fs.listdir("b")
+        self.fs.listdir("a")
+        self.fs.listdir("c")
+        #  "/b" was the least recently used listing; "/" is read by each listdir()
+        self.assertTrue("/a" in self.fs.dircache)
+        self.assertFalse("/b" in self.fs.dircache)
+        self.assertTrue("/c" in self.fs.dircache)
+        self.assertEqual(len(self.fs.dircache), 3)
+
+    def test_dircache_invalidation(self):
+        self.fs.makedir("a")
+        self.assertEqual(self.fs.listdir("a"), [])
+        self.fs.setcontents("a/b.txt", b"b")
+        self.assertFalse("/a" in self.fs.dircache)
+        self.assertEqual(self.fs.listdir("a"), ["b.txt"])
+        with self.fs.open("a/c.txt", "wb") as f:
+            f.write(b"c")
+        self.assertEqual(sorted(self.fs.listdir("a")), ["b.txt", "c.txt"])
+        self.fs.rename("a/b.txt", "a/d.txt")
+        self.assertEqual(sorted(self.fs.listdir("a")), ["c.txt", "d.txt"])
+        self.fs.remove("a/c.txt")
+        self.assertEqual(self.fs.listdir("a"), ["d.txt"])
+        self.fs.makedir("a/e")
+        self.assertEqual(sorted(self.fs.listdir("a")), ["d.txt", "e"])
+        self.fs.removedir("a", force=True)
+        self.assertFalse(self.fs.exists("a"))
+        self.assertEqual(self.fs.listdir("/"), [])
+
+    def test_dircache_during_upload(self):
+        self.fs.setcontents("a.txt", b"x")
+        test_fs = self.fs
+        class UploadData(io.BytesIO):
+            mode = "rb"
+            def read(self, size=-1):
+                #  A listing read while the upload is in progress
+                test_fs.getsize("a.txt")
+                return io.BytesIO.read(self, size)
+        self.fs.setcontents("a.txt", UploadData(b"y" * 1000))
+        self.assertEqual(self.fs.getsize("a.txt"), 1000)
+        f = self.fs.open("a.txt", "wb")
+        f.write(b"z" * 500)
+        class DataConnection(object):
+            def __init__(self, conn):
+                self.conn = conn
+            def close(self):
+                #  A listing read just before the upload finishes
+                test_fs.getsize("a.txt")
+                self.conn.close()
+        f._f.conn = DataConnection(f._f.conn)
+        f.close()
+        self.assertEqual(self.fs.getsize("a.txt"), 500)
+
+    def test_random_access_read(self):
+        contents = b"".join(b"%06d" % i for i in range(50000))
+        self.fs.setcontents("big.bin", contents)
+        with self.fs.open("big.bin", "rb") as f:
+            for pos in (250000, 12, 299990, 100000, 100006, 0):
+                f.seek(pos)
+                self.assertEqual(f.read(10), contents[pos:pos+10])
+
+    def _wait_for_size(self, path, size):
+        #  Wait until the server has stored everything sent so far
+        sys_path = os.path.join(self.temp_dir, path)
+        start_time = time.time()
+        while os.path.getsize(sys_path) < size:
+            if time.time() - start_time > 5:
+                self.fail("server didn't receive the data")
+            time.sleep(0.01)
+
+    def test_read_resume(self):
+        contents = b"".join(b"%06d" % i for i in range(50000))
+        self.fs.setcontents("big.bin", contents)
+        with self.fs.open("big.bin", "rb") as f:
+            ftp_file = f._f
+            self.assertEqual(f.read(1000), contents[:1000])
+            #  Lose the data connection
+            ftp_file.conn.close()
+            self.assertEqual(f.read(1000), contents[1000:2000])
+            #  Lose the control connection
+            ftp_file.ftp.sock.shutdown(socket.SHUT_RDWR)
+            self.assertEqual(f.read(), contents[2000:])
+
+    def test_write_resume(self):
+        contents = b"".join(b"%06d" % i for i in range(50000))
+        with self.fs.open("big.bin", "wb") as f:
+            ftp_file = f._f
+            f.write(contents[:100000])
+            #  Lose the data connection
+            ftp_file.conn.close()
+            self._wait_for_size("big.bin", 100000)
+            f.write(contents[100000:200000])
+            #  Lose both connections
+            ftp_file.conn.close()
+            self._wait_for_size("big.bin", 200000)
+            ftp_file.ftp.sock.shutdown(socket.SHUT_RDWR)
+            f.write(contents[200000:])
+        self.assertEqual(self.fs.getcontents("big.bin", "rb"), contents)
+
+    def test_write_resume_fails(self):
+        f = self.fs.open("a.bin", "wb")
+        f.write(b"hello")
+        f._f.conn.close()
+        self._wait_for_size("a.bin", 5)
+        acquire = self.fs._pool.acquire
+        def acquire_without_size():
+            ftp = acquire()
+            def size(path):
+                raise ftplib.error_perm("550 SIZE not allowed")
+            ftp.size = size
+            return ftp
+        self.fs._pool.acquire = acquire_without_size
+        #  The error that interrupted the write is reported, not the
+        #  one from asking how much the server has
+        self.assertRaises(RemoteConnectionError, f.write, b"world")
+        f.close()
+
     def check(self, p):
         check_path = self.temp_dir.rstrip(os.sep) + os.sep + p
         return os.path.exists(check_path.encode('utf-8'))
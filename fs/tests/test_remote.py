@@ -20,6 +20,7 @@ from fs import SEEK_END
 from fs.wrapfs import WrapFS, wrap_fs_methods
 from fs.tempfs import TempFS
 from fs.path import *
+from fs.errors import ResourceNotFoundError, ResourceInvalidError, UnsupportedError
 from fs.local_functools import wraps
 
 from six import PY3, b
@@ -232,6 +233,94 @@ class TestRemoteFileBuffer(unittest.TestCase, FSTestCases, ThreadingTestCases):
         f.close()
 
 
+class TempRangeReader(RemoteRangeReader):
+    """RemoteRangeReader for a file in a TempFS, recording the reads made."""
+
+    def __init__(self, fs, path):
+        super(TempRangeReader, self).__init__(fs.getsize(path))
+        self.fs = fs
+        self.path = path
+        self.reads = []
+
+    def read_range(self, offset, length):
+        self.reads.append((offset, length))
+        with TempFS.open(self.fs, self.path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+
+class RangedRemoteTempFS(RemoteTempFS):
+    """RemoteTempFS giving its RemoteFileBuffers random access to files."""
+
+    def __repr__(self):
+        return '<RangedRemoteTempFS: %s>' % self._temp_dir
+
+    def open(self, path, mode='rb', write_on_flush=True, **kwargs):
+        if 'a' in mode or 'r' in mode or '+' in mode:
+            if not TempFS.exists(self, path):
+                raise ResourceNotFoundError(path)
+            if TempFS.isdir(self, path):
+                raise ResourceInvalidError(path)
+            f = TempRangeReader(self, path)
+        else:
+            f = None
+        return RemoteFileBuffer(self, path, mode, f, write_on_flush=write_on_flush)
+
+
+class TestRangedRemoteFileBuffer(unittest.TestCase, FSTestCases, ThreadingTestCases):
+
+    def setUp(self):
+        self.fs = RangedRemoteTempFS()
+
+    def tearDown(self):
+        self.fs.close()
+
+    def test_ranged_reads(self):
+        contents = b("0123456789") * 100000
+        self.fs.setcontents('test.bin', contents)
+        f = self.fs.open('test.bin', 'rb')
+        f.seek(-10, SEEK_END)
+        self.assertEquals(f.read(), contents[-10:])
+        f.seek(500000)
+        self.assertEquals(f.read(10), contents[500000:500010])
+        self.assertEquals(f._rfile.reads, [(len(contents) - 10, 10), (500000, 10)])
+        #  Sequential reads read ahead of the requested data
+        self.assertEquals(f.read(10), contents[500010:500020])
+        self.assertEquals(f._rfile.reads[-1], (500010, 10 + f.min_readahead))
+        self.assertEquals(f.read(10), contents[500020:500030])
+        self.assertEquals(len(f._rfile.reads), 3)
+        #  Data already in the buffer isn't fetched again
+        f.seek(500000)
+        self.assertEquals(f.read(30), contents[500000:500030])
+        self.assertEquals(len(f._rfile.reads), 3)
+        f.seek(0)
+        self.assertEquals(f.read(), contents)
+        self.assertEquals(f._rfile.reads[-2:], [(0, 500000), (500010 + 10 + f.min_readahead, len(contents) - 500020 - f.min_readahead - 10)])
+        f.close()
+
+    def test_range_reader_base(self):
+        reader = RemoteRangeReader(10)
+        self.assertRaises(UnsupportedError, reader.read_range, 0, 10)
+        self.assertRaises(UnsupportedError, list, reader.iter_range(0, 10))
+
+    def test_ranged_write(self):
+        contents = b("0123456789") * 10000
+        self.fs.setcontents('test.bin', contents)
+        f = self.fs.open('test.bin', 'rb+')
+        f.seek(50000)
+        f.write(b("abcdefghij"))
+        f.seek(-5, SEEK_END)
+        self.assertEquals(f.read(), b("56789"))
+        f.close()
+        self.assertEquals(f._rfile.reads, [(len(contents) - 5, 5), (0, 50000), (50010, len(contents) - 50015)])
+        self.assertEquals(self.fs.getcontents('test.bin', 'rb'), contents[:50000] + b("abcdefghij") + contents[50010:])
+        f = self.fs.open('test.bin', 'rb+')
+        f.seek(20000)
+        f.truncate()
+        f.close()
+        self.assertEquals(self.fs.getcontents('test.bin', 'rb'), contents[:20000])
+
+
 class TestCacheFS(unittest.TestCase,FSTestCases,ThreadingTestCases):
     """Test simple operation of CacheFS"""
 
@@ -275,6 +364,58 @@ class TestCacheFS(unittest.TestCase,FSTestCases,ThreadingTestCases):
         finally:
             self.fs.cache_timeout = old_timeout
 
+    def test_lru_eviction(self):
+        self.fs.cache_timeout = None
+        self.fs.max_cache_size = 3
+        for nm in ("a","b","c"):
+            self.fs.setcontents(nm,b(nm))
+            self.fs.getinfo(nm)
+        #  Touch "a" so that "b" is the least recently used entry
+        self.fs.getinfo("a")
+        self.fs.setcontents("d",b("d"))
+        self.wrapped_fs.remove("a")
+        self.wrapped_fs.remove("b")
+        self.assertTrue(self.fs.exists("a"))
+        self.assertFalse(self.fs.exists("b"))
+        stats = self.fs.get_cache_stats()
+        self.assertEquals(stats["size"],3)
+        self.assertTrue(stats["evictions"] >= 1)
+
+    def test_negative_cache(self):
+        self.fs.cache_timeout = None
+        self.assertFalse(self.fs.exists("hello"))
+        self.wrapped_fs.setcontents("hello",b("world"))
+        self.assertTrue(self.fs.exists("hello"))
+        self.fs.negative_cache_timeout = None
+        self.assertFalse(self.fs.exists("world"))
+        misses = self.fs.get_cache_stats()["misses"]
+        self.wrapped_fs.setcontents("world",b("hello"))
+        self.assertFalse(self.fs.exists("world"))
+        self.assertRaises(ResourceNotFoundError,self.fs.open,"world")
+        self.assertEquals(self.fs.get_cache_stats()["misses"],misses)
+        #  Changes made through the cache are seen straight away
+        self.assertFalse(self.fs.exists("dir"))
+        self.fs.makedir("dir/sub",recursive=True)
+        self.assertTrue(self.fs.isdir("dir"))
+        self.fs.setcontents("world",b("hello"))
+        self.assertTrue(self.fs.exists("world"))
+        self.fs.remove("world")
+        self.wrapped_fs.setcontents("world",b("hello"))
+        self.assertFalse(self.fs.exists("world"))
+
+    def test_expiry_clears_full_children(self):
+        get_cached_info = self.fs._CacheFSMixin__get_cached_info
+        self.fs.cache_timeout = None
+        self.fs.setcontents("a",b("a"))
+        self.fs.getinfo("/")
+        self.fs.getinfo("a")
+        root_ci = get_cached_info("/")
+        root_ci.has_full_children = True
+        self.fs.cache_timeout = 0.01
+        time.sleep(0.02)
+        self.assertRaises(KeyError,get_cached_info,"a")
+        self.assertFalse(root_ci.has_full_children)
+
 
 
 class TestConnectionManagerFS(unittest.TestCase,FSTestCases):#,ThreadingTestCases):
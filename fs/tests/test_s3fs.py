@@ -12,8 +12,9 @@ import unittest
 
 from fs.tests import FSTestCases, ThreadingTestCases
 from fs.path import *
+from fs.errors import *
 
-from six import PY3
+from six import PY3, b
 try:
     from fs import s3fs
 except ImportError:
@@ -47,6 +48,124 @@ class TestS3FS(unittest.TestCase,FSTestCases,ThreadingTestCases):
         # S3's eventual-consistency seems to be breaking this test
         pass
 
+    def test_multipart_upload(self):
+        self.fs._multipart_threshold = self.fs._part_size = s3fs.MIN_PART_SIZE
+        data = b("x") * (s3fs.MIN_PART_SIZE * 2 + 100)
+        self.fs.setcontents("big.bin", data)
+        self.assertEquals(self.fs.getcontents("big.bin", "rb"), data)
+        pool = self.fs._get_upload_pool()
+        f = self.fs.open("streamed.bin", "wb-")
+        for i in xrange(0, len(data), 1024 * 1024):
+            f.write(data[i:i + 1024 * 1024])
+        f.close()
+        self.assertEquals(self.fs.getcontents("streamed.bin", "rb"), data)
+        #  The upload threads, and their connections, are reused
+        self.assertTrue(self.fs._get_upload_pool() is pool)
+        self.assertFalse(pool.closed)
+
+    def test_parallel_download(self):
+        self.fs._download_part_size = 1024 * 1024
+        data = b("").join(b(str(i)) for i in xrange(1024 * 1024))
+        self.fs.setcontents("big.bin", data)
+        f = self.fs.open("big.bin", "rb-")
+        self.assertEquals(f.read(), data)
+        f.close()
+        f = self.fs.open("big.bin", "rb")
+        f.seek(1000000)
+        self.assertEquals(f.read(), data[1000000:])
+        f.close()
+        #  The download threads, and their connections, are reused
+        pool = self.fs._get_download_pool()
+        f = self.fs.open("big.bin", "rb-")
+        self.assertEquals(f.read(), data)
+        f.close()
+        self.assertTrue(self.fs._get_download_pool() is pool)
+
+    def test_removedir_force_batched(self):
+        self.fs.makedir("dir/sub",recursive=True)
+        for i in xrange(5):
+            self.fs.setcontents("dir/f%d" % (i,),b("data"))
+            self.fs.setcontents("dir/sub/f%d" % (i,),b("data"))
+        pool = self.fs._get_bulk_pool()
+        max_delete_keys = s3fs.MAX_DELETE_KEYS
+        s3fs.MAX_DELETE_KEYS = 2
+        try:
+            self.fs.removedir("dir",force=True)
+        finally:
+            s3fs.MAX_DELETE_KEYS = max_delete_keys
+        self.assertFalse(self.fs.exists("dir"))
+        self.assertEquals(self.fs.listdir("/"),[])
+        #  The delete requests are sent on the filesystem's own threads
+        self.assertTrue(self.fs._get_bulk_pool() is pool)
+        self.assertFalse(pool.closed)
+
+    def _make_dir(self):
+        self.fs.makedir("a/sub",recursive=True)
+        self.fs.setcontents("a/f1",b("one"))
+        self.fs.setcontents("a/sub/f2",b("two"))
+
+    def test_copydir_overwrite(self):
+        self._make_dir()
+        self.fs.makedir("b")
+        self.fs.setcontents("b/f1",b("old"))
+        self.fs.setcontents("b/other",b("other"))
+        self.assertRaises(DestinationExistsError,self.fs.copydir,"a","b")
+        self.fs.copydir("a","b",overwrite=True)
+        self.assertEquals(self.fs.getcontents("b/f1","rb"),b("one"))
+        self.assertEquals(self.fs.getcontents("b/sub/f2","rb"),b("two"))
+        self.assertEquals(self.fs.getcontents("b/other","rb"),b("other"))
+        self.assertEquals(self.fs.getcontents("a/f1","rb"),b("one"))
+        #  The bulk threads, and their connections, are reused
+        pool = self.fs._get_bulk_pool()
+        self.fs.copydir("a","c")
+        self.assertTrue(self.fs._get_bulk_pool() is pool)
+
+    def test_movedir_removes_source(self):
+        self._make_dir()
+        self.fs.movedir("a","b")
+        self.assertFalse(self.fs.exists("a"))
+        self.assertEquals(self.fs.listdir("/"),["b"])
+        self.assertEquals(sorted(self.fs.listdir("b")),["f1","sub"])
+        self.assertEquals(self.fs.getcontents("b/sub/f2","rb"),b("two"))
+        self._make_dir()
+        self.assertRaises(DestinationExistsError,self.fs.movedir,"a","b")
+        self.fs.movedir("a","b",overwrite=True)
+        self.assertFalse(self.fs.exists("a"))
+        self.assertEquals(self.fs.getcontents("b/f1","rb"),b("one"))
+
+    def test_copydir_ignore_errors(self):
+        self._make_dir()
+        copy_key = self.fs._copy_key
+        def fail_f1(dst_name,src_name,size):
+            if basename(src_name) == "f1":
+                raise s3fs.S3ResponseError(403,"Forbidden")
+            return copy_key(dst_name,src_name,size)
+        self.fs._copy_key = fail_f1
+        self.assertRaises(s3fs.S3ResponseError,self.fs.copydir,"a","b")
+        self.fs.copydir("a","c",ignore_errors=True)
+        self.assertFalse(self.fs.exists("c/f1"))
+        self.assertEquals(self.fs.getcontents("c/sub/f2","rb"),b("two"))
+        self.fs.movedir("a","d",ignore_errors=True)
+        #  Keys that couldn't be copied are left in the source
+        self.assertEquals(self.fs.getcontents("a/f1","rb"),b("one"))
+        self.assertFalse(self.fs.exists("a/sub/f2"))
+        self.assertFalse(self.fs.exists("d/f1"))
+        self.assertEquals(self.fs.getcontents("d/sub/f2","rb"),b("two"))
+
+    def test_copydir_multipart(self):
+        self.fs._multipart_threshold = self.fs._part_size = s3fs.MIN_PART_SIZE
+        data = b("x") * (s3fs.MIN_PART_SIZE * 2 + 100)
+        self.fs.makedir("a")
+        self.fs.setcontents("a/big.bin",data)
+        max_copy_size = s3fs.MAX_COPY_SIZE
+        s3fs.MAX_COPY_SIZE = s3fs.MIN_PART_SIZE
+        try:
+            self.fs.copydir("a","b")
+        finally:
+            s3fs.MAX_COPY_SIZE = max_copy_size
+        self.assertEquals(self.fs.getsize("b/big.bin"),len(data))
+        self.assertEquals(self.fs.getcontents("b/big.bin","rb"),data)
+
 
 class TestS3FS_prefix(TestS3FS):
 
@@ -57,3 +176,11 @@ class TestS3FS_prefix(TestS3FS):
 
     def tearDown(self):
         self.fs.close()
+
+
+class TestS3FS_listingcache(TestS3FS):
+
+    def setUp(self):
+        self.fs = s3fs.S3FS(self.bucket,listing_cache_timeout=60)
+        for k in self.fs._s3bukt.list():
+            self.fs._s3bukt.delete_key(k)
@@ -2,7 +2,10 @@ import unittest
 
 from fs.tempfs import TempFS
 from fs.memoryfs import MemoryFS
+from fs.osfs import OSFS
+from fs.wrapfs import WrapFS
 from fs import utils
+from fs.errors import ResourceInvalidError
 
 from six import b
 
@@ -90,6 +93,146 @@ class TestUtils(unittest.TestCase):
         self.assert_(not fs1.exists("from"))
         self._check_fs(fs2)
 
+    def test_copydir_workers(self):
+        """Test copydir and movedir with several workers"""
+        fs1 = MemoryFS()
+        self._make_fs(fs1)
+        fs2 = TempFS()
+        utils.copydir(fs1, (fs2, "copy"), workers=4)
+        self._check_fs(fs2.opendir("copy"))
+        fs3 = MemoryFS()
+        utils.movedir((fs2, "copy"), fs3, workers=4)
+        self.assert_(not fs2.exists("copy"))
+        self._check_fs(fs3)
+
+    def test_copydir_progress(self):
+        """Test copydir_progress reports every file"""
+        fs1 = MemoryFS()
+        self._make_fs(fs1)
+        fs2 = MemoryFS()
+        steps = []
+        utils.copydir_progress(lambda step, num_steps: steps.append((step, num_steps)),
+                               fs1, fs2, workers=2)
+        self._check_fs(fs2)
+        self.assertEqual(steps[0], (0, None))
+        self.assertEqual(steps[-1], (4, 4))
+        done = [step for (step, _num_steps) in steps]
+        self.assertEqual(done, sorted(done))
+
+    def test_treecopier_limits(self):
+        """Test TreeCopier concurrency limits"""
+        copier = utils.TreeCopier(workers=8, remote_workers=2, dst_workers=3)
+        local_fs = MemoryFS()
+        self.assertEqual(copier.get_limit(local_fs, True), 8)
+        self.assertEqual(copier.get_limit(local_fs, False), 3)
+        local_fs.getmeta = lambda name, default=None: name in ("network", "thread_safe")
+        self.assertEqual(copier.get_limit(local_fs, True), 2)
+        local_fs.getmeta = lambda name, default=None: False
+        self.assertEqual(copier.get_limit(local_fs, True), 1)
+        #  Explicit limits are used even if the FS isn't thread-safe
+        self.assertEqual(copier.get_limit(local_fs, False), 3)
+
+    def test_treecopier_errors(self):
+        """Test TreeCopier error handling"""
+        fs1 = MemoryFS()
+        self._make_fs(fs1)
+        fs2 = MemoryFS()
+        fs2.makedir("foo")
+        fs2.setcontents("foo/bar", b("not a directory"))
+        copier = utils.TreeCopier(workers=2)
+        self.assertRaises(ResourceInvalidError, copier.copydir, fs1, "/", fs2, "/")
+        copier = utils.TreeCopier(workers=2, ignore_errors=True)
+        self.assertEqual(copier.copydir(fs1, "/", fs2, "/"), 3)
+        self.assertEqual(fs2.getcontents("f3", "rb"), b("file 3"))
+
+    def test_syncdir(self):
+        """Test syncdir only copies changed files"""
+        fs1 = MemoryFS()
+        self._make_fs(fs1)
+        fs2 = TempFS()
+        summary = utils.syncdir(fs1, (fs2, "copy"))
+        self.assertEqual(sorted(summary["copied"]),
+                         ["/copy/f1", "/copy/f2", "/copy/f3", "/copy/foo/bar/fruit"])
+        self._check_fs(fs2.opendir("copy"))
+
+        summary = utils.syncdir(fs1, (fs2, "copy"), workers=2)
+        self.assertEqual(summary, {"copied": [], "deleted": [], "unchanged": 4})
+
+        fs1.setcontents("f2", b("file two"))
+        fs1.remove("f3")
+        fs1.setcontents("foo/new", b("new"))
+        fs2.setcontents("copy/extra", b("extra"))
+        summary = utils.syncdir(fs1, (fs2, "copy"), delete=True)
+        self.assertEqual(sorted(summary["copied"]), ["/copy/f2", "/copy/foo/new"])
+        self.assertEqual(sorted(summary["deleted"]), ["/copy/extra", "/copy/f3"])
+        self.assertEqual(summary["unchanged"], 2)
+        self.assertEqual(fs2.getcontents("copy/f2", "rb"), b("file two"))
+        self.assert_(not fs2.exists("copy/f3"))
+
+    def test_syncdir_no_mtime(self):
+        """Test syncdir copies files without a modification time"""
+        class NoMTimeFS(WrapFS):
+            def getinfo(self, path):
+                info = super(NoMTimeFS, self).getinfo(path)
+                info.pop("modified_time", None)
+                return info
+        fs1 = MemoryFS()
+        self._make_fs(fs1)
+        fs2 = TempFS()
+        utils.syncdir(fs1, fs2)
+        fs1.setcontents("f1", b("file X"))
+        summary = utils.syncdir(NoMTimeFS(fs1), fs2)
+        self.assertEqual(summary["unchanged"], 0)
+        self.assertEqual(fs2.getcontents("f1", "rb"), b("file X"))
+        fs1.setcontents("f1", b("file Y"))
+        summary = utils.syncdir(fs1, NoMTimeFS(fs2))
+        self.assertEqual(fs2.getcontents("f1", "rb"), b("file Y"))
+
+    def test_syncdir_hash(self):
+        """Test syncdir comparing file contents"""
+        fs1 = MemoryFS()
+        self._make_fs(fs1)
+        fs2 = MemoryFS()
+        self._make_fs(fs2)
+        fs2.setcontents("f1", b("file X"))
+        fs2.remove("f2")
+        fs2.makedir("f2")
+        summary = utils.syncdir(fs1, fs2, compare="size")
+        self.assertEqual(sorted(summary["copied"]), ["/f2"])
+        self.assertEqual(summary["deleted"], ["/f2"])
+        summary = utils.syncdir(fs1, fs2, compare="hash")
+        self.assertEqual(summary["copied"], ["/f1"])
+        self._check_fs(fs2)
+        self.assertRaises(ValueError, utils.syncdir, fs1, fs2, compare="name")
+
+    def test_copyfile_syspath(self):
+        """Test copying files between system paths"""
+        data = b("0123456789") * 200000
+        fs1 = TempFS()
+        fs2 = TempFS()
+        fs1.setcontents("big", data)
+        fs1.setcontents("empty", b(""))
+        utils.copyfile(fs1, "big", fs2, "big")
+        utils.copyfile_non_atomic(fs1, "empty", fs2, "empty")
+        self.assertEqual(fs2.getcontents("big", "rb"), data)
+        self.assertEqual(fs2.getcontents("empty", "rb"), b(""))
+        fs2.setcontents("big", b("short"))
+        utils.copyfile_non_atomic(fs1, "big", fs2, "big")
+        self.assertEqual(fs2.getcontents("big", "rb"), data)
+        utils.movefile_non_atomic(fs1, "big", fs2, "moved")
+        self.assert_(not fs1.exists("big"))
+        self.assertEqual(fs2.getcontents("moved", "rb"), data)
+
+    def test_movedir_rename(self):
+        """Test movedir renames directories on the same device"""
+        fs1 = TempFS()
+        fs1sub = fs1.makeopendir("from")
+        self._make_fs(fs1sub)
+        fs2 = OSFS(fs1.getsyspath("/"))
+        utils.movedir((fs1, "from"), (fs2, "to"))
+        self.assert_(not fs1.exists("from"))
+        self._check_fs(fs1.opendir("to"))
+
     def test_remove_all(self):
         """Test remove_all function"""
         fs = TempFS()
@@ -112,4 +255,16 @@ class TestUtils(unittest.TestCase):
         self.assert_(not fs.exists("f1"))
         self.assert_(fs.isdirempty('/'))
 
+    def test_countbytes(self):
+        """Test countbytes function"""
+        fs = MemoryFS()
+        self._make_fs(fs)
+        self.assertEqual(utils.countbytes(fs), 23)
 
+    def test_find_duplicates(self):
+        """Test find_duplicates function"""
+        fs = MemoryFS()
+        self._make_fs(fs)
+        fs.setcontents("foo/f1", b("file 1"))
+        dups = [sorted(paths) for paths in utils.find_duplicates(fs)]
+        self.assertEqual(dups, [["/f1", "/foo/f1"]])
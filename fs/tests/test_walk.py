@@ -0,0 +1,104 @@
+"""
+
+  fs.tests.test_walk:  testcases for the parallel directory walker
+
+"""
+
+import unittest
+
+from fs.memoryfs import MemoryFS
+from fs.tempfs import TempFS
+from fs.walk import ParallelWalker
+from fs.threadpool import ThreadPool
+from fs.errors import ResourceNotFoundError
+
+from six import b
+
+
+class TestParallelWalker(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = MemoryFS()
+        for d in ("a/b/c", "a/d", "e/f/g/h", "e/.svn"):
+            self.fs.makedir(d, recursive=True)
+        for f in ("1.txt", "a/2.txt", "a/b/3.dat", "a/b/c/4.txt",
+                  "a/d/5.txt", "e/f/g/h/6.txt", "e/.svn/7.txt"):
+            self.fs.setcontents(f, b(f))
+        self.walker = ParallelWalker(self.fs, workers=4)
+
+    def tearDown(self):
+        self.fs.close()
+
+    def _sorted(self, walk):
+        return sorted((d, sorted(files)) for (d, files) in walk)
+
+    def test_walk_matches_fs(self):
+        for search in ("breadth", "depth"):
+            self.assertEqual(self._sorted(self.walker.walk(search=search)),
+                             self._sorted(self.fs.walk(search=search)))
+        self.assertEqual(sorted(self.walker.walkfiles("a", wildcard="*.txt")),
+                         sorted(self.fs.walkfiles("a", wildcard="*.txt")))
+        self.assertEqual(sorted(self.walker.walkdirs(wildcard="*b*")),
+                         sorted(self.fs.walkdirs(wildcard="*b*")))
+
+    def test_breadth_order(self):
+        seen = set()
+        for dir_path, _files in self.walker.walk(search="breadth"):
+            if dir_path != "/":
+                parent = dir_path.rsplit("/", 1)[0] or "/"
+                self.assert_(parent in seen, dir_path)
+            seen.add(dir_path)
+
+    def test_depth_order(self):
+        seen = set()
+        for dir_path, _files in self.walker.walk(search="depth"):
+            for sub_dir in self.fs.listdir(dir_path, dirs_only=True, absolute=True):
+                self.assert_(sub_dir in seen, sub_dir)
+            seen.add(dir_path)
+        self.assertEqual(len(seen), len(list(self.fs.walkdirs())))
+
+    def test_dir_wildcard(self):
+        files = list(self.walker.walkfiles(dir_wildcard=lambda p: not p.endswith(".svn")))
+        self.assertEqual(len(files), 6)
+        self.assert_("/e/.svn/7.txt" not in files)
+
+    def test_errors(self):
+        self.assertRaises(ResourceNotFoundError, list, self.walker.walk("zebra"))
+        self.assertRaises(ValueError, list, self.walker.walk(search="sideways"))
+
+        def failing_scandir(path):
+            raise ValueError(path)
+        self.fs.scandir = failing_scandir
+        self.assertRaises(ValueError, list, self.walker.walk())
+        self.assertEqual(list(self.walker.walk(ignore_errors=True)), [("/", [])])
+
+    def test_early_exit(self):
+        for _item in self.walker.walk():
+            break
+
+    def test_tempfs(self):
+        temp_fs = TempFS()
+        try:
+            temp_fs.makedir("foo/bar", recursive=True)
+            temp_fs.setcontents("foo/bar/baz.txt", b("baz"))
+            walker = ParallelWalker(temp_fs)
+            self.assertEqual(list(walker.walkfiles()), ["/foo/bar/baz.txt"])
+        finally:
+            temp_fs.close()
+
+
+class TestThreadPool(unittest.TestCase):
+
+    def test_map(self):
+        with ThreadPool(3) as pool:
+            self.assertEqual(pool.map(lambda n: n * 2, xrange(50)), range(0, 100, 2))
+            self.assertEqual(sorted(pool.imap_unordered(lambda n: n * 2, xrange(50))),
+                             range(0, 100, 2))
+
+    def test_exceptions(self):
+        pool = ThreadPool(2)
+        result = pool.apply_async(lambda: 1 / 0)
+        self.assertRaises(ZeroDivisionError, result.get)
+        self.assertFalse(result.successful())
+        pool.close()
+        self.assertRaises(ValueError, pool.apply_async, lambda: None)
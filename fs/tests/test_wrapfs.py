@@ -11,6 +11,7 @@ import os
 import sys
 import shutil
 import tempfile
+import time
 
 from fs import osfs
 from fs.errors import *
@@ -36,6 +37,23 @@ class TestWrapFS(unittest.TestCase, FSTestCases, ThreadingTestCases):
     def check(self, p):
         return os.path.exists(os.path.join(self.temp_dir, relpath(p)))
 
+    def test_scandir_uses_wrapped_scandir(self):
+        self.fs.makedir("a")
+        self.fs.setcontents("b.txt", b("b"))
+        wrapped_fs = self.fs.wrapped_fs
+        scandir = wrapped_fs.scandir
+        calls = []
+        def scandir_spy(path="./"):
+            calls.append(path)
+            return scandir(path)
+        wrapped_fs.scandir = scandir_spy
+        entries = dict((e.name, e) for e in self.fs.scandir("/"))
+        self.assertTrue(calls)
+        self.assertEquals(sorted(entries), ["a", "b.txt"])
+        self.assertTrue(entries["a"].is_dir())
+        self.assertTrue(entries["b.txt"].is_file())
+        self.assertEquals(entries["b.txt"].getinfo()["size"], 1)
+
 
 from fs.wrapfs.lazyfs import LazyFS
 class TestLazyFS(unittest.TestCase, FSTestCases, ThreadingTestCases):
@@ -109,3 +127,197 @@ class TestHideDotFilesFS(unittest.TestCase):
         self.assertEquals(len(list(self.fs.ilistdir())), 2)
 
 
+
+
+from fs.tempfs import TempFS
+from fs.wrapfs.blockcachefs import BlockCacheFS
+class TestBlockCacheFS(TestWrapFS):
+
+    def setUp(self):
+        super(TestBlockCacheFS,self).setUp()
+        self.cache_fs = TempFS()
+        self.fs = BlockCacheFS(self.fs,self.cache_fs,block_size=1024,max_size=64*1024)
+
+    def tearDown(self):
+        super(TestBlockCacheFS,self).tearDown()
+        self.cache_fs.close()
+
+    def _cached_blocks(self):
+        return self.cache_fs.listdir(wildcard="*.[0-9]*")
+
+    def _no_remote_reads(self):
+        def open(path,mode="r",*args,**kwds):
+            if "r" in mode:
+                raise AssertionError("read from the wrapped FS")
+        self.fs.wrapped_fs.open = open
+
+    def test_partial_read(self):
+        self.fs.setcontents("a.txt",b("0123456789")*1000)
+        with self.fs.open("a.txt","rb") as f:
+            f.seek(2050)
+            self.assertEquals(f.read(10),b("0123456789"))
+        self.assertEquals(len(self._cached_blocks()),1)
+        self.assertTrue(self._cached_blocks()[0].endswith(".2"))
+        self._no_remote_reads()
+        with self.fs.open("a.txt","rb") as f:
+            f.seek(2048)
+            self.assertEquals(f.read(12),b("890123456789"))
+
+    def test_cached_read(self):
+        self.fs.setcontents("a.txt",b("hello world\n")*1000)
+        contents = self.fs.getcontents("a.txt","rb")
+        self.assertEquals(self.fs.cur_size,len(contents))
+        self._no_remote_reads()
+        self.assertEquals(self.fs.getcontents("a.txt","rb"),contents)
+        with self.fs.open("a.txt") as f:
+            self.assertEquals(f.readline(),u"hello world\n")
+
+    def test_eviction(self):
+        self.fs.max_size = 3*1024
+        self.fs.setcontents("a.txt",b("x")*10000)
+        self.assertEquals(self.fs.getcontents("a.txt","rb"),b("x")*10000)
+        self.assertEquals(self.fs.cur_size,2*1024 + 10000 % 1024)
+        self.assertEquals(len(self._cached_blocks()),3)
+
+    def test_invalidation(self):
+        self.fs.setcontents("a.txt",b("one"))
+        self.assertEquals(self.fs.getcontents("a.txt","rb"),b("one"))
+        self.fs.setcontents("a.txt",b("two"))
+        self.assertEquals(self.fs.getcontents("a.txt","rb"),b("two"))
+        self.fs.makedir("dir")
+        self.fs.setcontents("dir/b.txt",b("three"))
+        self.assertEquals(self.fs.getcontents("dir/b.txt","rb"),b("three"))
+        self.fs.removedir("dir",force=True)
+        self.assertEquals(self.fs.cur_size,3)
+
+    def test_reuse_cache(self):
+        self.fs.setcontents("a.txt",b("x")*5000)
+        self.fs.getcontents("a.txt","rb")
+        fs2 = BlockCacheFS(self.fs.wrapped_fs,self.cache_fs,block_size=1024)
+        self.assertEquals(fs2.cur_size,5000)
+        self._no_remote_reads()
+        self.assertEquals(fs2.getcontents("a.txt","rb"),b("x")*5000)
+
+    def test_reuse_cache_invalidation(self):
+        self.fs.makedir("dir")
+        self.fs.setcontents("dir/a.txt",b("x")*5000)
+        self.fs.getcontents("dir/a.txt","rb")
+        fs2 = BlockCacheFS(self.fs.wrapped_fs,self.cache_fs,block_size=1024)
+        self.assertEquals(fs2.cur_size,5000)
+        fs2.setcontents("dir/a.txt",b("y")*5000)
+        self.assertEquals(fs2.cur_size,0)
+        self.assertEquals(self.cache_fs.listdir(),[])
+
+
+from fs.watch import WatchableFS
+from fs.wrapfs.indexedfs import IndexedFS
+class TestIndexedFS(TestWrapFS):
+
+    def setUp(self):
+        super(TestIndexedFS,self).setUp()
+        self.fs = IndexedFS(self.fs)
+
+    def _no_backend_queries(self, fs):
+        def fail(*args,**kwds):
+            raise AssertionError("queried the wrapped FS")
+        for name in ("exists","isdir","isfile","getinfo","listdir","scandir","walk"):
+            setattr(fs.wrapped_fs,name,fail)
+
+    def test_queries_from_index(self):
+        self.fs.makedir("a/b",recursive=True)
+        self.fs.setcontents("a/one.txt",b("one"))
+        self.fs.setcontents("a/b/two.txt",b("two!"))
+        with self.fs.open("a/b/three.py","wb") as f:
+            f.write(b("three"))
+        #  Walking the tree indexes every directory.
+        self.assertEquals(sorted(self.fs.walkdirs()),["/","/a","/a/b"])
+        self._no_backend_queries(self.fs)
+        self.assertTrue(self.fs.exists("a/b/two.txt"))
+        self.assertFalse(self.fs.exists("a/b/four.txt"))
+        self.assertTrue(self.fs.isdir("a/b"))
+        self.assertTrue(self.fs.isfile("a/one.txt"))
+        self.assertEquals(sorted(self.fs.listdir("a")),["b","one.txt"])
+        self.assertEquals(self.fs.listdir("a",dirs_only=True),["b"])
+        self.assertEquals(self.fs.getinfo("a/b/two.txt")["size"],4)
+        self.assertEquals(self.fs.getsize("a/b/three.py"),5)
+        self.assertEquals(sorted(self.fs.walkfiles(wildcard="*.txt")),["/a/b/two.txt","/a/one.txt"])
+        self.assertEquals(sorted(self.fs.glob("a/*/t*")),["/a/b/three.py","/a/b/two.txt"])
+        self.assertEquals(self.fs.glob("/*/one.txt"),["/a/one.txt"])
+
+    def test_index_updates(self):
+        self.fs.makedir("a")
+        self.fs.setcontents("a/one.txt",b("one"))
+        self.assertEquals(self.fs.listdir("a"),["one.txt"])
+        self.fs.rename("a","b")
+        self.assertFalse(self.fs.exists("a"))
+        self.assertEquals(self.fs.listdir("b"),["one.txt"])
+        self.fs.copydir("b","c")
+        self.fs.removedir("b",force=True)
+        self.assertEquals(self.fs.listdir("/"),["c"])
+        self.assertEquals(self.fs.listdir("c"),["one.txt"])
+        self._no_backend_queries(self.fs)
+        self.assertEquals(self.fs.getsize("c/one.txt"),3)
+
+    def test_persistent_index(self):
+        (fd,index_file) = tempfile.mkstemp(u".sqlite")
+        os.close(fd)
+        try:
+            fs = IndexedFS(osfs.OSFS(self.temp_dir),index_file=index_file)
+            fs.setcontents("a.txt",b("a"))
+            self.assertEquals(fs.listdir(),["a.txt"])
+            fs.close()
+            open(os.path.join(self.temp_dir,u"b.txt"),"w").close()
+            fs = IndexedFS(osfs.OSFS(self.temp_dir),index_file=index_file)
+            try:
+                self.assertEquals(fs.listdir(),["a.txt"])
+                fs.rescan()
+                self.assertEquals(fs.listdir(),["a.txt","b.txt"])
+            finally:
+                fs.close()
+        finally:
+            os.remove(index_file)
+
+    def test_watch_events(self):
+        watched_fs = WatchableFS(osfs.OSFS(self.temp_dir))
+        fs = IndexedFS(watched_fs)
+        try:
+            self.assertEquals(fs.listdir(),[])
+            watched_fs.makedir("a")
+            watched_fs.setcontents("a/one.txt",b("one"))
+            self.assertEquals(fs.listdir(),["a"])
+            self.assertEquals(fs.getsize("a/one.txt"),3)
+            watched_fs.remove("a/one.txt")
+            self.assertFalse(fs.exists("a/one.txt"))
+        finally:
+            fs.close()
+
+    def test_positional_arguments(self):
+        self.fs.setcontents("a.txt",b("a"))
+        self.fs.setcontents("b.txt",b("b"))
+        self.fs.copy("a.txt","b.txt",True)
+        self.assertEquals(self.fs.getcontents("b.txt","rb"),b("a"))
+        self.fs.setcontents("c.txt",b("c"))
+        self.fs.move("c.txt","b.txt",True,1024)
+        self.assertEquals(self.fs.getcontents("b.txt","rb"),b("c"))
+        self.assertFalse(self.fs.exists("c.txt"))
+        self.fs.makedir("d")
+        self.fs.makedir("e")
+        self.fs.setcontents("d/f.txt",b("f"))
+        self.fs.copydir("d","e",True,False)
+        self.assertEquals(self.fs.listdir("e"),["f.txt"])
+        self.fs.movedir("d","g",False,False,1024)
+        self.assertEquals(sorted(self.fs.listdir("/")),["a.txt","b.txt","e","g"])
+        self.assertEquals(self.fs.listdir("g"),["f.txt"])
+
+    def test_rescan_interval(self):
+        fs = IndexedFS(osfs.OSFS(self.temp_dir),rescan_interval=0.01)
+        try:
+            self.assertEquals(fs.listdir(),[])
+            open(os.path.join(self.temp_dir,u"a.txt"),"w").close()
+            start_time = time.time()
+            while not fs.exists("a.txt"):
+                self.assertTrue(time.time() - start_time < 5,"not rescanned")
+                time.sleep(0.01)
+        finally:
+            fs.close()
+        self.assertFalse(fs._rescan_thread.isAlive())
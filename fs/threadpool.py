@@ -0,0 +1,215 @@
+"""
+fs.threadpool
+=============
+
+A simple pool of worker threads, used by the parts of the library that
+talk to many files at once (parallel walks, tree copies etc).
+
+The interface is a small subset of that offered by
+``multiprocessing.pool.ThreadPool``, but the implementation is pure
+threading and doesn't read ahead on the iterables it is given, so memory
+use stays bounded when mapping over a walk of a very large tree::
+
+    >>> from fs.threadpool import ThreadPool
+    >>> with ThreadPool(8) as pool:
+    ...     for path, size in pool.imap_unordered(get_size, fs.walkfiles()):
+    ...         print path, size
+
+"""
+
+from __future__ import with_statement
+
+import sys
+import Queue
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+import six
+
+
+class AsyncResult(object):
+    """The result of a call submitted to a :class:`ThreadPool`."""
+
+    def __init__(self, func, args, kwds, callback=None):
+        self._func = func
+        self._args = args
+        self._kwds = kwds
+        self._callback = callback
+        self._event = threading.Event()
+        self._value = None
+        self._exc_info = None
+        self.cancelled = False
+
+    def _run(self):
+        if not self.cancelled:
+            try:
+                self._value = self._func(*self._args, **self._kwds)
+            except Exception:
+                self._exc_info = sys.exc_info()
+        self._func = self._args = self._kwds = None
+        self._event.set()
+        if self._callback is not None:
+            self._callback(self)
+
+    def cancel(self):
+        """Prevent the call from running, if it hasn't started already."""
+        self.cancelled = True
+
+    def ready(self):
+        """Check if the call has completed."""
+        return self._event.isSet()
+
+    def successful(self):
+        """Check if the call completed without raising an exception."""
+        return self.ready() and self._exc_info is None and not self.cancelled
+
+    def wait(self, timeout=None):
+        """Block until the call has completed."""
+        self._event.wait(timeout)
+
+    def get(self, timeout=None):
+        """Return the result of the call, re-raising any exception it threw."""
+        self.wait(timeout)
+        if not self.ready():
+            raise RuntimeError("timed out waiting for result")
+        if self._exc_info is not None:
+            six.reraise(*self._exc_info)
+        return self._value
+
+
+class ThreadPool(object):
+    """A fixed-size pool of daemon worker threads.
+
+    Threads are started on demand, so creating a pool that is never used
+    costs nothing.  A pool should be closed when it is no longer needed;
+    it may also be used as a context manager.
+
+    """
+
+    def __init__(self, workers=4, name="fs.threadpool"):
+        """
+        :param workers: The maximum number of worker threads
+        :param name: A name used for the worker threads (handy in debuggers)
+
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.name = name
+        self.closed = False
+        self._tasks = Queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(wait=exc_type is None)
+
+    def _worker(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            task._run()
+
+    def _start_worker(self):
+        if len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker,
+                                      name="%s-%i" % (self.name, len(self._threads)))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def apply_async(self, func, args=(), kwds={}, callback=None):
+        """Schedule a call to `func` on a worker thread.
+
+        :param func: A callable
+        :param args: Positional arguments for `func`
+        :param kwds: Keyword arguments for `func`
+        :param callback: An optional callable that will be called from the
+            worker thread with the :class:`AsyncResult` when the call completes
+        :returns: An :class:`AsyncResult` object
+
+        """
+        with self._lock:
+            if self.closed:
+                raise ValueError("pool is closed")
+            task = AsyncResult(func, args, kwds, callback)
+            self._start_worker()
+            self._tasks.put(task)
+        return task
+
+    def _imap(self, func, iterable, ordered, max_pending=None):
+        if max_pending is None:
+            max_pending = self.workers * 2
+        done = Queue.Queue()
+        pending = []
+        try:
+            for item in iterable:
+                pending.append(self.apply_async(func, (item,), callback=done.put))
+                if len(pending) >= max_pending:
+                    if ordered:
+                        result = pending.pop(0)
+                    else:
+                        result = done.get()
+                        pending.remove(result)
+                    yield result.get()
+            while pending:
+                if ordered:
+                    result = pending.pop(0)
+                else:
+                    result = done.get()
+                    pending.remove(result)
+                yield result.get()
+        finally:
+            for result in pending:
+                result.cancel()
+
+    def imap(self, func, iterable, max_pending=None):
+        """Like the builtin `itertools.imap`, but calls are made on the pool.
+
+        Results are returned in order.  No more than `max_pending` calls
+        (twice the number of workers by default) are queued at once.
+
+        """
+        return self._imap(func, iterable, True, max_pending)
+
+    def imap_unordered(self, func, iterable, max_pending=None):
+        """Like :meth:`imap`, but results are returned as soon as they are ready."""
+        return self._imap(func, iterable, False, max_pending)
+
+    def map(self, func, iterable):
+        """Call `func` for each item in `iterable`, and return a list of the results."""
+        return list(self.imap(func, iterable))
+
+    def close(self, wait=True):
+        """Stop the worker threads.
+
+        :param wait: If True, block until all submitted calls have completed,
+            otherwise calls that haven't yet started are cancelled
+
+        """
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            if not wait:
+                while True:
+                    try:
+                        task = self._tasks.get_nowait()
+                    except Queue.Empty:
+                        break
+                    task.cancel()
+                    task._run()
+            for _thread in self._threads:
+                self._tasks.put(None)
+        if wait:
+            current = threading.currentThread()
+            for thread in self._threads:
+                if thread is not current:
+                    thread.join()
@@ -7,11 +7,14 @@ multiple Filesystems, for instance moving and copying between non-similar Filesy
 
 """
 
+from __future__ import with_statement
 
 __all__ = ['copyfile',
            'movefile',
            'movedir',
            'copydir',
+           'syncdir',
+           'TreeCopier',
            'countbytes',
            'isfile',
            'isdir',
@@ -22,44 +25,51 @@ __all__ = ['copyfile',
 import os
 import sys
 import stat
+import time
+import calendar
+import threading
+import hashlib
 import six
 from six import PY3
 
-from fs.mountfs import MountFS
-from fs.path import pathjoin
-from fs.errors import DestinationExistsError, RemoveRootError
+from fs.path import pathjoin, abspath, normpath, relpath, frombase
+from fs.errors import DestinationExistsError, RemoveRootError, ResourceNotFoundError
 from fs.base import FS
+from fs.threadpool import ThreadPool
 
 
-def copyfile(src_fs, src_path, dst_fs, dst_path, overwrite=True, chunk_size=64*1024):
-    """Copy a file from one filesystem to another. Will use system copyfile, if both files have a syspath.
-    Otherwise file will be copied a chunk at a time.
+def _copyfile(src_fs, src_path, dst_fs, dst_path, overwrite, chunk_size, move=False, lock_source=True):
+    """Copy (or move) a file, with a direct or system copy if possible.
 
-    :param src_fs: Source filesystem object
-    :param src_path: Source path
-    :param dst_fs: Destination filesystem object
-    :param dst_path: Destination path
-    :param chunk_size: Size of chunks to move if system copyfile is not available (default 64K)
+    Otherwise the file is copied a chunk at a time, with the source
+    filesystem's lock held unless `lock_source` is False.
 
     """
+    if not overwrite and dst_fs.exists(dst_path):
+        raise DestinationExistsError(dst_path)
 
     # If the src and dst fs objects are the same, then use a direct copy
     if src_fs is dst_fs:
-        src_fs.copy(src_path, dst_path, overwrite=overwrite)
+        if move:
+            src_fs.move(src_path, dst_path, overwrite=overwrite)
+        else:
+            src_fs.copy(src_path, dst_path, overwrite=overwrite, chunk_size=chunk_size)
         return
 
     src_syspath = src_fs.getsyspath(src_path, allow_none=True)
     dst_syspath = dst_fs.getsyspath(dst_path, allow_none=True)
 
-    if not overwrite and dst_fs.exists(dst_path):
-        raise DestinationExistsError(dst_path)
-
     # System copy if there are two sys paths
     if src_syspath is not None and dst_syspath is not None:
-        FS._shutil_copyfile(src_syspath, dst_syspath)
+        if move:
+            FS._shutil_movefile(src_syspath, dst_syspath)
+        else:
+            FS._shutil_copyfile(src_syspath, dst_syspath)
         return
 
-    src_lock = getattr(src_fs, '_lock', None)
+    src_lock = None
+    if lock_source:
+        src_lock = getattr(src_fs, '_lock', None)
 
     if src_lock is not None:
         src_lock.acquire()
@@ -72,11 +82,28 @@ def copyfile(src_fs, src_path, dst_fs, dst_path, overwrite=True, chunk_size=64*1
         finally:
             if src is not None:
                 src.close()
+        if move:
+            src_fs.remove(src_path)
     finally:
         if src_lock is not None:
             src_lock.release()
 
 
+def copyfile(src_fs, src_path, dst_fs, dst_path, overwrite=True, chunk_size=64*1024):
+    """Copy a file from one filesystem to another. Will use system copyfile, if both files have a syspath.
+    Otherwise file will be copied a chunk at a time.
+
+    :param src_fs: Source filesystem object
+    :param src_path: Source path
+    :param dst_fs: Destination filesystem object
+    :param dst_path: Destination path
+    :param chunk_size: Size of chunks to move if system copyfile is not available (default 64K)
+
+    """
+
+    _copyfile(src_fs, src_path, dst_fs, dst_path, overwrite, chunk_size)
+
+
 def copyfile_non_atomic(src_fs, src_path, dst_fs, dst_path, overwrite=True, chunk_size=64*1024):
     """A non atomic version of copyfile (will not block other threads using src_fs or dst_fst)
 
@@ -91,6 +118,14 @@ def copyfile_non_atomic(src_fs, src_path, dst_fs, dst_path, overwrite=True, chun
     if not overwrite and dst_fs.exists(dst_path):
         raise DestinationExistsError(dst_path)
 
+    src_syspath = src_fs.getsyspath(src_path, allow_none=True)
+    dst_syspath = dst_fs.getsyspath(dst_path, allow_none=True)
+
+    # System copy if there are two sys paths
+    if src_syspath is not None and dst_syspath is not None:
+        FS._shutil_copyfile(src_syspath, dst_syspath)
+        return
+
     src = None
     dst = None
     try:
@@ -120,42 +155,7 @@ def movefile(src_fs, src_path, dst_fs, dst_path, overwrite=True, chunk_size=64*1
     :param chunk_size: Size of chunks to move if system copyfile is not available (default 64K)
 
     """
-    src_syspath = src_fs.getsyspath(src_path, allow_none=True)
-    dst_syspath = dst_fs.getsyspath(dst_path, allow_none=True)
-
-    if not overwrite and dst_fs.exists(dst_path):
-        raise DestinationExistsError(dst_path)
-
-    if src_fs is dst_fs:
-        src_fs.move(src_path, dst_path, overwrite=overwrite)
-        return
-
-    # System copy if there are two sys paths
-    if src_syspath is not None and dst_syspath is not None:
-        FS._shutil_movefile(src_syspath, dst_syspath)
-        return
-
-    src_lock = getattr(src_fs, '_lock', None)
-
-    if src_lock is not None:
-        src_lock.acquire()
-
-    try:
-        src = None
-        try:
-            # Chunk copy
-            src = src_fs.open(src_path, 'rb')
-            dst_fs.setcontents(dst_path, src, chunk_size=chunk_size)
-        except:
-            raise
-        else:
-            src_fs.remove(src_path)
-        finally:
-            if src is not None:
-                src.close()
-    finally:
-        if src_lock is not None:
-            src_lock.release()
+    _copyfile(src_fs, src_path, dst_fs, dst_path, overwrite, chunk_size, move=True)
 
 
 def movefile_non_atomic(src_fs, src_path, dst_fs, dst_path, overwrite=True, chunk_size=64*1024):
@@ -172,6 +172,14 @@ def movefile_non_atomic(src_fs, src_path, dst_fs, dst_path, overwrite=True, chun
     if not overwrite and dst_fs.exists(dst_path):
         raise DestinationExistsError(dst_path)
 
+    src_syspath = src_fs.getsyspath(src_path, allow_none=True)
+    dst_syspath = dst_fs.getsyspath(dst_path, allow_none=True)
+
+    # System move if there are two sys paths
+    if src_syspath is not None and dst_syspath is not None:
+        FS._shutil_movefile(src_syspath, dst_syspath)
+        return
+
     src = None
     dst = None
     try:
@@ -195,7 +203,231 @@ def movefile_non_atomic(src_fs, src_path, dst_fs, dst_path, overwrite=True, chun
             dst.close()
 
 
-def movedir(fs1, fs2, create_destination=True, ignore_errors=False, chunk_size=64*1024):
+class TreeCopier(object):
+    """Copies (or moves) files and directory trees on a pool of threads.
+
+    The source is walked while files are being copied, so the first files
+    are copied without waiting for the whole tree to be scanned.  The number
+    of files copied at once is limited by `workers`, and also by a limit for
+    each filesystem involved, so that a remote server isn't flooded with
+    connections while a local copy runs at full speed::
+
+        >>> copier = TreeCopier(workers=16, remote_workers=4)
+        >>> copier.copydir(local_fs, 'photos', sftp_fs, 'backup/photos')
+
+    Filesystems that report the 'network' meta value are limited to
+    `remote_workers` concurrent copies, and those that aren't 'thread_safe'
+    are limited to a single copy at a time.  The limits may be given
+    explicitly for the source and destination filesystems with
+    `src_workers` and `dst_workers`, which override both of these defaults.
+
+    """
+
+    DIR, FILE = 0, 1
+
+    def __init__(self,
+                 workers=8,
+                 src_workers=None,
+                 dst_workers=None,
+                 remote_workers=4,
+                 move=False,
+                 overwrite=True,
+                 ignore_errors=False,
+                 chunk_size=64*1024,
+                 progress_callback=None):
+        """
+        :param workers: Maximum number of files to copy at once
+        :param src_workers: Maximum number of files to read at once from any one source filesystem
+        :param dst_workers: Maximum number of files to write at once to any one destination filesystem
+        :param remote_workers: Default limit for network filesystems
+        :param move: If True, files are removed from the source once copied
+        :param overwrite: If True, existing files in the destination are overwritten
+        :param ignore_errors: If True, files that couldn't be copied are skipped
+        :param chunk_size: Size of chunks to copy if a system copy isn't possible
+        :param progress_callback: A callable that takes two parameters; the
+            number of files copied so far, and the total number of files (or
+            None if the source is still being scanned)
+
+        """
+        self.workers = workers
+        self.src_workers = src_workers
+        self.dst_workers = dst_workers
+        self.remote_workers = remote_workers
+        self.move = move
+        self.overwrite = overwrite
+        self.ignore_errors = ignore_errors
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self._semaphores = {}
+        self._semaphores_lock = threading.Lock()
+
+    def get_limit(self, fs, is_source):
+        """Get the maximum number of files to copy at once from or to `fs`."""
+        limit = self.src_workers if is_source else self.dst_workers
+        if limit is None:
+            if not fs.getmeta('thread_safe', False):
+                limit = 1
+            elif fs.getmeta('network', False):
+                limit = self.remote_workers
+            else:
+                limit = self.workers
+        return max(1, limit)
+
+    def _get_semaphore(self, fs, is_source):
+        key = (id(fs), is_source)
+        with self._semaphores_lock:
+            try:
+                semaphore, _fs = self._semaphores[key]
+            except KeyError:
+                semaphore = threading.BoundedSemaphore(self.get_limit(fs, is_source))
+                #  Keep a reference to the FS, so its id can't be reused
+                self._semaphores[key] = (semaphore, fs)
+        return semaphore
+
+    def _copy_file(self, src_fs, src_path, dst_fs, dst_path):
+        #  The source isn't locked for the copy, so that other files can be
+        #  read from it at the same time
+        _copyfile(src_fs, src_path, dst_fs, dst_path, self.overwrite, self.chunk_size,
+                  move=self.move, lock_source=False)
+
+    def _run_task(self, task):
+        kind, src_fs, src_path, dst_fs, dst_path = task
+        if kind == self.FILE:
+            src_semaphore = self._get_semaphore(src_fs, True)
+            dst_semaphore = self._get_semaphore(dst_fs, False)
+            #  Every task acquires its source semaphore first, so they can't deadlock
+            with src_semaphore:
+                with dst_semaphore:
+                    self._copy_file(src_fs, src_path, dst_fs, dst_path)
+        return task
+
+    def tree_tasks(self, src_fs, src_path, dst_fs, dst_path):
+        """Generate the tasks needed to copy a directory tree.
+
+        :returns: An iterator of (kind, src_fs, src_path, dst_fs, dst_path)
+            tuples, where kind is either TreeCopier.DIR or TreeCopier.FILE
+
+        """
+        src_path = abspath(normpath(src_path))
+        for dir_path, file_names in src_fs.walk(src_path, ignore_errors=self.ignore_errors):
+            dst_dir_path = pathjoin(dst_path, relpath(frombase(src_path, dir_path)))
+            yield (self.DIR, src_fs, dir_path, dst_fs, dst_dir_path)
+            for name in file_names:
+                yield (self.FILE, src_fs, pathjoin(dir_path, name),
+                       dst_fs, pathjoin(dst_dir_path, name))
+
+    def icopy(self, tasks):
+        """Run an iterable of copy tasks, yielding each one as it completes.
+
+        Directory tasks are carried out (by creating the destination
+        directory) as soon as they are read from `tasks`, so they must come
+        before the tasks for the files they contain.  File tasks are run on
+        a pool of threads, and `tasks` is only read as fast as the copies
+        complete.
+
+        :param tasks: An iterable of (kind, src_fs, src_path, dst_fs, dst_path)
+            tuples, such as those generated by :meth:`tree_tasks`
+        :returns: An iterator of (task, files_done, files_total) tuples,
+            where files_total is None until all the tasks have been read
+
+        """
+        counts = {'found': 0, 'done': 0, 'scanned': False}
+
+        def prepare_tasks():
+            for task in tasks:
+                kind, _src_fs, _src_path, dst_fs, dst_path = task
+                if kind == self.DIR:
+                    try:
+                        dst_fs.makedir(dst_path, recursive=True, allow_recreate=True)
+                    except Exception:
+                        if not self.ignore_errors:
+                            raise
+                        continue
+                else:
+                    counts['found'] += 1
+                yield task
+            counts['scanned'] = True
+
+        def run_task(task):
+            try:
+                return self._run_task(task)
+            except Exception:
+                if not self.ignore_errors:
+                    raise
+                return None
+
+        pool = ThreadPool(self.workers, name="fs.utils.TreeCopier")
+        try:
+            for task in pool.imap_unordered(run_task, prepare_tasks()):
+                if task is None:
+                    continue
+                if task[0] == self.FILE:
+                    counts['done'] += 1
+                total = counts['found'] if counts['scanned'] else None
+                yield (task, counts['done'], total)
+        finally:
+            #  Don't return while files are still being written
+            pool.close()
+
+    def copy(self, tasks):
+        """Run an iterable of copy tasks.
+
+        :returns: The number of files copied
+
+        """
+        progress_callback = self.progress_callback
+        files_done = 0
+        if progress_callback is not None:
+            progress_callback(0, None)
+        for _task, files_done, files_total in self.icopy(tasks):
+            if progress_callback is not None:
+                progress_callback(files_done, files_total)
+        if progress_callback is not None:
+            progress_callback(files_done, files_done)
+        return files_done
+
+    def copydir(self, src_fs, src_path, dst_fs, dst_path):
+        """Copy (or move) the contents of a directory to another filesystem.
+
+        :returns: The number of files copied
+
+        """
+        count = self.copy(self.tree_tasks(src_fs, src_path, dst_fs, dst_path))
+        #  Files that couldn't be moved (with ignore_errors) are left in place
+        if self.move and not contains_files(src_fs, src_path):
+            src_fs.removedir(src_path, force=True)
+        return count
+
+
+def _rename_dir(src_syspath, dst_syspath):
+    """Try to move a directory with a single rename.
+
+    This only works if both paths are on the same device, and the
+    destination is missing or empty.  Returns True if the directory was moved.
+
+    """
+    if os.path.isdir(dst_syspath):
+        if os.listdir(dst_syspath):
+            return False
+    elif os.path.exists(dst_syspath):
+        return False
+    removed_dst = False
+    try:
+        if os.stat(src_syspath).st_dev != os.stat(os.path.dirname(dst_syspath.rstrip(os.sep))).st_dev:
+            return False
+        if os.path.isdir(dst_syspath) and sys.platform == "win32":
+            #  win32 won't rename over an existing directory
+            os.rmdir(dst_syspath)
+            removed_dst = True
+        os.rename(src_syspath, dst_syspath)
+    except OSError:
+        if removed_dst:
+            os.mkdir(dst_syspath)
+        return False
+    return True
+
+
+def movedir(fs1, fs2, create_destination=True, ignore_errors=False, chunk_size=64*1024, workers=1):
     """Moves contents of a directory from one filesystem to another.
 
     :param fs1: A tuple of (<filesystem>, <directory path>)
@@ -203,37 +435,39 @@ def movedir(fs1, fs2, create_destination=True, ignore_errors=False, chunk_size=6
     :param create_destination: If True, the destination will be created if it doesn't exist
     :param ignore_errors: If True, exceptions from file moves are ignored
     :param chunk_size: Size of chunks to move if a simple copy is used
+    :param workers: Number of files to move at once (see :class:`TreeCopier`)
 
     """
     if not isinstance(fs1, tuple):
         raise ValueError("first argument must be a tuple of (<filesystem>, <path>)")
 
     fs1, dir1 = fs1
-    parent_fs1 = fs1
-    parent_dir1 = dir1
-    fs1 = fs1.opendir(dir1)
-
-    if parent_dir1 in ('', '/'):
+    if dir1 in ('', '/'):
         raise RemoveRootError(dir1)
+    if not fs1.isdir(dir1):
+        raise ResourceNotFoundError(dir1)
 
+    dir2 = '/'
     if isinstance(fs2, tuple):
         fs2, dir2 = fs2
         if create_destination:
             fs2.makedir(dir2, allow_recreate=True, recursive=True)
-        fs2 = fs2.opendir(dir2)
 
-    mount_fs = MountFS(auto_close=False)
-    mount_fs.mount('src', fs1)
-    mount_fs.mount('dst', fs2)
+    # Rename the directory if both are on the same system filesystem
+    src_syspath = fs1.getsyspath(dir1, allow_none=True)
+    dst_syspath = fs2.getsyspath(dir2, allow_none=True)
+    if src_syspath is not None and dst_syspath is not None:
+        if _rename_dir(src_syspath, dst_syspath):
+            return
 
-    mount_fs.copydir('src', 'dst',
-                     overwrite=True,
-                     ignore_errors=ignore_errors,
-                     chunk_size=chunk_size)
-    parent_fs1.removedir(parent_dir1, force=True)
+    copier = TreeCopier(workers=workers,
+                        move=True,
+                        ignore_errors=ignore_errors,
+                        chunk_size=chunk_size)
+    copier.copydir(fs1, dir1, fs2, dir2)
 
 
-def copydir(fs1, fs2, create_destination=True, ignore_errors=False, chunk_size=64*1024):
+def copydir(fs1, fs2, create_destination=True, ignore_errors=False, chunk_size=64*1024, workers=1):
     """Copies contents of a directory from one filesystem to another.
 
     :param fs1: Source filesystem, or a tuple of (<filesystem>, <directory path>)
@@ -241,27 +475,25 @@ def copydir(fs1, fs2, create_destination=True, ignore_errors=False, chunk_size=6
     :param create_destination: If True, the destination will be created if it doesn't exist
     :param ignore_errors: If True, exceptions from file moves are ignored
     :param chunk_size: Size of chunks to move if a simple copy is used
+    :param workers: Number of files to copy at once (see :class:`TreeCopier`)
 
     """
+    dir1 = '/'
     if isinstance(fs1, tuple):
         fs1, dir1 = fs1
-        fs1 = fs1.opendir(dir1)
+    dir2 = '/'
     if isinstance(fs2, tuple):
         fs2, dir2 = fs2
         if create_destination:
             fs2.makedir(dir2, allow_recreate=True, recursive=True)
-        fs2 = fs2.opendir(dir2)
 
-    mount_fs = MountFS(auto_close=False)
-    mount_fs.mount('src', fs1)
-    mount_fs.mount('dst', fs2)
-    mount_fs.copydir('src', 'dst',
-                     overwrite=True,
-                     ignore_errors=ignore_errors,
-                     chunk_size=chunk_size)
+    copier = TreeCopier(workers=workers,
+                        ignore_errors=ignore_errors,
+                        chunk_size=chunk_size)
+    copier.copydir(fs1, dir1, fs2, dir2)
 
 
-def copydir_progress(progress_callback, fs1, fs2, create_destination=True, ignore_errors=False, chunk_size=64*1024):
+def copydir_progress(progress_callback, fs1, fs2, create_destination=True, ignore_errors=False, chunk_size=64*1024, workers=1):
     """
     Copies the contents of a directory from one fs to another, with a callback function to display progress.
 
@@ -271,14 +503,14 @@ def copydir_progress(progress_callback, fs1, fs2, create_destination=True, ignor
     of steps is still being calculated.
 
     """
+    dir1 = '/'
     if isinstance(fs1, tuple):
         fs1, dir1 = fs1
-        fs1 = fs1.opendir(dir1)
+    dir2 = '/'
     if isinstance(fs2, tuple):
         fs2, dir2 = fs2
         if create_destination:
             fs2.makedir(dir2, allow_recreate=True, recursive=True)
-        fs2 = fs2.opendir(dir2)
 
     def do_callback(step, num_steps):
         try:
@@ -286,29 +518,157 @@ def copydir_progress(progress_callback, fs1, fs2, create_destination=True, ignor
         except:
             pass
 
-    do_callback(0, None)
+    copier = TreeCopier(workers=workers,
+                        ignore_errors=ignore_errors,
+                        chunk_size=chunk_size,
+                        progress_callback=do_callback)
+    copier.copydir(fs1, dir1, fs2, dir2)
+
+
+def _file_hash(fs, path, chunk_size=64*1024):
+    """Get an md5 digest of the contents of a file."""
+    digest = hashlib.md5()
+    with fs.open(path, 'rb') as f:
+        chunk = f.read(chunk_size)
+        while chunk:
+            digest.update(chunk)
+            chunk = f.read(chunk_size)
+    return digest.digest()
+
+
+def _sync_timestamp(mtime):
+    """Convert a modified_time from an info dict to seconds since the epoch.
+
+    Naive datetimes are in local time (as returned by
+    ``datetime.fromtimestamp``), so that times from different filesystems
+    can be compared.
+
+    """
+    if mtime is None:
+        return None
+    if mtime.tzinfo is not None and mtime.utcoffset() is not None:
+        return calendar.timegm(mtime.utctimetuple()) + mtime.microsecond / 1e6
+    return time.mktime(mtime.timetuple()) + mtime.microsecond / 1e6
+
+
+def _sync_file_changed(compare, src_fs, src_entry, dst_fs, dst_entry, chunk_size):
+    """Check if a file needs to be copied by syncdir."""
+    src_info = src_entry.getinfo()
+    dst_info = dst_entry.getinfo()
+    src_size = src_info.get('size')
+    if src_size is None or src_size != dst_info.get('size'):
+        return True
+    if compare == 'size+mtime':
+        #  Files are written after they have been modified in the source,
+        #  so the copy should be no older (modification times can't be set
+        #  on every filesystem).  A file without a modification time on
+        #  either side can't be shown to be up to date, so it is copied.
+        src_mtime = _sync_timestamp(src_info.get('modified_time'))
+        dst_mtime = _sync_timestamp(dst_info.get('modified_time'))
+        if src_mtime is None or dst_mtime is None:
+            return True
+        return dst_mtime < src_mtime
+    elif compare == 'hash':
+        return (_file_hash(src_fs, src_entry.path, chunk_size) !=
+                _file_hash(dst_fs, dst_entry.path, chunk_size))
+    return False
+
+
+def syncdir(fs1, fs2, compare='size+mtime', delete=False, ignore_errors=False, chunk_size=64*1024, workers=1):
+    """Brings the contents of a directory in one filesystem up to date with another.
+
+    Only files that are new or have changed are copied, so a sync of a
+    mostly unchanged tree is much cheaper than a copy.  Files are compared
+    using the info from the directory listings of both filesystems:
 
-    file_count = 0
-    copy_paths = []
-    for dir_path, file_paths in fs1.walk():
-        copy_paths.append((dir_path, file_paths))
-        file_count += len(file_paths)
-        do_callback(0, file_count)
+        * ``"size+mtime"`` copies a file if its size has changed, or if it
+          was modified after the copy in the destination (or either file
+          has no modification time)
+        * ``"size"`` only copies a file if its size has changed
+        * ``"hash"`` also compares the contents of files of the same size
 
-    step = 0
-    for i, (dir_path, file_paths) in enumerate(copy_paths):
+    :param fs1: Source filesystem, or a tuple of (<filesystem>, <directory path>)
+    :param fs2: Destination filesystem, or a tuple of (<filesystem>, <directory path>)
+    :param compare: How files are compared; one of "size+mtime", "size" or "hash"
+    :param delete: If True, files and directories in the destination that don't exist in the source are deleted
+    :param ignore_errors: If True, files that couldn't be copied are skipped
+    :param chunk_size: Size of chunks to copy if a simple copy is used
+    :param workers: Number of files to copy at once (see :class:`TreeCopier`)
+    :returns: a dict with the list of destination paths that were 'copied',
+        the list of destination paths that were 'deleted', and the number
+        of files that were 'unchanged'
+
+    """
+    if compare not in ('size+mtime', 'size', 'hash'):
+        raise ValueError("compare should be 'size+mtime', 'size' or 'hash'")
+    dir1 = '/'
+    if isinstance(fs1, tuple):
+        fs1, dir1 = fs1
+    dir2 = '/'
+    if isinstance(fs2, tuple):
+        fs2, dir2 = fs2
+    if not fs1.isdir(dir1):
+        raise ResourceNotFoundError(dir1)
+
+    summary = {'copied': [], 'deleted': [], 'unchanged': 0}
+    DIR, FILE = TreeCopier.DIR, TreeCopier.FILE
+
+    def scandir(fs, path):
         try:
-            fs2.makedir(dir_path, allow_recreate=True)
-            for path in file_paths:
-                copy_path = pathjoin(dir_path, path)
-                with fs1.open(copy_path, 'rb') as src_file:
-                    fs2.setcontents(copy_path, src_file, chunk_size=chunk_size)
-                step += 1
-        except:
-            if ignore_errors:
-                continue
-            raise
-        do_callback(step, file_count)
+            return dict((entry.name, entry) for entry in fs.scandir(path))
+        except ResourceNotFoundError:
+            return {}
+
+    def delete_entry(entry):
+        if entry.is_dir():
+            fs2.removedir(entry.path, force=True)
+        else:
+            fs2.remove(entry.path)
+        summary['deleted'].append(entry.path)
+
+    def sync_tasks():
+        dirs = [(abspath(normpath(dir1)), abspath(normpath(dir2)))]
+        while dirs:
+            src_dir, dst_dir = dirs.pop()
+            src_entries = scandir(fs1, src_dir)
+            dst_entries = scandir(fs2, dst_dir)
+            yield (DIR, fs1, src_dir, fs2, dst_dir)
+            for name, src_entry in src_entries.iteritems():
+                dst_entry = dst_entries.pop(name, None)
+                dst_path = pathjoin(dst_dir, name)
+                try:
+                    if dst_entry is not None and dst_entry.is_dir() != src_entry.is_dir():
+                        #  A file has replaced a directory, or vice versa
+                        delete_entry(dst_entry)
+                        dst_entry = None
+                    if src_entry.is_dir():
+                        dirs.append((src_entry.path, dst_path))
+                    elif dst_entry is None or _sync_file_changed(compare, fs1, src_entry,
+                                                                 fs2, dst_entry, chunk_size):
+                        yield (FILE, fs1, src_entry.path, fs2, dst_path)
+                    else:
+                        summary['unchanged'] += 1
+                except ResourceNotFoundError:
+                    #  Could happen if another thread / process deletes something whilst we are syncing
+                    continue
+                except Exception:
+                    if not ignore_errors:
+                        raise
+            if delete:
+                for dst_entry in dst_entries.itervalues():
+                    try:
+                        delete_entry(dst_entry)
+                    except Exception:
+                        if not ignore_errors:
+                            raise
+
+    copier = TreeCopier(workers=workers,
+                        ignore_errors=ignore_errors,
+                        chunk_size=chunk_size)
+    for task, _files_done, _files_total in copier.icopy(sync_tasks()):
+        if task[0] == FILE:
+            summary['copied'].append(task[4])
+    return summary
 
 
 def remove_all(fs, path):
@@ -346,7 +706,12 @@ def countbytes(fs):
     :param fs: A filesystem object
 
     """
-    total = sum(fs.getsize(f) for f in fs.walkfiles())
+    total = 0
+    for path, info in fs.walkfilesinfo():
+        size = info.get('size')
+        if size is None:
+            size = fs.getsize(path)
+        total += size
     return total
 
 
@@ -417,14 +782,19 @@ def find_duplicates(fs,
     from collections import defaultdict
     from zlib import crc32
 
-    if compare_paths is None:
-        compare_paths = fs.walkfiles()
-
     # Create a dictionary that maps file sizes on to the paths of files with
     # that filesize. So we can find files of the same size with a quick lookup
     file_sizes = defaultdict(list)
-    for path in compare_paths:
-        file_sizes[fs.getsize(path)].append(path)
+    if compare_paths is None:
+        # The sizes can usually be read from the listings made by the walk
+        for path, info in fs.walkfilesinfo():
+            size = info.get('size')
+            if size is None:
+                size = fs.getsize(path)
+            file_sizes[size].append(path)
+    else:
+        for path in compare_paths:
+            file_sizes[fs.getsize(path)].append(path)
 
     size_duplicates = [paths for paths in file_sizes.itervalues() if len(paths) > 1]
 
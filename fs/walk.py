@@ -0,0 +1,189 @@
+"""
+fs.walk
+=======
+
+Walk directory trees using a pool of worker threads.
+
+The :meth:`~fs.base.FS.walk` method lists one directory at a time, so on a
+network filesystem the time taken to walk a tree is dominated by the round
+trip for each listing.  A :class:`ParallelWalker` lists many directories at
+once, and yields results as they arrive::
+
+    >>> from fs.walk import ParallelWalker
+    >>> walker = ParallelWalker(sftp_fs, workers=16)
+    >>> for path in walker.walkfiles('/photos', wildcard='*.jpg'):
+    ...     print path
+
+The methods of ParallelWalker take the same arguments as the equivalent FS
+methods.  The 'breadth' search still yields a directory before any of its
+sub-directories, and the 'depth' search still yields every sub-directory
+before the directory that contains it, but the order of sibling directories
+is not defined.
+
+Note that an FS object that serializes its methods on a single lock (most
+do, unless they were created with ``thread_synchronize=False``) will not
+list directories concurrently, although a walk may still benefit from
+listing the next directories while the caller handles the previous ones.
+
+"""
+
+from __future__ import with_statement
+
+import re
+import fnmatch
+import Queue
+
+from fs.path import normpath, pathcombine
+from fs.errors import ResourceNotFoundError
+from fs.threadpool import ThreadPool
+
+
+def _make_matcher(wildcard):
+    if wildcard is None:
+        return lambda name: True
+    if callable(wildcard):
+        return wildcard
+    wildcard_re = re.compile(fnmatch.translate(wildcard))
+    return lambda name: bool(wildcard_re.match(name))
+
+
+class ParallelWalker(object):
+    """Walks the directories of an FS object on a pool of threads."""
+
+    def __init__(self, fs, workers=8):
+        """
+        :param fs: The FS object to walk
+        :param workers: The maximum number of directories to list at once
+
+        """
+        self.fs = fs
+        self.workers = workers
+
+    def _scan(self, path, parent, ignore_errors):
+        """List a single directory, returning its sub-directories and files."""
+        fs = self.fs
+        dirs, files = [], []
+        try:
+            for entry in fs.scandir(path):
+                if entry.is_dir():
+                    dirs.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+        except ResourceNotFoundError:
+            # Could happen if another thread / process deletes something whilst we are walking
+            dirs, files = [], []
+        except Exception:
+            if not ignore_errors:
+                raise
+            dirs, files = [], []
+        return path, parent, dirs, files
+
+    def walk(self,
+             path="/",
+             wildcard=None,
+             dir_wildcard=None,
+             search="breadth",
+             ignore_errors=False):
+        """Walks a directory tree and yields the root path and contents.
+
+        See :meth:`fs.base.FS.walk` for a description of the parameters.
+
+        :rtype: iterator of (current_path, paths)
+
+        """
+        path = normpath(path)
+        if search not in ("breadth", "depth"):
+            raise ValueError("Search should be 'breadth' or 'depth'")
+        if not self.fs.exists(path):
+            raise ResourceNotFoundError(path)
+
+        wildcard = _make_matcher(wildcard)
+        dir_wildcard = _make_matcher(dir_wildcard)
+        depth_first = search == "depth"
+
+        pool = ThreadPool(self.workers, name="fs.walk")
+        done = Queue.Queue()
+
+        def submit(dir_path, parent):
+            pool.apply_async(self._scan,
+                             (dir_path, parent, ignore_errors),
+                             callback=done.put)
+
+        #  For a depth-first search, maps a directory path on to a list of
+        #  [number of sub-directories still to be yielded, files, parent]
+        waiting = {}
+        outstanding = 1
+        try:
+            submit(path, None)
+            while outstanding:
+                dir_path, parent, dirs, files = done.get().get()
+                outstanding -= 1
+                files = [f for f in files if wildcard(f)]
+                if not depth_first:
+                    for name in dirs:
+                        sub_path = pathcombine(dir_path, name)
+                        #  Breadth-first searches match dir_wildcard on the full path
+                        if dir_wildcard(sub_path):
+                            submit(sub_path, dir_path)
+                            outstanding += 1
+                    yield (dir_path, files)
+                    continue
+
+                sub_paths = [pathcombine(dir_path, name)
+                             for name in dirs if dir_wildcard(name)]
+                for sub_path in sub_paths:
+                    submit(sub_path, dir_path)
+                outstanding += len(sub_paths)
+                waiting[dir_path] = [len(sub_paths), files, parent]
+                if sub_paths:
+                    continue
+                #  This is a leaf, so yield it along with any ancestors
+                #  that were only waiting for it
+                ready_path = dir_path
+                while ready_path is not None:
+                    _count, ready_files, ready_parent = waiting.pop(ready_path)
+                    yield (ready_path, ready_files)
+                    if ready_parent is None:
+                        break
+                    parent_state = waiting[ready_parent]
+                    parent_state[0] -= 1
+                    if parent_state[0]:
+                        break
+                    ready_path = ready_parent
+        finally:
+            pool.close(wait=False)
+
+    def walkfiles(self,
+                  path="/",
+                  wildcard=None,
+                  dir_wildcard=None,
+                  search="breadth",
+                  ignore_errors=False):
+        """Like the 'walk' method, but just yields file paths.
+
+        :rtype: iterator of file paths
+
+        """
+        for dir_path, files in self.walk(path,
+                                         wildcard=wildcard,
+                                         dir_wildcard=dir_wildcard,
+                                         search=search,
+                                         ignore_errors=ignore_errors):
+            for f in files:
+                yield pathcombine(dir_path, f)
+
+    def walkdirs(self,
+                 path="/",
+                 wildcard=None,
+                 search="breadth",
+                 ignore_errors=False):
+        """Like the 'walk' method but yields directories.
+
+        :rtype: iterator of dir paths
+
+        """
+        for dir_path, _files in self.walk(path,
+                                          dir_wildcard=wildcard,
+                                          search=search,
+                                          ignore_errors=ignore_errors):
+            yield dir_path
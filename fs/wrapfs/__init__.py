@@ -20,7 +20,9 @@ import sys
 import fnmatch
 import threading
 
-from fs.base import FS, threading, synchronize, NoDefaultMeta
+import six
+
+from fs.base import FS, ScandirEntry, threading, synchronize, NoDefaultMeta
 from fs.errors import *
 from fs.path import *
 from fs.local_functools import wraps
@@ -42,6 +44,14 @@ def rewrite_errors(func):
     return wrapper
 
 
+def _overrides(cls, method_name):
+    """Check whether a WrapFS subclass overrides the named method."""
+    #  On Python 2 each attribute lookup on a class creates a new unbound
+    #  method object, so compare the underlying functions.
+    method = six.get_unbound_function(getattr(cls, method_name))
+    return method is not six.get_unbound_function(getattr(WrapFS, method_name))
+
+
 class WrapFS(FS):
     """FS that wraps another FS, providing translation etc.
 
@@ -290,6 +300,24 @@ class WrapFS(FS):
                 nm = abspath(pathcombine(path,nm))
             yield (nm,info)
 
+    @rewrite_errors
+    def scandir(self, path=""):
+        #  If a subclass filters the listing or modifies the info dicts,
+        #  then the entries from the wrapped FS can't be used directly.
+        if _overrides(self.__class__, 'listdir'):
+            return super(WrapFS, self).scandir(path)
+        keep_info = not _overrides(self.__class__, 'getinfo')
+        path = normpath(path)
+        enc_path = self._encode(path)
+        entries = []
+        for e in self.wrapped_fs.scandir(enc_path):
+            nm = basename(self._decode(pathcombine(enc_path,e.name)))
+            info = None
+            if keep_info and e.has_info:
+                info = e.getinfo()
+            entries.append(ScandirEntry(self, path, nm, e.is_dir(), e.is_file(), info))
+        return iter(entries)
+
     @rewrite_errors
     def walk(self,path="/",wildcard=None,dir_wildcard=None,search="breadth",ignore_errors=False):
         if dir_wildcard is not None:
@@ -474,6 +502,6 @@ wrap_fs_methods.method_names = ["open","exists","isdir","isfile","listdir",
     "makedir","remove","setcontents","removedir","rename","getinfo","copy",
     "move","copydir","movedir","close","getxattr","setxattr","delxattr",
     "listxattrs","validatepath","getsyspath","createfile", "hasmeta", "getmeta","listdirinfo",
-    "ilistdir","ilistdirinfo"]
+    "ilistdir","ilistdirinfo","scandir"]
 
 
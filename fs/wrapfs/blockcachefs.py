@@ -0,0 +1,339 @@
+"""
+fs.wrapfs.blockcachefs
+======================
+
+An FS wrapper class that caches file contents in a local directory.
+
+This module provides the class BlockCacheFS, an FS wrapper that keeps the
+contents of files read from the wrapped FS in a local cache FS.  Files are
+cached in fixed-size blocks, so reading part of a large remote file only
+fetches (and stores) the blocks that contain the requested data.  The total
+size of the cache is bounded, with the least-recently-used blocks evicted
+first.
+
+Blocks are keyed by the path of the file along with its size and its ETag or
+modification time, so a file that is changed in the wrapped FS will not be
+served from stale blocks.  Modifications made through the wrapper itself
+discard the blocks of the files involved straight away.
+
+"""
+
+from __future__ import with_statement
+
+import re
+import hashlib
+import threading
+
+from fs.errors import *
+from fs.path import *
+from fs.wrapfs import WrapFS, rewrite_errors
+from fs.filelike import FileLikeBase
+from fs.local_collections import OrderedDict
+from fs import iotools
+
+
+_BLOCK_NAME_RE = re.compile(r"^([0-9a-f]{32})\.(\d+)$")
+_PATH_NAME_RE = re.compile(r"^([0-9a-f]{32})\.path$")
+
+
+class BlockCacheFile(FileLikeBase):
+    """Read-only file object whose contents are served from the block cache.
+
+    Blocks that aren't in the cache are read from a file opened on the
+    wrapped FS, which is only opened when it is first needed.
+    """
+
+    def __init__(self, fs, path, key, size, src_file=None):
+        super(BlockCacheFile, self).__init__()
+        self.fs = fs
+        self.path = path
+        self.key = key
+        self.size = size
+        self.mode = "r"
+        self._src_file = src_file
+        self._pos = 0
+
+    def _fetch_block(self, index):
+        """Read the given block from the file in the wrapped FS."""
+        if self._src_file is None:
+            self._src_file = self.fs.wrapped_fs.open(self.fs._encode(self.path), "rb")
+        block_size = self.fs.block_size
+        self._src_file.seek(index * block_size)
+        chunks = []
+        remaining = block_size
+        while remaining:
+            chunk = self._src_file.read(remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def _read(self, sizehint=-1):
+        if self._pos >= self.size:
+            return None
+        (index, offset) = divmod(self._pos, self.fs.block_size)
+        data = self.fs._get_block(self, index)[offset:]
+        if not data:
+            #  The file has shrunk since it was opened.
+            return None
+        self._pos += len(data)
+        return data
+
+    def _seek(self, offset, whence):
+        if whence == 1:
+            offset = self._pos + offset
+        elif whence == 2:
+            offset = self.size + offset
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+
+    def _tell(self):
+        return self._pos
+
+    def close(self):
+        super(BlockCacheFile, self).close()
+        if self._src_file is not None:
+            self._src_file.close()
+            self._src_file = None
+
+
+class BlockCacheFS(WrapFS):
+    """FS wrapper that caches file contents in fixed-size blocks.
+
+    :param fs: the FS to wrap
+    :param cache_fs: FS in which to store cached blocks, e.g. an OSFS on a
+        local disk; if not given, a TempFS is created (and removed again
+        when this FS is closed).  Blocks already in the cache FS are reused,
+        so the cache FS should be dedicated to a single wrapped FS.
+    :param block_size: size in bytes of each cached block
+    :param max_size: maximum total size in bytes of the cached blocks
+
+    Only files opened for reading are served from the cache.  Files without
+    a modification time or ETag in their info are never cached.
+    """
+
+    def __init__(self, fs, cache_fs=None, block_size=1024*1024, max_size=256*1024*1024):
+        super(BlockCacheFS, self).__init__(fs)
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        self._owns_cache_fs = cache_fs is None
+        if cache_fs is None:
+            from fs.tempfs import TempFS
+            cache_fs = TempFS(u"fsblockcache")
+        self.cache_fs = cache_fs
+        self.block_size = block_size
+        self.max_size = max_size
+        self._init_index()
+
+    def __getstate__(self):
+        state = super(BlockCacheFS, self).__getstate__()
+        for attr in ("_cache_lock", "_blocks", "_key_blocks", "_path_keys", "cur_size"):
+            del state[attr]
+        return state
+
+    def __setstate__(self, state):
+        super(BlockCacheFS, self).__setstate__(state)
+        self._init_index()
+
+    def _init_index(self):
+        """Build the LRU index from the blocks already in the cache FS."""
+        self._cache_lock = threading.Lock()
+        #  Maps block name => (key, size), least-recently-used first
+        self._blocks = OrderedDict()
+        #  Maps key => set of block names
+        self._key_blocks = {}
+        #  Maps path => set of keys, for invalidating modified files
+        self._path_keys = PathMap()
+        self.cur_size = 0
+        existing = []
+        path_names = {}
+        for (name, info) in self.cache_fs.listdirinfo(files_only=True):
+            match = _PATH_NAME_RE.match(name)
+            if match is not None:
+                path_names[match.group(1)] = name
+                continue
+            match = _BLOCK_NAME_RE.match(name)
+            if match is None:
+                continue
+            atime = info.get("accessed_time") or info.get("modified_time")
+            existing.append((atime, name, match.group(1), info.get("size", 0)))
+        existing.sort()
+        with self._cache_lock:
+            for (atime, name, key, size) in existing:
+                self._add_block(name, key, size)
+            for (key, name) in path_names.iteritems():
+                if key in self._key_blocks:
+                    try:
+                        path = self.cache_fs.getcontents(name, "rb").decode("utf-8")
+                    except ResourceNotFoundError:
+                        continue
+                    self._path_keys.setdefault(path, set()).add(key)
+                else:
+                    self._remove_cache_file(name)
+            self._evict()
+
+    def _get_cache_key(self, path, info):
+        """Get the key identifying the current contents of a file.
+
+        Returns None if the file's info doesn't contain enough to tell
+        whether it has been changed.
+        """
+        size = info.get("size")
+        if size is None:
+            return None
+        version = info.get("etag")
+        if version is None:
+            version = info.get("modified_time")
+            if version is None:
+                return None
+            version = version.isoformat()
+        key = u"%s\0%d\0%s" % (abspath(normpath(path)), size, version)
+        return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+    def _add_block(self, name, key, size):
+        self._blocks[name] = (key, size)
+        self._key_blocks.setdefault(key, set()).add(name)
+        self.cur_size += size
+
+    def _remove_block(self, name):
+        (key, size) = self._blocks.pop(name)
+        names = self._key_blocks[key]
+        names.discard(name)
+        if not names:
+            del self._key_blocks[key]
+            self._remove_cache_file(key + ".path")
+        self.cur_size -= size
+        self._remove_cache_file(name)
+
+    def _remove_cache_file(self, name):
+        try:
+            self.cache_fs.remove(name)
+        except ResourceNotFoundError:
+            pass
+
+    def _evict(self):
+        """Remove least-recently-used blocks until the cache fits max_size."""
+        while self.cur_size > self.max_size and self._blocks:
+            self._remove_block(next(iter(self._blocks)))
+
+    def _get_block(self, f, index):
+        """Get the data of a block of the given BlockCacheFile."""
+        name = "%s.%d" % (f.key, index)
+        expected_size = max(0, min(self.block_size, f.size - index * self.block_size))
+        with self._cache_lock:
+            entry = self._blocks.pop(name, None)
+            if entry is not None:
+                self._blocks[name] = entry
+        if entry is not None:
+            try:
+                data = self.cache_fs.getcontents(name, "rb")
+            except ResourceNotFoundError:
+                data = None
+            if data is not None and len(data) == expected_size:
+                return data
+            with self._cache_lock:
+                if name in self._blocks:
+                    self._remove_block(name)
+        data = f._fetch_block(index)
+        #  A short block means the file changed since it was opened, so
+        #  what was read can't be trusted to match the key.
+        if len(data) == expected_size and expected_size <= self.max_size:
+            with self._cache_lock:
+                new_key = f.key not in self._key_blocks
+            if new_key:
+                #  Record the path of the file alongside its blocks, so they
+                #  can still be invalidated when the cache FS is reused.
+                self.cache_fs.setcontents(f.key + ".path", f.path.encode("utf-8"))
+            self.cache_fs.setcontents(name, data)
+            with self._cache_lock:
+                if name in self._blocks:
+                    self._blocks[name] = self._blocks.pop(name)
+                else:
+                    self._add_block(name, f.key, len(data))
+                self._path_keys.setdefault(f.path, set()).add(f.key)
+                self._evict()
+        return data
+
+    def _invalidate(self, path):
+        """Discard cached blocks for the given path and anything below it."""
+        path = abspath(normpath(path))
+        with self._cache_lock:
+            for keys in self._path_keys.values(path):
+                for key in keys:
+                    for name in list(self._key_blocks.get(key, ())):
+                        self._remove_block(name)
+            self._path_keys.clear(path)
+
+    def clear_cache(self):
+        """Remove all blocks from the cache."""
+        with self._cache_lock:
+            for name in list(self._blocks):
+                self._remove_block(name)
+            self._path_keys = PathMap()
+
+    @rewrite_errors
+    def open(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None, line_buffering=False, **kwargs):
+        path = abspath(normpath(path))
+        if "r" not in mode or "+" in mode or "w" in mode or "a" in mode:
+            self._invalidate(path)
+            return super(BlockCacheFS, self).open(path, mode, buffering=buffering, encoding=encoding, errors=errors, newline=newline, line_buffering=line_buffering, **kwargs)
+        info = self.wrapped_fs.getinfo(self._encode(path))
+        key = self._get_cache_key(path, info)
+        if key is None:
+            return super(BlockCacheFS, self).open(path, mode, buffering=buffering, encoding=encoding, errors=errors, newline=newline, line_buffering=line_buffering, **kwargs)
+        src_file = None
+        with self._cache_lock:
+            cached = key in self._key_blocks
+        if not cached:
+            #  Opening the source file straight away gives the usual errors
+            #  for directories etc, and it will be needed anyway.
+            src_file = self.wrapped_fs.open(self._encode(path), "rb")
+        f = BlockCacheFile(self, path, key, info["size"], src_file)
+        return iotools.make_stream(path, f, mode=mode, buffering=buffering, encoding=encoding, errors=errors, newline=newline, line_buffering=line_buffering)
+
+    def setcontents(self, path, data=b'', encoding=None, errors=None, chunk_size=64*1024):
+        self._invalidate(path)
+        return super(BlockCacheFS, self).setcontents(path, data, encoding=encoding, errors=errors, chunk_size=chunk_size)
+
+    def createfile(self, path, wipe=False):
+        self._invalidate(path)
+        return super(BlockCacheFS, self).createfile(path, wipe=wipe)
+
+    def remove(self, path):
+        self._invalidate(path)
+        return super(BlockCacheFS, self).remove(path)
+
+    def removedir(self, path, *args, **kwds):
+        self._invalidate(path)
+        return super(BlockCacheFS, self).removedir(path, *args, **kwds)
+
+    def rename(self, src, dst):
+        self._invalidate(src)
+        self._invalidate(dst)
+        return super(BlockCacheFS, self).rename(src, dst)
+
+    def copy(self, src, dst, **kwds):
+        self._invalidate(dst)
+        return super(BlockCacheFS, self).copy(src, dst, **kwds)
+
+    def move(self, src, dst, **kwds):
+        self._invalidate(src)
+        self._invalidate(dst)
+        return super(BlockCacheFS, self).move(src, dst, **kwds)
+
+    def copydir(self, src, dst, **kwds):
+        self._invalidate(dst)
+        return super(BlockCacheFS, self).copydir(src, dst, **kwds)
+
+    def movedir(self, src, dst, **kwds):
+        self._invalidate(src)
+        self._invalidate(dst)
+        return super(BlockCacheFS, self).movedir(src, dst, **kwds)
+
+    def close(self):
+        if not self.closed:
+            if self._owns_cache_fs:
+                self.cache_fs.close()
+            super(BlockCacheFS, self).close()
@@ -0,0 +1,622 @@
+"""
+fs.wrapfs.indexedfs
+===================
+
+An FS wrapper class that answers queries about paths from an on-disk index.
+
+This module provides the class IndexedFS, an FS wrapper that keeps an index
+of the paths in the wrapped FS, along with their sizes, modification times
+and info dicts, in an SQLite database.  The index is laid out as a trie in
+the same way as a PathMap: each row holds a single path component and refers
+to the row of its parent directory.  Once a directory has been indexed,
+exists(), isdir(), isfile(), getinfo(), listdir(), walk() and glob() queries
+on its contents are answered without touching the wrapped FS, which makes
+them much cheaper for large trees on slow or remote filesystems.
+
+Directories are indexed the first time they are needed.  Changes made
+through the wrapper update the index straight away; changes made by other
+means are picked up from the wrapped FS's change events (see fs.watch) if it
+supports them, or by calling rescan(), optionally at a regular interval.
+
+The index queries use recursive common table expressions, which need SQLite
+3.8.3 or later (see sqlite3.sqlite_version).
+
+"""
+
+from __future__ import with_statement
+
+import re
+import time
+import sqlite3
+import threading
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from fs.errors import *
+from fs.path import *
+from fs.base import FS, ScandirEntry
+from fs.wrapfs import WrapFS, rewrite_errors
+from fs.filelike import FileWrapper
+from fs.watch import CREATED, REMOVED, MODIFIED, MOVED_SRC, MOVED_DST, OVERFLOW
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS paths (
+    id INTEGER PRIMARY KEY,
+    parent INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    scanned INTEGER NOT NULL DEFAULT 0,
+    size INTEGER,
+    modified_time REAL,
+    info BLOB,
+    UNIQUE (parent, name)
+);
+INSERT OR IGNORE INTO paths (id, parent, name, is_dir) VALUES (1, 0, '', 1);
+"""
+
+_ROOT_ID = 1
+
+#  Rows are selected as (id, is_dir, scanned, size, info) tuples.
+_ROW_COLUMNS = "id, is_dir, scanned, size, info"
+
+#  Prefix for statements that operate on a row and everything below it.
+_SUBTREE = """WITH RECURSIVE subtree(id) AS (
+    SELECT ? UNION ALL
+    SELECT paths.id FROM paths JOIN subtree ON paths.parent = subtree.id)
+"""
+
+_WILDCARD_RE = re.compile(r"[*?[]")
+
+
+def _timestamp(dt):
+    """Convert a datetime to seconds since the epoch."""
+    try:
+        return time.mktime(dt.timetuple()) + dt.microsecond / 1000000.0
+    except AttributeError:
+        return None
+
+
+def _info_values(info):
+    """Get the (size, modified_time, info) column values for an info dict."""
+    if info is None:
+        return (None, None, None)
+    mtime = info.get("modified_time")
+    if mtime is not None:
+        mtime = _timestamp(mtime)
+    try:
+        data = sqlite3.Binary(pickle.dumps(info, pickle.HIGHEST_PROTOCOL))
+    except (pickle.PicklingError, TypeError):
+        #  getinfo() will fetch it from the wrapped FS instead.
+        data = None
+    return (info.get("size"), mtime, data)
+
+
+class IndexedScandirEntry(ScandirEntry):
+    """ScandirEntry whose info dict is loaded from the index on demand."""
+
+    def __init__(self, fs, dir_path, name, isdir, data):
+        super(IndexedScandirEntry, self).__init__(fs, dir_path, name, isdir)
+        self._data = data
+
+    @property
+    def has_info(self):
+        return self._info is not None or self._data is not None
+
+    def _load_info(self):
+        if self._data is not None:
+            return pickle.loads(bytes(self._data))
+        return super(IndexedScandirEntry, self)._load_info()
+
+
+class IndexedFile(FileWrapper):
+    """File wrapper that updates the index of an IndexedFS when the file is
+    flushed or closed after being modified."""
+
+    def __init__(self, file, fs, path, mode=None):
+        super(IndexedFile, self).__init__(file, mode)
+        self.fs = fs
+        self.path = path
+        self.was_modified = False
+
+    def _write(self, string, flushing=False):
+        self.was_modified = True
+        return super(IndexedFile, self)._write(string, flushing=flushing)
+
+    def _truncate(self, size):
+        self.was_modified = True
+        return super(IndexedFile, self)._truncate(size)
+
+    def flush(self):
+        super(IndexedFile, self).flush()
+        if self.was_modified:
+            self.fs._refresh(self.path)
+
+    def close(self):
+        super(IndexedFile, self).close()
+        if self.was_modified:
+            self.fs._refresh(self.path)
+
+
+class IndexedFS(WrapFS):
+    """FS wrapper that answers path queries from an index of the wrapped FS.
+
+    :param fs: the FS to wrap
+    :param index_file: file in which to store the index, so that it can be
+        reused the next time the wrapped FS is opened; if not given, the
+        index is kept in memory
+    :param rescan_interval: if given, the number of seconds between rescans
+        of the indexed directories by a background thread
+    :param watch: if True (the default) and the wrapped FS supports
+        add_watcher(), use its change events to keep the index up to date
+
+    An existing index file is used as it is; call rescan() to pick up any
+    changes made to the wrapped FS while it wasn't in use.  Names are
+    matched exactly, so the wrapped FS should be case-sensitive.
+    """
+
+    def __init__(self, fs, index_file=None, rescan_interval=None, watch=True):
+        super(IndexedFS, self).__init__(fs)
+        self.index_file = index_file
+        self.rescan_interval = rescan_interval
+        self.watch = watch
+        self._init_index()
+
+    def __getstate__(self):
+        state = super(IndexedFS, self).__getstate__()
+        for attr in ("_index_lock", "_conn", "_watchers", "_rescan_thread", "_rescan_close_event"):
+            del state[attr]
+        return state
+
+    def __setstate__(self, state):
+        super(IndexedFS, self).__setstate__(state)
+        self._init_index()
+
+    def _init_index(self):
+        """Open the index and start keeping it up to date."""
+        self._index_lock = threading.RLock()
+        self._conn = sqlite3.connect(self.index_file or ":memory:", check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._watchers = []
+        if self.watch:
+            try:
+                add_watcher = self.wrapped_fs.add_watcher
+                self._watchers.append(add_watcher(self._on_path_modify, "/", (CREATED, MODIFIED, MOVED_DST)))
+                self._watchers.append(add_watcher(self._on_path_delete, "/", (REMOVED, MOVED_SRC)))
+                self._watchers.append(add_watcher(self._on_overflow, "/", (OVERFLOW,)))
+            except (AttributeError, UnsupportedError):
+                pass
+        self._rescan_close_event = threading.Event()
+        self._rescan_thread = None
+        if self.rescan_interval is not None:
+            self._rescan_thread = threading.Thread(target=self._rescan_periodically)
+            self._rescan_thread.daemon = True
+            self._rescan_thread.start()
+
+    def _on_path_modify(self, event):
+        #  A directory that has been created or moved into place may already
+        #  have contents, so anything indexed below it is discarded.
+        self._refresh(self._decode(event.path), not isinstance(event, MODIFIED))
+
+    def _on_path_delete(self, event):
+        self._refresh(self._decode(event.path))
+
+    def _on_overflow(self, event):
+        #  Some changes have been missed, so list every directory again
+        #  when it's next needed.
+        with self._index_lock:
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("UPDATE paths SET scanned = 0")
+
+    def _rescan_periodically(self):
+        #  Event.wait() always returns None before Python 2.7.
+        close_event = self._rescan_close_event
+        while True:
+            close_event.wait(self.rescan_interval)
+            if close_event.isSet():
+                break
+            try:
+                self.rescan()
+            except FSError:
+                #  Try again at the next interval.
+                pass
+
+    def _find(self, path):
+        """Find the index row for the given path, without listing anything
+        in the wrapped FS; returns None if the path isn't in the index."""
+        conn = self._conn
+        row = conn.execute("SELECT " + _ROW_COLUMNS + " FROM paths WHERE id = ?", (_ROOT_ID,)).fetchone()
+        for name in iteratepath(path):
+            row = conn.execute("SELECT " + _ROW_COLUMNS + " FROM paths WHERE parent = ? AND name = ?", (row[0], name)).fetchone()
+            if row is None:
+                return None
+        return row
+
+    def _lookup(self, path):
+        """Find the index row for the given path, indexing any directories
+        along the way that haven't been indexed yet; returns None if the
+        path doesn't exist."""
+        path = abspath(normpath(path))
+        conn = self._conn
+        with self._index_lock:
+            row = conn.execute("SELECT " + _ROW_COLUMNS + " FROM paths WHERE id = ?", (_ROOT_ID,)).fetchone()
+            dir_path = "/"
+            for name in iteratepath(path):
+                if not row[1]:
+                    return None
+                if not row[2]:
+                    self._scan_dir(row[0], dir_path)
+                row = conn.execute("SELECT " + _ROW_COLUMNS + " FROM paths WHERE parent = ? AND name = ?", (row[0], name)).fetchone()
+                if row is None:
+                    return None
+                dir_path = pathjoin(dir_path, name)
+            return row
+
+    def _list(self, path):
+        """Get (name, is_dir, info) rows for the contents of a directory,
+        indexing it first if necessary."""
+        with self._index_lock:
+            row = self._lookup(path)
+            if row is None:
+                raise ResourceNotFoundError(path)
+            if not row[1]:
+                raise ResourceInvalidError(path, msg="Path is not a directory: %(path)s")
+            if not row[2]:
+                if not self._scan_dir(row[0], abspath(normpath(path))):
+                    raise ResourceNotFoundError(path)
+            return self._conn.execute("SELECT name, is_dir, info FROM paths WHERE parent = ? ORDER BY name", (row[0],)).fetchall()
+
+    def _scan_dir(self, dir_id, path):
+        """List a directory in the wrapped FS and bring the index of its
+        contents up to date.
+
+        Directories below it that are still present keep their own index.
+        Returns False if the path is no longer a directory.
+        """
+        try:
+            entries = list(self.wrapped_fs.scandir(self._encode(path)))
+        except (ResourceNotFoundError, ResourceInvalidError):
+            if dir_id != _ROOT_ID:
+                self._update_path(path)
+            return False
+        conn = self._conn
+        with conn:
+            existing = {}
+            for (child_id, name, is_dir) in conn.execute("SELECT id, name, is_dir FROM paths WHERE parent = ?", (dir_id,)):
+                existing[name] = (child_id, is_dir)
+            for entry in entries:
+                try:
+                    info = entry.getinfo()
+                except FSError:
+                    info = None
+                is_dir = entry.is_dir()
+                old = existing.pop(entry.name, None)
+                if old is not None and bool(old[1]) == is_dir:
+                    conn.execute("UPDATE paths SET size = ?, modified_time = ?, info = ? WHERE id = ?",
+                                 _info_values(info) + (old[0],))
+                else:
+                    if old is not None:
+                        self._remove_subtree(old[0])
+                    conn.execute("INSERT INTO paths (parent, name, is_dir, size, modified_time, info) VALUES (?, ?, ?, ?, ?, ?)",
+                                 (dir_id, entry.name, is_dir) + _info_values(info))
+            for (child_id, _is_dir) in existing.itervalues():
+                self._remove_subtree(child_id)
+            conn.execute("UPDATE paths SET scanned = 1 WHERE id = ?", (dir_id,))
+        return True
+
+    def _remove_subtree(self, row_id, keep_root=False):
+        """Remove a row from the index along with everything below it."""
+        if keep_root:
+            self._conn.execute(_SUBTREE + "DELETE FROM paths WHERE id IN subtree AND id != ?", (row_id, row_id))
+            self._conn.execute("UPDATE paths SET scanned = 0 WHERE id = ?", (row_id,))
+        else:
+            self._conn.execute(_SUBTREE + "DELETE FROM paths WHERE id IN subtree", (row_id,))
+
+    def _update_path(self, path, recursive=False):
+        """Bring the index entry for a single path up to date with the
+        wrapped FS.
+
+        Nothing is done if the parent directory hasn't been indexed.  If
+        'recursive' is True, anything indexed below the path is discarded,
+        so that it is indexed again when next needed.
+        """
+        path = abspath(normpath(path))
+        with self._index_lock:
+            conn = self._conn
+            if conn is None:
+                return
+            if path == "/":
+                parent = None
+                row = self._find(path)
+            else:
+                parent = self._find(dirname(path))
+                if parent is None or not parent[1] or not parent[2]:
+                    return
+                row = conn.execute("SELECT " + _ROW_COLUMNS + " FROM paths WHERE parent = ? AND name = ?", (parent[0], basename(path))).fetchone()
+            with conn:
+                try:
+                    is_dir = self.wrapped_fs.isdir(self._encode(path))
+                    info = self.wrapped_fs.getinfo(self._encode(path))
+                except ResourceNotFoundError:
+                    if row is not None and parent is not None:
+                        self._remove_subtree(row[0])
+                    return
+                if row is not None and (bool(row[1]) == is_dir or parent is None):
+                    conn.execute("UPDATE paths SET size = ?, modified_time = ?, info = ? WHERE id = ?",
+                                 _info_values(info) + (row[0],))
+                    if recursive and is_dir:
+                        self._remove_subtree(row[0], keep_root=True)
+                else:
+                    if row is not None:
+                        self._remove_subtree(row[0])
+                    conn.execute("INSERT INTO paths (parent, name, is_dir, size, modified_time, info) VALUES (?, ?, ?, ?, ?, ?)",
+                                 (parent[0], basename(path), is_dir) + _info_values(info))
+
+    def _refresh(self, path, recursive=False):
+        """Update the index after a path has been changed."""
+        path = abspath(normpath(path))
+        self._update_path(path, recursive)
+        if path != "/":
+            #  Creating or removing an entry changes the directory's info.
+            self._update_path(dirname(path))
+
+    def _moved(self, src, dst):
+        """Update the index after a path has been renamed, moving the index
+        of its contents along with it."""
+        src = abspath(normpath(src))
+        dst = abspath(normpath(dst))
+        with self._index_lock:
+            if self._conn is None:
+                return
+            row = self._find(src)
+            dst_parent = self._find(dirname(dst))
+            with self._conn:
+                if row is not None:
+                    if dst_parent is None or not dst_parent[2]:
+                        self._remove_subtree(row[0])
+                    else:
+                        old = self._find(dst)
+                        if old is not None and old[0] != row[0]:
+                            self._remove_subtree(old[0])
+                        self._conn.execute("UPDATE paths SET parent = ?, name = ? WHERE id = ?",
+                                           (dst_parent[0], basename(dst), row[0]))
+            self._refresh(src)
+            self._refresh(dst)
+
+    def _row_info(self, path, row):
+        """Get the info dict for an index row."""
+        if row[4] is not None:
+            return pickle.loads(bytes(row[4]))
+        #  The info couldn't be stored when the path was indexed.
+        info = self.wrapped_fs.getinfo(self._encode(path))
+        with self._index_lock:
+            with self._conn:
+                self._conn.execute("UPDATE paths SET size = ?, modified_time = ?, info = ? WHERE id = ?",
+                                   _info_values(info) + (row[0],))
+        return info
+
+    def rescan(self, path="/"):
+        """Check the indexed directories at and below the given path for
+        changes made to the wrapped FS by other means.
+
+        Directories that haven't been indexed are left to be indexed when
+        they are next needed.
+        """
+        path = abspath(normpath(path))
+        self._update_path(path)
+        dirs = [path]
+        while dirs:
+            dir_path = dirs.pop()
+            with self._index_lock:
+                if self._conn is None:
+                    return
+                row = self._find(dir_path)
+                if row is None or not row[1] or not row[2]:
+                    continue
+                if not self._scan_dir(row[0], dir_path):
+                    continue
+                children = self._conn.execute("SELECT name FROM paths WHERE parent = ? AND is_dir AND scanned", (row[0],)).fetchall()
+            dirs.extend(pathjoin(dir_path, name) for (name,) in children)
+
+    def glob(self, pattern):
+        """Find the paths that match a shell-style wildcard pattern.
+
+        The pattern is matched one path component at a time, so wildcards
+        don't match '/' characters.
+
+        :param pattern: a path which may contain '*', '?' and '[...]'
+            wildcards in any of its components
+        :rtype: list of absolute paths
+
+        """
+        paths = ["/"]
+        for name in iteratepath(abspath(normpath(pattern))):
+            matches = []
+            if _WILDCARD_RE.search(name) is None:
+                for path in paths:
+                    if self.exists(pathjoin(path, name)):
+                        matches.append(pathjoin(path, name))
+            else:
+                for path in paths:
+                    try:
+                        names = self.listdir(path, wildcard=name)
+                    except (ResourceNotFoundError, ResourceInvalidError):
+                        continue
+                    matches.extend(pathjoin(path, nm) for nm in names)
+            paths = matches
+        return paths
+
+    @rewrite_errors
+    def exists(self, path):
+        return self._lookup(path) is not None
+
+    @rewrite_errors
+    def isdir(self, path):
+        row = self._lookup(path)
+        return row is not None and bool(row[1])
+
+    @rewrite_errors
+    def isfile(self, path):
+        row = self._lookup(path)
+        return row is not None and not row[1]
+
+    @rewrite_errors
+    def getinfo(self, path):
+        row = self._lookup(path)
+        if row is None:
+            raise ResourceNotFoundError(path)
+        return self._row_info(path, row)
+
+    @rewrite_errors
+    def getsize(self, path):
+        row = self._lookup(path)
+        if row is None:
+            raise ResourceNotFoundError(path)
+        if row[3] is None:
+            return FS.getsize(self, path)
+        return row[3]
+
+    @rewrite_errors
+    def listdir(self, path="./", wildcard=None, full=False, absolute=False, dirs_only=False, files_only=False):
+        if dirs_only and files_only:
+            raise ValueError("dirs_only and files_only can not both be True")
+        names = [name for (name, is_dir, _info) in self._list(path)
+                 if not (dirs_only and not is_dir) and not (files_only and is_dir)]
+        return self._listdir_helper(path, names, wildcard, full, absolute)
+
+    @rewrite_errors
+    def scandir(self, path="./"):
+        path = normpath(path)
+        return iter([IndexedScandirEntry(self, path, name, bool(is_dir), info)
+                     for (name, is_dir, info) in self._list(path)])
+
+    #  WrapFS passes these through to the wrapped FS; the base class
+    #  implementations work from listdir() and scandir(), and so are
+    #  answered from the index.
+
+    def ilistdir(self, *args, **kwds):
+        return FS.ilistdir(self, *args, **kwds)
+
+    def listdirinfo(self, *args, **kwds):
+        return FS.listdirinfo(self, *args, **kwds)
+
+    def ilistdirinfo(self, *args, **kwds):
+        return FS.ilistdirinfo(self, *args, **kwds)
+
+    def walk(self, *args, **kwds):
+        return FS.walk(self, *args, **kwds)
+
+    def walkfiles(self, *args, **kwds):
+        return FS.walkfiles(self, *args, **kwds)
+
+    def walkdirs(self, *args, **kwds):
+        return FS.walkdirs(self, *args, **kwds)
+
+    @rewrite_errors
+    def open(self, path, mode='r', buffering=-1, encoding=None, errors=None, newline=None, line_buffering=False, **kwargs):
+        f = super(IndexedFS, self).open(path, mode, buffering=buffering, encoding=encoding, errors=errors, newline=newline, line_buffering=line_buffering, **kwargs)
+        if "w" in mode or "a" in mode or "+" in mode:
+            self._refresh(path)
+            return IndexedFile(f, self, path, mode)
+        return f
+
+    def setcontents(self, path, data=b'', encoding=None, errors=None, chunk_size=64*1024):
+        try:
+            return super(IndexedFS, self).setcontents(path, data, encoding=encoding, errors=errors, chunk_size=chunk_size)
+        finally:
+            self._refresh(path)
+
+    def createfile(self, path, wipe=False):
+        try:
+            return super(IndexedFS, self).createfile(path, wipe=wipe)
+        finally:
+            self._refresh(path)
+
+    def makedir(self, path, recursive=False, allow_recreate=False):
+        try:
+            return super(IndexedFS, self).makedir(path, recursive=recursive, allow_recreate=allow_recreate)
+        finally:
+            if recursive:
+                for p in recursepath(path):
+                    self._update_path(p)
+            else:
+                self._refresh(path)
+
+    def remove(self, path):
+        try:
+            return super(IndexedFS, self).remove(path)
+        finally:
+            self._refresh(path)
+
+    def removedir(self, path, recursive=False, force=False):
+        try:
+            return super(IndexedFS, self).removedir(path, recursive=recursive, force=force)
+        finally:
+            if recursive:
+                for p in recursepath(path):
+                    self._update_path(p)
+            else:
+                self._refresh(path)
+
+    def rename(self, src, dst):
+        try:
+            return super(IndexedFS, self).rename(src, dst)
+        finally:
+            self._moved(src, dst)
+
+    def settimes(self, path, *args, **kwds):
+        try:
+            return super(IndexedFS, self).settimes(path, *args, **kwds)
+        finally:
+            self._update_path(path)
+
+    def copy(self, src, dst, overwrite=False, chunk_size=1024 * 64):
+        try:
+            return super(IndexedFS, self).copy(src, dst, overwrite=overwrite,
+                                               chunk_size=chunk_size)
+        finally:
+            self._refresh(dst)
+
+    def move(self, src, dst, overwrite=False, chunk_size=16384):
+        try:
+            return super(IndexedFS, self).move(src, dst, overwrite=overwrite,
+                                               chunk_size=chunk_size)
+        finally:
+            self._refresh(src)
+            self._refresh(dst)
+
+    def copydir(self, src, dst, overwrite=False, ignore_errors=False, chunk_size=16384):
+        try:
+            return super(IndexedFS, self).copydir(src, dst, overwrite=overwrite,
+                                                  ignore_errors=ignore_errors,
+                                                  chunk_size=chunk_size)
+        finally:
+            self._refresh(dst, True)
+
+    def movedir(self, src, dst, overwrite=False, ignore_errors=False, chunk_size=16384):
+        try:
+            return super(IndexedFS, self).movedir(src, dst, overwrite=overwrite,
+                                                  ignore_errors=ignore_errors,
+                                                  chunk_size=chunk_size)
+        finally:
+            self._refresh(src)
+            self._refresh(dst, True)
+
+    def close(self):
+        if not self.closed:
+            self._rescan_close_event.set()
+            if self._rescan_thread is not None:
+                self._rescan_thread.join()
+            for watcher in self._watchers:
+                try:
+                    self.wrapped_fs.del_watcher(watcher)
+                except FSError:
+                    pass
+            self._watchers = []
+            with self._index_lock:
+                self._conn.close()
+                self._conn = None
+            super(IndexedFS, self).close()
@@ -49,7 +49,19 @@ class LimitSizeFS(WrapFS):
         self.cur_size = self._get_cur_size()
 
     def _get_cur_size(self,path="/"):
-        return sum(self.getsize(f) for f in self.walkfiles(path))
+        #  Sizes come from the wrapped FS's listings where possible, so
+        #  this doesn't need to stat every file individually.
+        total = 0
+        for (f,info) in self.wrapped_fs.walkfilesinfo(self._encode(path)):
+            size = info.get("size")
+            if size is None:
+                size = self.wrapped_fs.getsize(f)
+            try:
+                size = max(self._file_sizes[self._decode(f)][0],size)
+            except KeyError:
+                pass
+            total += size
+        return total
 
     def getsyspath(self, path, allow_none=False):
         #  If people could grab syspaths, they could route around our
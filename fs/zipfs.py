@@ -78,6 +78,15 @@ class _ExceptionProxy(object):
         return False
 
 
+class _ZipScandirEntry(ScandirEntry):
+    """ScandirEntry that reads its info straight from the zip directory."""
+
+    __slots__ = ()
+
+    def _load_info(self):
+        return self.fs._get_zip_info(self.path)
+
+
 class ZipFS(FS):
     """A FileSystem that represents a zip file."""
 
@@ -272,10 +281,19 @@ class ZipFS(FS):
     def listdir(self, path="/", wildcard=None, full=False, absolute=False, dirs_only=False, files_only=False):
         return self._path_fs.listdir(path, wildcard, full, absolute, dirs_only, files_only)
 
+    def scandir(self, path="/"):
+        path = normpath(path)
+        return iter([_ZipScandirEntry(self, path, e.name, e.is_dir())
+                     for e in self._path_fs.scandir(path)])
+
     @synchronize
     def getinfo(self, path):
         if not self.exists(path):
             raise ResourceNotFoundError(path)
+        return self._get_zip_info(path)
+
+    @synchronize
+    def _get_zip_info(self, path):
         path = normpath(path).lstrip('/')
         try:
             zi = self.zf.getinfo(self._encode_path(path))